@@ -0,0 +1,150 @@
+import asyncio, logging, socket
+
+from ServerWorker import ServerWorker
+from Pacer import PacedStream
+from RtspParser import RtspError
+from SessionManager import sessions
+
+log = logging.getLogger(__name__)
+
+class RtpProtocol(asyncio.DatagramProtocol):
+	"""Shared RTP/UDP endpoint used by every session of the event loop."""
+
+	def __init__(self, sock):
+		self.sock = sock
+		self.transport = None
+
+	def connection_made(self, transport):
+		self.transport = transport
+
+	def send(self, rtpPacket, address):
+		"""Send straight from the packet's buffers unless the transport is backed up."""
+		if not self.transport.get_write_buffer_size():
+			try:
+				rtpPacket.sendTo(self.sock, address)
+				return
+			except (BlockingIOError, InterruptedError):
+				pass
+		self.transport.sendto(rtpPacket.getPacket(), address)
+
+	def error_received(self, exc):
+		log.warning("Connection Error: %s", exc)
+
+class AsyncServerWorker(ServerWorker, asyncio.Protocol):
+	"""Serve one RTSP/TCP session on the event loop.
+
+	Requests go through ServerWorker.processRtspRequest so the RTSP state
+	machine is the same as in threaded mode; only the socket, thread and
+	timer hooks are replaced by their asyncio counterparts.
+	"""
+
+	def __init__(self, loop, rtp):
+		super().__init__({})
+		self.loop = loop
+		self.rtp = rtp
+		self.sendHandle = None
+
+	def connection_made(self, transport):
+		self.transport = transport
+		self.clientInfo['rtspSocket'] = (transport, transport.get_extra_info('peername'))
+		sessions.add(self)
+
+	def data_received(self, data):
+		try:
+			for request in self.parser.feed(data):
+				self.handleRtspRequest(request)
+		except RtspError as err:
+			log.warning("Bad RTSP request: %s", err)
+			self.transport.close()
+		except Exception:
+			log.exception("Error handling an RTSP request")
+			self.transport.close() # connection_lost releases the session
+
+	def connection_lost(self, exc):
+		self.connectionClosed()
+
+	def resources(self):
+		"""The session holds its RTSP connection; RTP goes through the shared endpoint and no thread is used."""
+		bufferBytes = len(self.parser.buffer) + self.transport.get_write_buffer_size()
+		if 'rtpPacket' in self.clientInfo:
+			bufferBytes += len(self.clientInfo['rtpPacket'].header)
+		if 'history' in self.clientInfo:
+			bufferBytes += self.clientInfo['history'].bytes
+		return 1, 0, bufferBytes
+
+	def expire(self):
+		"""Close the connection of a timed-out session from the event loop."""
+		self.loop.call_soon_threadsafe(self.transport.close)
+
+	def rtcpReceived(self, report, arrival):
+		"""Handle RTCP packets on the event loop, where the session's state lives."""
+		self.loop.call_soon_threadsafe(super().rtcpReceived, report, arrival)
+
+	def openRtpSocket(self):
+		"""All sessions share the server's datagram transport."""
+		self.clientInfo['rtpSocket'] = self.rtp.transport
+
+	def closeRtpSocket(self):
+		"""The shared datagram transport stays open for other sessions."""
+		self.clientInfo.pop('rtpSocket', None)
+
+	def startPacing(self):
+		"""Pace this session's RTP packets with event loop timers."""
+		self.stopPacing()
+		self.clientInfo['pacer'] = PacedStream(self.sendRtp, self.clientInfo['fps'])
+		self.clientInfo['pacer'].begin(self.loop.time())
+		self.sendHandle = self.loop.call_at(self.clientInfo['pacer'].deadline(), self.firePacer)
+
+	def stopPacing(self):
+		"""Cancel the pending RTP send, if any."""
+		if self.sendHandle:
+			self.sendHandle.cancel()
+			self.sendHandle = None
+			log.info("Pacing: %s", self.clientInfo['pacer'].stats)
+
+	def firePacer(self):
+		"""Send the frame that is due and schedule the next deadline."""
+		pacer = self.clientInfo['pacer']
+		if pacer.fire(self.loop.time()):
+			self.sendHandle = self.loop.call_at(pacer.deadline(), self.firePacer)
+		else:
+			self.sendHandle = None
+
+	def startDescription(self):
+		"""Send the session description to the client as a task."""
+		self.loop.create_task(self.sendDescription())
+
+	async def sendDescription(self):
+		address = self.clientInfo['rtspSocket'][1][0]
+		reader, writer = await asyncio.open_connection(address, int(self.clientInfo['descPort']))
+		writer.write(self.clientInfo["description"].encode())
+		await writer.drain()
+		writer.close()
+
+	def sendRtpPacket(self, rtpPacket, address):
+		"""Send an encoded RTP packet through the shared datagram endpoint."""
+		self.rtp.send(rtpPacket, address)
+
+	def sendRtspReply(self, reply):
+		"""Write an encoded RTSP reply on the RTSP/TCP transport."""
+		self.transport.write(reply)
+
+class AsyncServer:
+	"""Run every RTSP session and RTP stream from a single event loop."""
+
+	def __init__(self, port, reusePort=False):
+		self.port = port
+		self.reusePort = reusePort
+
+	async def serve(self):
+		loop = asyncio.get_running_loop()
+		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		sock.setblocking(False)
+		_, rtp = await loop.create_datagram_endpoint(lambda: RtpProtocol(sock), sock=sock)
+		server = await loop.create_server(lambda: AsyncServerWorker(loop, rtp), '', self.port, backlog=1024,
+										  reuse_port=self.reusePort or None)
+		async with server:
+			await server.serve_forever()
+
+	def main(self):
+		asyncio.run(self.serve())
@@ -0,0 +1,155 @@
+import logging, socket, threading, random
+
+from MediaRegistry import registry
+from Prefetch import prefetcher
+from Pacer import PacedStream, scheduler
+from RtpPacket import RtpPacket
+from RtpJpeg import JpegPacketizer, CLOCK_RATE
+
+log = logging.getLogger(__name__)
+
+MULTICAST_PREFIX = '239.255.42.'	# Administratively scoped groups handed out to multicast channels
+MULTICAST_PORT = 5004
+MULTICAST_TTL = 1
+
+class Channel:
+	"""One paced RTP stream of a movie shared by every broadcast session playing it.
+
+	Each frame is read, fragmented and RTP-encoded once per channel, then the
+	same datagrams go either to the channel's multicast group or to every
+	unicast destination in its fan-out list. Viewers join the stream where it
+	is; the channel pauses while nobody is watching and is closed when its
+	last session goes away.
+	"""
+
+	def __init__(self, key, filename, fps, group=None):
+		self.key = key
+		self.fps = fps
+		self.group = group					# (address, port) for multicast, None for fan-out
+		self.videoStream = prefetcher.open(registry.open(filename))
+		self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		if group:
+			self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
+		self.lock = threading.Lock()
+		self.destinations = []				# Fan-out unicast destinations
+		self.viewers = 0					# Sessions playing the channel
+		self.members = 0					# Sessions set up on the channel
+		self.pacer = None
+		self.packetizer = JpegPacketizer()
+		self.rtpPacket = RtpPacket()
+		self.ssrc = random.getrandbits(32)	# Random RTP source identity (RFC 3550 5.1)
+		self.rtpSeq = random.getrandbits(16)
+		self.rtpOffset = random.getrandbits(32)
+		self.rtpFrames = 0
+		self.datagramsSent = 0
+
+	def join(self, address):
+		"""Add a viewer, starting the stream if it was idle."""
+		with self.lock:
+			self.viewers += 1
+			if not self.group:
+				self.destinations = self.destinations + [address]
+			if self.pacer is None or not self.pacer.active:
+				if self.videoStream.frameNbr() >= self.videoStream.frameCount():
+					self.videoStream.seek(0) # The last broadcast ran to the end: start over
+				self.pacer = PacedStream(self.sendRtp, self.fps)
+				scheduler.add(self.pacer)
+
+	def leave(self, address):
+		"""Remove a viewer, pausing the stream when nobody is left watching."""
+		with self.lock:
+			self.viewers -= 1
+			if not self.group and address in self.destinations:
+				destinations = list(self.destinations)
+				destinations.remove(address)
+				self.destinations = destinations
+			if self.viewers == 0 and self.pacer and self.pacer.active:
+				scheduler.remove(self.pacer)
+				log.info("Broadcast %s: %s, datagrams=%d", self.key, self.pacer.stats, self.datagramsSent)
+
+	def position(self):
+		"""Return the position of the stream in seconds."""
+		return self.videoStream.frameNbr() / self.fps
+
+	def transport(self, clientPort):
+		"""Return the Transport reply header for a session on this channel."""
+		if self.group:
+			return f"RTP/UDP;multicast;destination={self.group[0]};port={self.group[1]};ttl={MULTICAST_TTL}"
+		return f"RTP/UDP;unicast;client_port={clientPort};broadcast"
+
+	def sendRtp(self, skip=0):
+		"""Send the next frame once to the group or to every viewer; False at the end of the movie, None if not read yet."""
+		videoStream = self.videoStream
+		if skip:
+			videoStream.seek(videoStream.frameNbr() + skip)
+		data = videoStream.nextFrame()
+		if data is None:
+			self.rtpFrames += skip
+			return None # Still being read ahead: the pacer tries again shortly
+		if not data:
+			return False
+
+		self.rtpFrames += skip + 1
+		timestamp = (self.rtpOffset + int(self.rtpFrames * CLOCK_RATE / self.fps)) & 0xFFFFFFFF
+		packets = []
+		for payloadHeader, chunk, last in self.packetizer.fragments(data):
+			self.rtpPacket.encode(2, 0, 0, 0, self.rtpSeq, 1 if last else 0, 26, self.ssrc, chunk,
+								  timestamp, payloadHeader)
+			self.rtpSeq = (self.rtpSeq + 1) & 0xFFFF
+			packets.append(self.rtpPacket.getPacket())
+
+		# The list is replaced, never changed in place, so no lock is needed to walk it
+		destinations = [self.group] if self.group else self.destinations
+		for packet in packets:
+			for address in destinations:
+				try:
+					self.sock.sendto(packet, address)
+				except OSError:
+					log.warning("Connection Error")
+		self.datagramsSent += len(packets) * len(destinations)
+		return True
+
+	def close(self):
+		if self.pacer:
+			scheduler.remove(self.pacer)
+		self.videoStream.close()
+		self.sock.close()
+
+class Broadcaster:
+	"""Process-wide table of broadcast channels, one per (movie, frame rate, delivery)."""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.channels = {}
+		self.groups = 0
+		self.prefix = MULTICAST_PREFIX
+
+	def setWorker(self, index):
+		"""Hand out groups from a block of our own when running as pre-forked worker `index`."""
+		a, b, c = MULTICAST_PREFIX.split('.')[:3]
+		self.prefix = f"{a}.{b}.{int(c) + index}."
+
+	def attach(self, filename, fps, multicast):
+		"""Return the channel for a session setting up a broadcast, creating it if needed."""
+		key = (filename, fps, 'multicast' if multicast else 'fanout')
+		with self.lock:
+			channel = self.channels.get(key)
+			if channel is None:
+				group = None
+				if multicast:
+					self.groups += 1
+					group = (f"{self.prefix}{self.groups % 254 + 1}", MULTICAST_PORT)
+				channel = Channel(key, filename, fps, group)
+				self.channels[key] = channel
+			channel.members += 1
+			return channel
+
+	def detach(self, channel):
+		"""Drop a session's hold on its channel, closing the channel after the last one."""
+		with self.lock:
+			channel.members -= 1
+			if channel.members == 0:
+				del self.channels[channel.key]
+				channel.close()
+
+broadcaster = Broadcaster()
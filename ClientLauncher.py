@@ -1,20 +1,36 @@
-import sys
+import argparse, logging
 from tkinter import Tk
 from Client import Client
+from JitterBuffer import MIN_DELAY, MAX_DELAY
+from Fec import fecOption
+from Profiler import Profiler, profileArguments
 
 if __name__ == "__main__":
-	try:
-		serverAddr = sys.argv[1]
-		serverPort = sys.argv[2]
-		rtpPort = sys.argv[3]
-		fileName = sys.argv[4]	
-	except:
-		print("[Usage: ClientLauncher.py Server_name Server_port RTP_port Video_file]\n")	
+	parser = argparse.ArgumentParser(usage="ClientLauncher.py Server_name Server_port RTP_port Video_file")
+	parser.add_argument('serverAddr')
+	parser.add_argument('serverPort')
+	parser.add_argument('rtpPort')
+	parser.add_argument('fileName')
+	parser.add_argument('--min-delay-ms', type=float, default=MIN_DELAY * 1000,
+						help="smallest playout delay of the jitter buffer")
+	parser.add_argument('--max-delay-ms', type=float, default=MAX_DELAY * 1000,
+						help="largest playout delay of the jitter buffer")
+	parser.add_argument('--broadcast', choices=['fanout', 'multicast'],
+						help="join the server's shared broadcast of the movie instead of a stream of its own")
+	parser.add_argument('--fec', type=fecOption, metavar='K[:D]',
+						help="ask for a parity packet per K media packets, interleaved D deep")
+	parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error'], default='info',
+						help="debug logs every RTSP message and RTP packet")
+	profileArguments(parser)
+	args = parser.parse_args()
+	logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+	if args.profile:
+		Profiler(args.profile, args.profile_output, args.profile_delay).start()
 	
 	root = Tk()
 	
 	# Create a new client
-	app = Client(root, serverAddr, serverPort, rtpPort, fileName)
+	app = Client(root, args.serverAddr, args.serverPort, args.rtpPort, args.fileName,
+				 args.min_delay_ms / 1000, args.max_delay_ms / 1000, args.broadcast, args.fec)
 	app.master.title("RTPClient")
 	root.mainloop()
-	
\ No newline at end of file
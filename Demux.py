@@ -0,0 +1,166 @@
+import struct
+from array import array
+
+SOI = b'\xff\xd8' # JPEG start of image
+EOI = b'\xff\xd9' # JPEG end of image
+HEAD_SIZE = 16 # bytes of a movie format detection looks at
+
+class Demuxer:
+	"""Reads the frame layout of one movie container format.
+
+	scan() walks a whole movie buffer (bytes or an mmap) and returns the
+	offset and length of every frame, which FrameIndex keeps, so every
+	format gets the same random access. pack() wraps a frame for writing.
+	"""
+	name = None
+
+	@staticmethod
+	def detect(head):
+		"""Return True if a movie starting with these bytes is in this format."""
+		raise NotImplementedError
+
+	@staticmethod
+	def scan(buf):
+		"""Return (offsets, lengths) arrays of the frames of a movie buffer. Raise IOError if it is malformed."""
+		raise NotImplementedError
+
+	@staticmethod
+	def pack(frame):
+		"""Return a frame as it is stored in this format."""
+		raise NotImplementedError
+
+class LegacyDemuxer(Demuxer):
+	"""Every frame preceded by its length in 5 ASCII digits, so at most 99999 bytes."""
+	name = 'legacy'
+	PREFIX = 5
+	MAX_FRAME = 99999
+
+	@staticmethod
+	def detect(head):
+		return head[:LegacyDemuxer.PREFIX].isdigit()
+
+	@staticmethod
+	def scan(buf):
+		offsets = array('Q')
+		lengths = array('I')
+		prefix = LegacyDemuxer.PREFIX
+		pos = 0
+		end = len(buf)
+		while pos < end:
+			header = buf[pos:pos + prefix]
+			if len(header) < prefix or not header.isdigit():
+				raise IOError(f"bad frame length {bytes(header)!r} at byte {pos}")
+			framelength = int(header)
+			pos += prefix
+			if pos + framelength > end:
+				raise IOError(f"frame at byte {pos} runs {pos + framelength - end} bytes past the end of the movie")
+			offsets.append(pos)
+			lengths.append(framelength)
+			pos += framelength
+		return offsets, lengths
+
+	@staticmethod
+	def pack(frame):
+		if len(frame) > LegacyDemuxer.MAX_FRAME:
+			raise ValueError(f"a {len(frame)}-byte frame does not fit a 5-digit length prefix")
+		return b'%05d' % len(frame) + frame
+
+class BinaryDemuxer(Demuxer):
+	"""Every frame preceded by its length as a 32-bit big-endian integer.
+
+	There is no file header: the format is recognized by the JPEG start of
+	image right after the first length.
+	"""
+	name = 'binary'
+	PREFIX = struct.Struct('>I')
+
+	@staticmethod
+	def detect(head):
+		return head[4:6] == SOI
+
+	@staticmethod
+	def scan(buf):
+		offsets = array('Q')
+		lengths = array('I')
+		prefix = BinaryDemuxer.PREFIX
+		unpack = prefix.unpack_from
+		pos = 0
+		end = len(buf)
+		while pos < end:
+			if pos + prefix.size > end:
+				raise IOError(f"truncated frame length at byte {pos}")
+			framelength, = unpack(buf, pos)
+			pos += prefix.size
+			if pos + framelength > end:
+				raise IOError(f"frame at byte {pos} runs {pos + framelength - end} bytes past the end of the movie")
+			offsets.append(pos)
+			lengths.append(framelength)
+			pos += framelength
+		return offsets, lengths
+
+	@staticmethod
+	def pack(frame):
+		return BinaryDemuxer.PREFIX.pack(len(frame)) + frame
+
+class JpegDemuxer(Demuxer):
+	"""JPEG files one after the other, with nothing in between.
+
+	A frame runs from its SOI up to an EOI immediately followed by the next
+	SOI. Entropy-coded data cannot hold an EOI marker, and the EOI of an
+	embedded thumbnail is followed by more of its frame, so that pair only
+	occurs at frame boundaries. The search is bytes.find (or mmap.find),
+	so the scan runs at memory speed instead of byte by byte in Python.
+	"""
+	name = 'jpeg'
+	BOUNDARY = EOI + SOI
+
+	@staticmethod
+	def detect(head):
+		return head[:2] == SOI
+
+	@staticmethod
+	def scan(buf):
+		offsets = array('Q')
+		lengths = array('I')
+		find = buf.find
+		pos = find(SOI)
+		while pos >= 0:
+			boundary = find(JpegDemuxer.BOUNDARY, pos + 2)
+			if boundary < 0:
+				# The last frame ends at the last EOI, ignoring any trailing bytes
+				end = buf.rfind(EOI, pos + 2)
+				end = end + 2 if end >= 0 else len(buf)
+				offsets.append(pos)
+				lengths.append(end - pos)
+				break
+			offsets.append(pos)
+			lengths.append(boundary + 2 - pos)
+			pos = boundary + 2
+		return offsets, lengths
+
+	@staticmethod
+	def pack(frame):
+		return frame
+
+DEMUXERS = [LegacyDemuxer, BinaryDemuxer, JpegDemuxer]
+
+def register(demuxer):
+	"""Add a container format; formats registered later are tried first."""
+	DEMUXERS.insert(0, demuxer)
+
+def demuxer(name):
+	"""Return the demuxer of a format by name."""
+	for candidate in DEMUXERS:
+		if candidate.name == name:
+			return candidate
+	raise ValueError(f"unknown movie format {name!r}")
+
+def detect(buf):
+	"""Return the demuxer of a movie buffer from its first bytes. Raise IOError for an unknown format."""
+	head = bytes(buf[:HEAD_SIZE])
+	if not head:
+		return LegacyDemuxer # An empty movie has no frames in any format
+	for candidate in DEMUXERS:
+		if candidate.detect(head):
+			return candidate
+	raise IOError(f"unknown movie format, starting with {head[:8]!r}")
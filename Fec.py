@@ -0,0 +1,154 @@
+import random, struct
+from collections import deque
+
+from RtpPacket import RtpPacket, RTP_HEADER
+
+FEC_PT = 127 # dynamic payload type of the parity packets
+MIN_GROUP = 2 # media packets one parity packet covers at least; fewer means no FEC
+MAX_GROUP = 48 # media packets one parity packet covers at most
+MAX_DEPTH = 16 # interleaving depth at most
+HISTORY = 1024 # media packets the decoder keeps to rebuild from
+MAX_PENDING = 64 # parity packets kept waiting for a group to become recoverable
+FEC_HOLDOFF = 0.03 # seconds a receiver leaves FEC to repair a loss before it NACKs
+
+# First sequence number, group size, stride, then the XOR of the media packets'
+# M/PT byte, payload length and timestamp
+FEC_HEADER = struct.Struct('!HBBBxHI')
+
+def fecOption(value):
+	"""Parse a 'K' or 'K:D' command line option into (group size, interleaving depth)."""
+	k, _, depth = value.partition(':')
+	return int(k), int(depth or 1)
+
+def xorValue(rtpPacket):
+	"""Return the payload of a packet (payload header included) as an int, little-endian.
+
+	Little-endian makes shorter payloads XOR as if zero-padded at the end,
+	and a whole payload is XORed in one big-int operation.
+	"""
+	payloadHeader = rtpPacket.payloadHeader
+	value = int.from_bytes(rtpPacket.payload, 'little')
+	if payloadHeader:
+		value = int.from_bytes(payloadHeader, 'little') | value << 8 * len(payloadHeader)
+	return value
+
+class FecEncoder:
+	"""XOR parity packets over groups of K media packets, interleaved D deep.
+
+	Media packets are taken in blocks of K*D; parity packet j of a block
+	protects packets j, j+D, ..., j+(K-1)D, so a burst of up to D losses
+	leaves at most one lost packet in each group, which the receiver can
+	rebuild. The overhead is one parity packet per K media packets.
+	Parity packets form a stream of their own, with their own SSRC and
+	sequence numbers, on the media's RTP port.
+	"""
+
+	def __init__(self, k, depth=1):
+		self.k = max(MIN_GROUP, min(k, MAX_GROUP))
+		self.depth = max(1, min(depth, MAX_DEPTH))
+		self.ssrc = random.getrandbits(32)
+		self.seq = random.getrandbits(16)
+		self.count = 0		# media packets taken in the current block
+		self.groups = []	# [first seq, M/PT, length, timestamp, value, longest payload] per column
+
+	def add(self, rtpPacket):
+		"""Take a media packet just sent; return the parity packets of the block it completes."""
+		header = rtpPacket.header
+		_, mpt, seq, timestamp, _ = RTP_HEADER.unpack_from(header)
+		length = len(rtpPacket.payloadHeader) + len(rtpPacket.payload)
+		value = xorValue(rtpPacket)
+		if self.count < self.depth:
+			self.groups.append([seq, mpt, length, timestamp, value, length])
+		else:
+			group = self.groups[self.count % self.depth]
+			group[1] ^= mpt
+			group[2] ^= length
+			group[3] ^= timestamp
+			group[4] ^= value
+			group[5] = max(group[5], length)
+		self.count += 1
+		if self.count < self.k * self.depth:
+			return []
+
+		parity = []
+		for first, mpt, length, timestamp, value, longest in self.groups:
+			rtpPacket = RtpPacket()
+			rtpPacket.encode(2, 0, 0, 0, self.seq, 0, FEC_PT, self.ssrc, value.to_bytes(longest, 'little'),
+							 timestamp, FEC_HEADER.pack(first, self.k, self.depth, mpt, length, timestamp))
+			self.seq = (self.seq + 1) & 0xFFFF
+			parity.append(rtpPacket)
+		self.count = 0
+		self.groups = []
+		return parity
+
+class FecDecoder:
+	"""Rebuild a single lost media packet per group from the parity packets.
+
+	Media packets are remembered as they arrive; a parity packet whose group
+	misses exactly one of them rebuilds it. A parity packet missing more
+	waits for late media packets (e.g. retransmissions), MAX_PENDING at most.
+	"""
+
+	def __init__(self, history=HISTORY):
+		self.history = history
+		self.packets = {}		# sequence number -> media RtpPacket
+		self.order = deque()
+		self.pending = deque()	# (parity header fields, parity RtpPacket), oldest first
+		self.recovered = 0
+		self.unrecoverable = 0
+
+	def media(self, rtpPacket):
+		"""Take a received media packet; return the packets it lets the decoder rebuild."""
+		self.remember(rtpPacket)
+		return self.retry() if self.pending else []
+
+	def parity(self, rtpPacket):
+		"""Take a received parity packet; return the packets it lets the decoder rebuild."""
+		fields = FEC_HEADER.unpack_from(rtpPacket.payload)
+		self.pending.append((fields, rtpPacket))
+		while len(self.pending) > MAX_PENDING:
+			self.pending.popleft()
+			self.unrecoverable += 1
+		return self.retry()
+
+	def remember(self, rtpPacket):
+		seq = rtpPacket.seqNum()
+		if seq not in self.packets:
+			self.order.append(seq)
+			if len(self.order) > self.history:
+				self.packets.pop(self.order.popleft(), None)
+		self.packets[seq] = rtpPacket
+
+	def retry(self):
+		rebuilt = []
+		for entry in list(self.pending):
+			(first, k, depth, mpt, length, timestamp), parity = entry
+			members = [(first + i * depth) & 0xFFFF for i in range(k)]
+			missing = [seq for seq in members if seq not in self.packets]
+			if len(missing) > 1:
+				continue
+			self.pending.remove(entry)
+			if missing:
+				rtpPacket = self.rebuild(missing[0], members, parity, mpt, length, timestamp)
+				self.remember(rtpPacket)
+				rebuilt.append(rtpPacket)
+		self.recovered += len(rebuilt)
+		return rebuilt
+
+	def rebuild(self, seq, members, parity, mpt, length, timestamp):
+		"""XOR the parity with the group's other packets to get the lost one back."""
+		value = int.from_bytes(parity.payload[FEC_HEADER.size:], 'little')
+		ssrc = None
+		for member in members:
+			rtpPacket = self.packets.get(member)
+			if rtpPacket is None:
+				continue
+			_, memberMpt, _, memberTimestamp, ssrc = RTP_HEADER.unpack_from(rtpPacket.header)
+			mpt ^= memberMpt
+			length ^= len(rtpPacket.payload)
+			timestamp ^= memberTimestamp
+			value ^= int.from_bytes(rtpPacket.payload, 'little')
+		header = RTP_HEADER.pack(2 << 6, mpt, seq, timestamp, ssrc)
+		rtpPacket = RtpPacket()
+		rtpPacket.decode(header + value.to_bytes(length, 'little'))
+		return rtpPacket
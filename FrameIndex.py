@@ -0,0 +1,88 @@
+import hashlib, mmap, os, struct, sys
+from array import array
+
+import Demux
+
+SIDECAR_EXT = '.idx'
+SIDECAR_MAGIC = b'MJIX'
+SIDECAR_VERSION = 1
+# magic, version, byte order, stamp of the movie's mtime and size, frame count
+SIDECAR_HEADER = struct.Struct('<4sBc2x8sQ')
+
+class FrameIndex:
+	"""Offset and length of every frame of a movie, in frame order."""
+
+	def __init__(self, offsets, lengths):
+		self.offsets = offsets
+		self.lengths = lengths
+
+	@classmethod
+	def scan(cls, buf, demuxer=None):
+		"""Build the index of a movie buffer with the demuxer of its format, detected if not given."""
+		if demuxer is None:
+			demuxer = Demux.detect(buf)
+		return cls(*demuxer.scan(buf))
+
+	@classmethod
+	def open(cls, filename, buf=None):
+		"""Load the sidecar index of a movie, rebuilding it if it is missing or stale."""
+		index = cls.load(filename)
+		if index is None:
+			if buf is None:
+				with open(filename, 'rb') as f:
+					buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+			index = cls.scan(buf)
+			try:
+				index.save(filename)
+			except OSError:
+				pass # read-only media directory; the index is rebuilt next time
+		return index
+
+	@staticmethod
+	def stamp(filename):
+		"""Return a digest of the movie's modification time and size."""
+		st = os.stat(filename)
+		return hashlib.blake2b(f"{st.st_mtime_ns}:{st.st_size}".encode(), digest_size=8).digest()
+
+	@classmethod
+	def load(cls, filename):
+		"""Map the sidecar of a movie. Return None if it is missing, foreign or stale.
+
+		The offset and length tables are memoryviews straight over the mapped
+		sidecar, so loading costs the same for any number of frames.
+		"""
+		try:
+			with open(filename + SIDECAR_EXT, 'rb') as f:
+				buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except (OSError, ValueError):
+			return None
+		if len(buf) < SIDECAR_HEADER.size:
+			return None
+		magic, version, byteorder, stamp, count = SIDECAR_HEADER.unpack_from(buf)
+		if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION or byteorder != sys.byteorder[0].encode():
+			return None
+		if len(buf) != SIDECAR_HEADER.size + count * 12 or stamp != cls.stamp(filename):
+			return None
+		view = memoryview(buf)
+		start = SIDECAR_HEADER.size
+		offsets = view[start:start + count * 8].cast('Q')
+		lengths = view[start + count * 8:].cast('I')
+		return cls(offsets, lengths)
+
+	def save(self, filename):
+		"""Write the index next to the movie as <movie>.idx."""
+		header = SIDECAR_HEADER.pack(SIDECAR_MAGIC, SIDECAR_VERSION, sys.byteorder[0].encode(),
+									 self.stamp(filename), len(self))
+		tmpname = filename + SIDECAR_EXT + '.tmp'
+		with open(tmpname, 'wb') as f:
+			f.write(header)
+			f.write(array('Q', self.offsets).tobytes())
+			f.write(array('I', self.lengths).tobytes())
+		os.replace(tmpname, filename + SIDECAR_EXT)
+
+	def __len__(self):
+		return len(self.offsets)
+
+	def frame(self, index):
+		"""Return (offset, length) of the frame at a 0-based index."""
+		return self.offsets[index], self.lengths[index]
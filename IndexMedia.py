@@ -0,0 +1,31 @@
+import argparse, os, time
+
+from FrameIndex import FrameIndex, SIDECAR_EXT
+
+MOVIE_EXTS = ('.mjpeg', '.mjpg')
+
+def indexDirectory(directory, force=False):
+	"""Write or refresh the sidecar index of every movie under a directory."""
+	for root, dirs, files in os.walk(directory):
+		for name in sorted(files):
+			if not name.lower().endswith(MOVIE_EXTS):
+				continue
+			filename = os.path.join(root, name)
+			if force:
+				try:
+					os.remove(filename + SIDECAR_EXT)
+				except FileNotFoundError:
+					pass
+			tic = time.perf_counter()
+			fresh = FrameIndex.load(filename) is not None
+			index = FrameIndex.open(filename)
+			toc = time.perf_counter()
+			status = "up to date" if fresh else "indexed"
+			print(f"{filename}: {len(index)} frames, {status} in {toc - tic:.3f}s")
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(usage="IndexMedia.py Media_dir [--force]")
+	parser.add_argument('directory')
+	parser.add_argument('--force', action='store_true', help="rebuild indexes that are still fresh")
+	args = parser.parse_args()
+	indexDirectory(args.directory, args.force)
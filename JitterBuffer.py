@@ -0,0 +1,215 @@
+import heapq, threading
+from time import monotonic
+
+MIN_DELAY = 0.04 # seconds of playout delay kept at least
+MAX_DELAY = 0.5 # seconds of playout delay allowed at most
+JITTER_FACTOR = 4 # playout delay in multiples of the measured jitter
+CAPACITY = 4096 # packets held at most
+NACK_RETRY = 0.05 # seconds before a missing packet is asked for again
+MAX_NACKS = 3 # requests for one missing packet before giving up on it
+MAX_MISSING = 512 # missing packets tracked at most
+
+class JitterBuffer:
+	"""Reorder RTP packets by sequence number and release them at their playout time.
+
+	The first packet anchors RTP timestamps to the local monotonic clock;
+	each packet is played out at its anchored time plus a delay that follows
+	the RFC 3550 interarrival jitter estimate, bounded by minDelay and
+	maxDelay. Packets arriving after their place in the sequence has been
+	played out are counted as late and dropped.
+
+	Gaps in the sequence numbers are tracked as missing packets, which
+	nackList() hands out for retransmission requests until they arrive
+	or their place has been played out.
+	"""
+
+	def __init__(self, clockRate=90000, minDelay=MIN_DELAY, maxDelay=MAX_DELAY,
+				 jitterFactor=JITTER_FACTOR, capacity=CAPACITY):
+		self.clockRate = clockRate
+		self.minDelay = minDelay
+		self.maxDelay = maxDelay
+		self.jitterFactor = jitterFactor
+		self.capacity = capacity
+		self.cond = threading.Condition()
+		self.heap = []				# (extended sequence number, timestamp) in playout order
+		self.packets = {}			# extended sequence number -> packet
+		self.cycles = 0				# 16-bit sequence number wraparounds seen
+		self.maxSeq = None			# highest sequence number received
+		self.baseSeq = None			# extended sequence number of the first packet received
+		self.expectedPrior = 0		# packets expected and received at the last reception report
+		self.receivedPrior = 0
+		self.nextSeq = None			# extended sequence number due for playout
+		self.jitter = 0.0			# RFC 3550 interarrival jitter, in timestamp units
+		self.lastTransit = None
+		self.baseArrival = 0.0		# local time the anchor packet arrived
+		self.baseTimestamp = 0		# RTP timestamp of the anchor packet
+		self.missing = {}			# extended sequence number -> [detected, last NACK, NACKs sent]
+		self.rebase()
+
+		self.received = 0
+		self.late = 0
+		self.dropped = 0
+		self.nacked = 0				# missing packets asked for at least once
+		self.recovered = 0			# of those, arrived in time for playout
+		self.recoveryTime = 0.0		# total seconds from detecting a gap to its recovery
+
+	def rebase(self):
+		"""Re-anchor playout timing on the next packet (e.g. after a pause).
+
+		Packets already buffered keep being played out on the old anchor.
+		"""
+		with self.cond:
+			self.anchored = False
+			self.lastTransit = None
+
+	def extendSeq(self, seq):
+		"""Return the extended sequence number of a 16-bit one (RFC 3550 A.1)."""
+		if self.maxSeq is None:
+			self.maxSeq = seq
+		elif (seq - self.maxSeq) & 0xFFFF < 0x8000:
+			if seq < self.maxSeq:
+				self.cycles += 1
+			self.maxSeq = seq
+		elif seq > self.maxSeq:
+			return (self.cycles - 1) * 0x10000 + seq # from before the last wraparound
+		return self.cycles * 0x10000 + seq
+
+	def delay(self):
+		"""Return the current playout delay in seconds."""
+		return min(self.maxDelay, max(self.minDelay, self.jitterFactor * self.jitter / self.clockRate))
+
+	def playoutTime(self, timestamp):
+		elapsed = ((timestamp - self.baseTimestamp + 0x80000000) & 0xFFFFFFFF) - 0x80000000 # signed, wraps
+		return self.baseArrival + elapsed / self.clockRate + self.delay()
+
+	def put(self, rtpPacket, arrival=None):
+		"""Add a received packet."""
+		if arrival is None:
+			arrival = monotonic()
+		timestamp = rtpPacket.timestamp()
+		with self.cond:
+			self.received += 1
+			extMax = None if self.maxSeq is None else self.cycles * 0x10000 + self.maxSeq
+			extSeq = self.extendSeq(rtpPacket.seqNum())
+			if self.baseSeq is None:
+				self.baseSeq = extSeq
+			if (self.nextSeq is not None and extSeq < self.nextSeq) or extSeq in self.packets:
+				self.missing.pop(extSeq, None)
+				self.late += 1
+				return
+
+			detected = self.missing.pop(extSeq, None)
+			if detected is not None:
+				# A retransmission: it says nothing about network jitter or timing
+				if detected[2]:
+					self.recovered += 1
+					self.recoveryTime += arrival - detected[0]
+			else:
+				if extMax is not None and extSeq > extMax + 1:
+					for seq in range(max(extMax + 1, extSeq - MAX_MISSING), extSeq):
+						self.missing[seq] = [arrival, 0.0, 0]
+					while len(self.missing) > MAX_MISSING:
+						del self.missing[next(iter(self.missing))]
+
+				# Interarrival jitter: J += (|D| - J) / 16
+				transit = arrival * self.clockRate - timestamp
+				if self.lastTransit is not None:
+					self.jitter += (abs(transit - self.lastTransit) - self.jitter) / 16
+				self.lastTransit = transit
+
+				# Anchor timing on this packet if there is no anchor or it fell too far behind
+				if not self.anchored or (timestamp - self.baseTimestamp) & 0xFFFFFFFF >= 0x80000000 \
+						or arrival > self.playoutTime(timestamp) + self.maxDelay:
+					self.baseArrival = arrival
+					self.baseTimestamp = timestamp
+					self.anchored = True
+
+			if len(self.heap) >= self.capacity:
+				oldest, _ = heapq.heappop(self.heap)
+				del self.packets[oldest]
+				self.dropped += 1
+			heapq.heappush(self.heap, (extSeq, timestamp))
+			self.packets[extSeq] = rtpPacket
+			self.cond.notify()
+
+	def get(self, timeout=None):
+		"""Return the next packet in sequence once it is due, or None after timeout."""
+		deadline = None if timeout is None else monotonic() + timeout
+		with self.cond:
+			while True:
+				now = monotonic()
+				if self.heap:
+					extSeq, timestamp = self.heap[0]
+					due = self.playoutTime(timestamp)
+					if now >= due:
+						heapq.heappop(self.heap)
+						self.nextSeq = extSeq + 1
+						return self.packets.pop(extSeq)
+					wait = due - now
+				else:
+					wait = None
+				if deadline is not None:
+					if now >= deadline:
+						return None
+					wait = deadline - now if wait is None else min(wait, deadline - now)
+				self.cond.wait(wait)
+
+	def receptionReport(self):
+		"""Return (fraction lost, cumulative lost, extended highest seq, jitter) for an RTCP report.
+
+		Loss is counted from the sequence numbers as in RFC 3550 A.3; the
+		fraction lost covers the interval since the previous call. Returns
+		None before the first packet.
+		"""
+		with self.cond:
+			if self.maxSeq is None:
+				return None
+			extMax = self.cycles * 0x10000 + self.maxSeq
+			expected = extMax - self.baseSeq + 1
+			expectedInterval = expected - self.expectedPrior
+			lostInterval = expectedInterval - (self.received - self.receivedPrior)
+			self.expectedPrior = expected
+			self.receivedPrior = self.received
+			fraction = (lostInterval << 8) // expectedInterval if expectedInterval > 0 and lostInterval > 0 else 0
+			cumulative = max(-0x800000, min(0x7FFFFF, expected - self.received))
+			return min(fraction, 255), cumulative, extMax, int(self.jitter)
+
+	def nackList(self, now=None, holdoff=0.0):
+		"""Return the 16-bit sequence numbers of the missing packets to ask for now.
+
+		A packet is first asked for once it has been missing for holdoff
+		seconds, then again every NACK_RETRY seconds, MAX_NACKS times at
+		most, and no longer once its place has been played out.
+		"""
+		if now is None:
+			now = monotonic()
+		lost = []
+		with self.cond:
+			for extSeq, entry in list(self.missing.items()):
+				if self.nextSeq is not None and extSeq < self.nextSeq:
+					del self.missing[extSeq] # Too late to be played out
+				elif entry[2] < MAX_NACKS and now - entry[1] >= NACK_RETRY and now - entry[0] >= holdoff:
+					if not entry[2]:
+						self.nacked += 1
+					entry[1] = now
+					entry[2] += 1
+					lost.append(extSeq & 0xFFFF)
+		return lost
+
+	def occupancy(self):
+		"""Return the number of packets waiting for playout."""
+		return len(self.heap)
+
+	def stats(self):
+		return {
+			'occupancy': self.occupancy(),
+			'received': self.received,
+			'late': self.late,
+			'dropped': self.dropped,
+			'jitterMs': self.jitter / self.clockRate * 1000,
+			'delayMs': self.delay() * 1000,
+			'nacked': self.nacked,
+			'recovered': self.recovered,
+			'recoveryRate': self.recovered / self.nacked if self.nacked else None,
+			'recoveryMs': self.recoveryTime / self.recovered * 1000 if self.recovered else None,
+		}
@@ -0,0 +1,139 @@
+import argparse, logging, multiprocessing, os, sys, threading, time
+
+from RtspClient import RtspClient
+from Fec import fecOption
+from RtspParser import RtspError
+
+log = logging.getLogger(__name__)
+
+REPLY_TIMEOUT = 5.0
+
+def parseScenario(spec):
+	"""Parse 'play:10,pause:2,seek:30,play:5,stop' into (action, argument) steps."""
+	steps = []
+	for item in spec.split(','):
+		action, _, arg = item.strip().partition(':')
+		if action not in ('play', 'pause', 'seek', 'stop', 'describe'):
+			raise ValueError(f"unknown scenario step '{action}'")
+		steps.append((action, float(arg) if arg else 0.0))
+	return steps
+
+class SessionResult:
+	"""What one headless session saw over its scenario."""
+
+	def __init__(self):
+		self.ok = True
+		self.frames = 0
+		self.received = 0
+		self.lost = 0
+		self.playTime = 0.0
+		self.jitterMs = []
+		self.rtts = []
+
+	def collect(self, client):
+		"""Add the client's counters; call before STOP/TEARDOWN reset them."""
+		self.frames += client.frameNbr
+		self.received += client.packetsRecv
+		self.lost += client.lostPacket
+		self.jitterMs.append(client.jitterBuffer.stats()['jitterMs'])
+
+def runSession(index, args, steps, results):
+	result = SessionResult()
+	results[index] = result
+	try:
+		client = RtspClient(args.serverAddr, args.serverPort, args.rtp_base + 2 * index, args.fileName,
+							broadcast=args.broadcast, fec=args.fec)
+		if not client.waitForReply(REPLY_TIMEOUT):
+			result.ok = False
+			return
+		for action, arg in steps:
+			if action == 'play':
+				client.playMovie()
+				result.ok &= client.waitForReply(REPLY_TIMEOUT)
+				time.sleep(arg)
+				result.playTime += arg
+			elif action == 'pause':
+				client.pauseMovie()
+				result.ok &= client.waitForReply(REPLY_TIMEOUT)
+				time.sleep(arg)
+			elif action == 'seek':
+				client.seekMovie(arg)
+				result.ok &= client.waitForReply(REPLY_TIMEOUT)
+			elif action == 'stop':
+				result.collect(client)
+				client.stopMovie()
+				result.ok &= client.waitForReply(REPLY_TIMEOUT)
+			elif action == 'describe':
+				client.getDescription()
+				result.ok &= client.waitForReply(REPLY_TIMEOUT)
+		if client.state != client.INIT:
+			result.collect(client)
+		client.teardownMovie()
+		result.ok &= client.waitForReply(REPLY_TIMEOUT)
+		result.rtts = client.rtspRtts
+	except (OSError, RtspError) as e:
+		result.ok = False
+		log.error("Session %d failed: %s", index, e)
+
+def runWorker(work):
+	"""Run a share of the sessions in one process, one thread per session."""
+	indexes, args = work
+	sys.stdout = open(os.devnull, 'w') # The clients print every packet
+	steps = parseScenario(args.scenario)
+	results = {}
+	threads = []
+	for i, index in enumerate(indexes):
+		thread = threading.Thread(target=runSession, args=(index, args, steps, results))
+		thread.start()
+		threads.append(thread)
+		time.sleep(args.ramp / max(1, args.sessions) * args.processes)
+	for thread in threads:
+		thread.join()
+	return [vars(result) for result in results.values()]
+
+def percentile(samples, p):
+	if not samples:
+		return 0.0
+	samples = sorted(samples)
+	return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+def report(results, elapsed):
+	ok = [r for r in results if r['ok']]
+	frames = sum(r['frames'] for r in results)
+	received = sum(r['received'] for r in results)
+	lost = sum(r['lost'] for r in results)
+	playTime = sum(r['playTime'] for r in results)
+	jitter = [j for r in results for j in r['jitterMs']]
+	rtts = [t * 1000 for r in results for t in r['rtts']]
+	print(f"sessions: {len(results)} ({len(ok)} without errors) in {elapsed:.1f}s")
+	print(f"frames: {frames}, aggregate {frames / elapsed:.1f} fps, {frames / playTime if playTime else 0:.1f} fps per playing session")
+	print(f"packets: {received} received, {lost} lost ({lost / max(1, received + lost):.2%})")
+	print(f"jitter ms: mean {sum(jitter) / max(1, len(jitter)):.2f}, p95 {percentile(jitter, 95):.2f}")
+	print(f"RTSP round trip ms: p50 {percentile(rtts, 50):.2f}, p95 {percentile(rtts, 95):.2f}, "
+		  f"p99 {percentile(rtts, 99):.2f}, max {max(rtts, default=0):.2f}")
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(usage="LoadGenerator.py Server_name Server_port Video_file [options]")
+	parser.add_argument('serverAddr')
+	parser.add_argument('serverPort', type=int)
+	parser.add_argument('fileName')
+	parser.add_argument('--sessions', type=int, default=10, help="concurrent sessions")
+	parser.add_argument('--processes', type=int, default=os.cpu_count(), help="worker processes sharing the sessions")
+	parser.add_argument('--rtp-base', type=int, default=30000,
+						help="RTP port of the first session; two ports (RTP and RTCP) per session")
+	parser.add_argument('--ramp', type=float, default=1.0, help="seconds over which sessions are started")
+	parser.add_argument('--broadcast', choices=['fanout', 'multicast'],
+						help="have every session join the server's shared broadcast of the movie")
+	parser.add_argument('--fec', type=fecOption, metavar='K[:D]',
+						help="have every session ask for a parity packet per K media packets, interleaved D deep")
+	parser.add_argument('--scenario', default='play:10,pause:1,play:5,stop',
+						help="comma-separated steps: play:<s>, pause:<s>, seek:<npt>, stop, describe (SETUP and TEARDOWN are implicit)")
+	args = parser.parse_args()
+	parseScenario(args.scenario)
+	args.processes = max(1, min(args.processes, args.sessions))
+
+	shares = [(list(range(i, args.sessions, args.processes)), args) for i in range(args.processes)]
+	tic = time.perf_counter()
+	with multiprocessing.Pool(args.processes) as pool:
+		results = [r for share in pool.map(runWorker, shares) for r in share]
+	report(results, time.perf_counter() - tic)
@@ -0,0 +1,232 @@
+import mmap, os, threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from FrameIndex import FrameIndex
+from VideoStream import DEFAULT_FPS
+
+DEFAULT_BUDGET = 512 * 1024 * 1024 # bytes of mapped movies kept while unused
+WARM_FRAMES = 256 # frames of a movie whose warm-up is remembered, so its viewers read each one once
+
+scratch = threading.local() # per reader thread buffer that warm-up reads go to
+
+class Media:
+	"""A movie file mapped once and shared by every session playing it."""
+
+	def __init__(self, filename):
+		self.filename = filename
+		self.refs = 0
+		self.lock = threading.Lock()
+		self.warming = OrderedDict()	# frame index -> future of its warm-up, most recent last
+		self.reading = 0				# warm-up reads in progress on the descriptor
+		self.closed = False
+		self.fd = os.open(filename, os.O_RDONLY)
+		self.mmap = self.view = None
+		try:
+			self.size = os.fstat(self.fd).st_size
+			self.mmap = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ) if self.size else b''
+			self.view = memoryview(self.mmap)
+			if hasattr(os, 'posix_fadvise'):
+				os.posix_fadvise(self.fd, 0, 0, os.POSIX_FADV_SEQUENTIAL) # larger kernel read-ahead for read()
+			self.index = FrameIndex.open(filename, self.mmap)
+		except BaseException:
+			# Unmappable or unreadable: give back the mapping and the descriptor
+			if self.view is not None:
+				self.view.release()
+			if isinstance(self.mmap, mmap.mmap):
+				self.mmap.close()
+			os.close(self.fd)
+			raise
+
+	def frameCount(self):
+		"""Return the number of frames."""
+		return len(self.index)
+
+	def frame(self, index):
+		"""Return the frame at a 0-based index as a zero-copy memoryview."""
+		offset, length = self.index.frame(index)
+		return self.view[offset:offset + length]
+
+	def prefetch(self, index, submit):
+		"""Return the future of the frame's warm-up, started with submit(function, index) unless under way.
+
+		Every cursor on the movie shares the warm-up of a frame, so a frame
+		is read once however many sessions play it.
+		"""
+		with self.lock:
+			future = self.warming.get(index)
+			if future is None:
+				future = self.warming[index] = submit(self.warm, index)
+				if len(self.warming) > WARM_FRAMES:
+					self.warming.popitem(last=False)
+			return future
+
+	def warm(self, index):
+		"""Read a frame into the page cache, so touching its mapped pages does not wait on the disk.
+
+		A slow disk stalls a page fault on the mapping with the GIL held; a
+		read releases it, so reader threads can wait on storage while the
+		rest of the process carries on. The data goes to a scratch buffer:
+		sessions keep sending zero-copy slices of the mapping.
+		"""
+		with self.lock:
+			if self.closed:
+				return
+			self.reading += 1
+		try:
+			offset, length = self.index.frame(index)
+			if not hasattr(os, 'preadv'):
+				bytes(self.frame(index)) # touch the pages
+				return
+			buffer = getattr(scratch, 'buffer', None)
+			if buffer is None or len(buffer) < length:
+				buffer = scratch.buffer = bytearray(length)
+			os.preadv(self.fd, [memoryview(buffer)[:length]], offset)
+		finally:
+			with self.lock:
+				self.reading -= 1
+				if self.closed and not self.reading:
+					self.teardown()
+
+	def close(self):
+		"""Drop the mapping and the file once no read is left; the mapping is unmapped once the last frame slice is gone."""
+		with self.lock:
+			self.closed = True
+			self.warming.clear()
+			if not self.reading:
+				self.teardown()
+
+	def teardown(self):
+		"""Let go of the mapping and close the file. Call with the lock held."""
+		self.view = None
+		self.mmap = None
+		os.close(self.fd)
+
+class FrameCursor:
+	"""Per-session read position into a shared Media, used like a VideoStream."""
+
+	def __init__(self, registry, media):
+		self.registry = registry
+		self.media = media
+		self.filename = media.filename
+		self.frameNum = 0
+
+	def nextFrame(self):
+		"""Get next frame."""
+		if self.media is None or self.frameNum >= self.media.frameCount():
+			return b''
+		data = self.media.frame(self.frameNum)
+		self.frameNum += 1
+		return data
+
+	def copy(self):
+		"""Return another cursor on the same movie, at its start, without opening the file again."""
+		return self.registry.share(self.media)
+
+	def prefetch(self, frameNum, submit):
+		"""Start reading a frame into the page cache ahead of its turn; return the future of that."""
+		return self.media.prefetch(frameNum, submit)
+
+	def frameNbr(self):
+		"""Get frame number."""
+		return self.frameNum
+
+	def seek(self, frameNbr):
+		"""Make the frame after frameNbr the next one to be read."""
+		self.frameNum = max(0, min(frameNbr, self.frameCount()))
+
+	def frameCount(self):
+		"""Get the number of frames in the movie."""
+		return self.media.frameCount() if self.media is not None else 0
+
+	def duration(self, fps=DEFAULT_FPS):
+		"""Get the length of the movie in seconds."""
+		return self.frameCount() / fps
+
+	def close(self):
+		"""Give the movie back to the registry."""
+		if self.media is not None:
+			self.registry.release(self.media)
+			self.media = None
+
+class MediaRegistry:
+	"""Process-wide, reference-counted cache of mapped movies.
+
+	Movies nobody plays any more stay mapped until the total mapped size goes
+	over the budget, then the least recently opened ones are dropped first.
+	"""
+
+	def __init__(self, budget=DEFAULT_BUDGET):
+		self.budget = budget
+		self.lock = threading.Lock()
+		self.media = OrderedDict()
+		self.opening = {}	# path -> future of the Media being opened
+
+	def open(self, filename):
+		"""Return a new FrameCursor on the movie. Raise IOError if it cannot be read.
+
+		The movie is mapped and indexed outside the lock, so a cold open does
+		not hold up sessions on other movies; sessions opening the same one
+		meanwhile wait for it instead of mapping it again.
+		"""
+		key = os.path.realpath(filename)
+		while True:
+			with self.lock:
+				media = self.media.get(key)
+				if media is not None:
+					self.media.move_to_end(key)
+					media.refs += 1
+					self.evict()
+					return FrameCursor(self, media)
+				opening = self.opening.get(key)
+				if opening is None:
+					opening = self.opening[key] = Future()
+					break
+			opening.result() # Raises the IOError of a failed open too
+		try:
+			media = Media(key)
+		except BaseException as e:
+			with self.lock:
+				del self.opening[key]
+			opening.set_exception(e)
+			raise
+		with self.lock:
+			del self.opening[key]
+			self.media[key] = media
+			media.refs += 1
+			self.evict()
+		opening.set_result(media)
+		return FrameCursor(self, media)
+
+	def share(self, media):
+		"""Return a new FrameCursor on a movie already open."""
+		with self.lock:
+			media.refs += 1
+		return FrameCursor(self, media)
+
+	def release(self, media):
+		with self.lock:
+			media.refs -= 1
+			self.evict()
+
+	def setBudget(self, budget):
+		with self.lock:
+			self.budget = budget
+			self.evict()
+
+	def mappedBytes(self):
+		"""Return the total size of the movies currently mapped."""
+		return sum(media.size for media in self.media.values())
+
+	def evict(self):
+		"""Drop unused movies, oldest first, until the budget is met. Call with the lock held."""
+		mapped = self.mappedBytes()
+		for key, media in list(self.media.items()):
+			if mapped <= self.budget:
+				break
+			if media.refs == 0:
+				del self.media[key]
+				media.close()
+				mapped -= media.size
+
+registry = MediaRegistry()
@@ -0,0 +1,196 @@
+import logging, re, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+SUB_BUCKET_BITS = 5 # 32 buckets per power of two: durations are kept to about 3%
+MAX_MICROS = 1 << 26 # about 67 s; longer durations are counted as this
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+def bucketIndex(micros):
+	"""Return the log-linear bucket of a duration in microseconds: exact below 64 us, then 32 per doubling."""
+	shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+	if shift <= 0:
+		return micros
+	return ((shift + 1) << SUB_BUCKET_BITS) + (micros >> shift) - (1 << SUB_BUCKET_BITS)
+
+def bucketMidpoint(index):
+	"""Return the middle of a bucket, in microseconds."""
+	if index < 2 << SUB_BUCKET_BITS:
+		return index
+	shift = (index >> SUB_BUCKET_BITS) - 1
+	low = ((index & ((1 << SUB_BUCKET_BITS) - 1)) + (1 << SUB_BUCKET_BITS)) << shift
+	return low + (1 << shift) / 2
+
+class Counter:
+	"""A count that only goes up."""
+
+	def __init__(self):
+		self.value = 0
+		self.lock = threading.Lock()
+
+	def inc(self, amount=1):
+		with self.lock:
+			self.value += amount
+
+class Histogram:
+	"""Durations in HDR-style log-linear buckets, from 1 us to about a minute at constant relative precision.
+
+	Recording is an index computation and an increment, cheap enough for
+	the per-packet path; quantiles are read off the bucket counts.
+	"""
+
+	def __init__(self):
+		self.counts = [0] * (bucketIndex(MAX_MICROS) + 1)
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+		self.lock = threading.Lock()
+
+	def record(self, seconds):
+		index = bucketIndex(min(max(0, int(seconds * 1e6)), MAX_MICROS))
+		with self.lock:
+			self.counts[index] += 1
+			self.count += 1
+			self.total += seconds
+			if seconds > self.max:
+				self.max = seconds
+
+	def quantiles(self, qs=QUANTILES):
+		"""Return the durations (seconds) under which the given shares of the samples fall."""
+		with self.lock:
+			counts = list(self.counts)
+			count = self.count
+			maximum = self.max
+		values = []
+		for q in qs:
+			rank = max(1, q * count)
+			seen = 0
+			for index, n in enumerate(counts):
+				seen += n
+				if seen >= rank:
+					values.append(min(bucketMidpoint(index) / 1e6, maximum))
+					break
+			else:
+				values.append(0.0)
+		return values
+
+def snakeCase(name):
+	return re.sub(r'([A-Z])', r'_\1', name).lower()
+
+def labelText(labels):
+	return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}' if labels else ''
+
+class Metrics:
+	"""Process-wide counters and latency histograms.
+
+	Metrics are created once by name (and labels) and updated in place.
+	Collectors add gauges computed when the metrics are read, such as
+	session counts. Everything can be rendered in the Prometheus text
+	format or as the name: value pairs of a GET_PARAMETER reply.
+	"""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.metrics = {}		# (name, labels) -> Counter or Histogram
+		self.help = {}			# name -> help text
+		self.collectors = []	# callables returning {name: gauge value}
+		self.worker = 0
+
+	def setWorker(self, index):
+		"""Serve the endpoint on the metrics port plus `index` when running as pre-forked worker `index`."""
+		self.worker = index
+
+	def get(self, cls, name, help, labels):
+		key = (name, tuple(sorted(labels.items())))
+		with self.lock:
+			metric = self.metrics.get(key)
+			if metric is None:
+				metric = self.metrics[key] = cls()
+				self.help[name] = help
+		return metric
+
+	def counter(self, name, help='', **labels):
+		return self.get(Counter, name, help, labels)
+
+	def histogram(self, name, help='', **labels):
+		return self.get(Histogram, name, help, labels)
+
+	def addCollector(self, collect):
+		self.collectors.append(collect)
+
+	def gauges(self):
+		values = {}
+		for collect in self.collectors:
+			for name, value in collect().items():
+				if isinstance(value, (int, float)) and not isinstance(value, bool):
+					values['server_' + snakeCase(name)] = value
+		return values
+
+	def snapshot(self):
+		"""Return every metric as name -> value, histograms as their count and quantiles in ms."""
+		with self.lock:
+			metrics = sorted(self.metrics.items())
+		values = {}
+		for (name, labels), metric in metrics:
+			name += ''.join(f"_{value}" for _, value in labels)
+			if isinstance(metric, Counter):
+				values[name] = metric.value
+			else:
+				values[name + '_count'] = metric.count
+				for q, value in zip(QUANTILES, metric.quantiles()):
+					values[f"{name}_p{q * 100:g}_ms".replace('.', '')] = round(value * 1000, 3)
+				values[name + '_max_ms'] = round(metric.max * 1000, 3)
+		values.update(self.gauges())
+		return values
+
+	def render(self):
+		"""Return the metrics in the Prometheus text exposition format."""
+		with self.lock:
+			metrics = sorted(self.metrics.items())
+		lines = []
+		described = set()
+		for (name, labels), metric in metrics:
+			kind = 'counter' if isinstance(metric, Counter) else 'summary'
+			if name not in described:
+				described.add(name)
+				lines.append(f"# HELP {name} {self.help[name]}")
+				lines.append(f"# TYPE {name} {kind}")
+			if isinstance(metric, Counter):
+				lines.append(f"{name}{labelText(labels)} {metric.value}")
+				continue
+			for q, value in zip(QUANTILES, metric.quantiles()):
+				lines.append(f"{name}{labelText(labels + (('quantile', q),))} {value:.6g}")
+			lines.append(f"{name}_sum{labelText(labels)} {metric.total:.6g}")
+			lines.append(f"{name}_count{labelText(labels)} {metric.count}")
+		for name, value in sorted(self.gauges().items()):
+			lines.append(f"# TYPE {name} gauge")
+			lines.append(f"{name} {value}")
+		return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+class MetricsHandler(BaseHTTPRequestHandler):
+	"""Answer GET /metrics with the process's metrics."""
+
+	def do_GET(self):
+		if self.path.split('?')[0] != '/metrics':
+			self.send_error(404)
+			return
+		body = metrics.render().encode()
+		self.send_response(200)
+		self.send_header('Content-Type', 'text/plain; version=0.0.4')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		log.debug("%s " + format, self.address_string(), *args)
+
+def serveMetrics(port, host='127.0.0.1'):
+	"""Serve the Prometheus endpoint from a background thread; return the HTTP server."""
+	server = ThreadingHTTPServer((host, port + metrics.worker), MetricsHandler)
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+	log.info("Metrics on http://%s:%d/metrics", host, server.server_address[1])
+	return server
@@ -0,0 +1,300 @@
+import argparse, heapq, itertools, random, re, socket, threading, time
+
+from RtspParser import RtspParser, RtspError, headerParams
+
+QUEUE_BYTES = 64 * 1024 # drop-tail queue of a rate-limited link
+
+class Impairment:
+	"""What a link does to the datagrams crossing it.
+
+	Loss is random with probability loss, or follows a Gilbert-Elliott
+	model when burst = (p, r, lossGood, lossBad) is given: p is the chance
+	to go from the good to the bad state and r the chance to come back,
+	per packet. Packets are delayed by delay plus up to jitter seconds
+	(uniformly), which reorders them like a real path would; with
+	probability reorder a packet skips the delay and overtakes the ones
+	ahead of it. With a rate (bits per second) packets are also serialized
+	through a drop-tail queue of queueBytes.
+	"""
+
+	def __init__(self, loss=0.0, burst=None, delay=0.0, jitter=0.0, reorder=0.0, duplicate=0.0,
+				 rate=None, queueBytes=QUEUE_BYTES, seed=None):
+		self.loss = loss
+		self.burst = burst
+		self.delay = delay
+		self.jitter = jitter
+		self.reorder = reorder
+		self.duplicate = duplicate
+		self.rate = rate
+		self.queueBytes = queueBytes
+		self.seed = seed
+
+class ImpairedLink:
+	"""One direction of an emulated path: datagrams sent to it are delivered late, or not at all.
+
+	All randomness comes from one RNG seeded from the Impairment, so a run
+	with the same seed and the same packets makes the same decisions.
+	"""
+
+	def __init__(self, impairment, sock=None):
+		self.impairment = impairment
+		self.rng = random.Random(impairment.seed)
+		self.sock = sock or socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self.cond = threading.Condition()
+		self.heap = []				# (due, order, data, address, socket)
+		self.order = itertools.count()
+		self.free = 0.0				# when the rate limiter has sent the last packet queued
+		self.bad = False			# Gilbert-Elliott state
+		self.running = True
+		self.stats = {'sent': 0, 'lost': 0, 'queueDrops': 0, 'duplicated': 0, 'reordered': 0, 'delivered': 0}
+		threading.Thread(target=self.run, daemon=True).start()
+
+	def lost(self):
+		impairment = self.impairment
+		if impairment.burst:
+			p, r, lossGood, lossBad = impairment.burst
+			self.bad = self.rng.random() >= r if self.bad else self.rng.random() < p
+			return self.rng.random() < (lossBad if self.bad else lossGood)
+		return self.rng.random() < impairment.loss
+
+	def send(self, data, address, sock=None):
+		"""Put a datagram on the link, to be sent to address from sock (the link's own by default)."""
+		impairment = self.impairment
+		now = time.monotonic()
+		with self.cond:
+			self.stats['sent'] += 1
+			if self.lost():
+				self.stats['lost'] += 1
+				return
+			depart = now
+			if impairment.rate:
+				backlog = max(0.0, self.free - now) * impairment.rate / 8
+				if backlog + len(data) > impairment.queueBytes:
+					self.stats['queueDrops'] += 1
+					return
+				self.free = max(self.free, now) + len(data) * 8 / impairment.rate
+				depart = self.free
+			copies = 1
+			if self.rng.random() < impairment.duplicate:
+				self.stats['duplicated'] += 1
+				copies = 2
+			for _ in range(copies):
+				due = depart
+				if self.rng.random() < impairment.reorder:
+					self.stats['reordered'] += 1
+				else:
+					due += impairment.delay + self.rng.uniform(0, impairment.jitter)
+				heapq.heappush(self.heap, (due, next(self.order), data, address, sock or self.sock))
+			self.cond.notify()
+
+	def run(self):
+		while True:
+			with self.cond:
+				while self.running and (not self.heap or self.heap[0][0] > time.monotonic()):
+					self.cond.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+				if not self.running:
+					return
+				_, _, data, address, sock = heapq.heappop(self.heap)
+				self.stats['delivered'] += 1
+			try:
+				sock.sendto(data, address)
+			except OSError:
+				pass
+
+	def close(self):
+		with self.cond:
+			self.running = False
+			self.cond.notify()
+
+def relay(sock, route):
+	"""Forward what arrives on a socket: route(data, source) sends it on. Stops when the socket closes."""
+	while True:
+		try:
+			data, source = sock.recvfrom(65536)
+		except OSError:
+			return
+		route(data, source)
+
+class EmulatedSession:
+	"""RTP and RTCP of one RTSP connection, relayed through the emulated links.
+
+	The server sends RTP and RTCP to the session's own pair of sockets;
+	RTP goes down the downlink to the client, RTCP both ways over its
+	link. The client sends RTCP to the RTCP socket too, which forwards it
+	to the server so the server sees it coming from the address it set up.
+	"""
+
+	def __init__(self, emulator, clientHost):
+		self.emulator = emulator
+		self.clientHost = clientHost
+		self.rtpSocket = self.bind()
+		self.rtcpSocket = self.bind()
+		self.clientRtp = None			# client address RTP and server RTCP go to
+		self.clientRtcp = None
+		self.serverRtcp = None			# the server's RTCP address, from the SETUP reply
+		threading.Thread(target=relay, args=(self.rtpSocket, self.downRtp), daemon=True).start()
+		threading.Thread(target=relay, args=(self.rtcpSocket, self.routeRtcp), daemon=True).start()
+
+	def bind(self):
+		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		sock.bind(('', 0))
+		return sock
+
+	def downRtp(self, data, source):
+		if self.clientRtp:
+			self.emulator.downlink.send(data, self.clientRtp)
+
+	def routeRtcp(self, data, source):
+		if self.clientRtcp is None:
+			return
+		if source == self.clientRtcp:
+			# The server knows the session's RTCP by this socket's address
+			if self.serverRtcp:
+				self.emulator.uplink.send(data, self.serverRtcp, self.rtcpSocket)
+		else:
+			self.emulator.downlink.send(data, self.clientRtcp)
+
+	def rewriteSetup(self, request):
+		"""Point the server at our sockets instead of the client's ports."""
+		value = request.headers.get('Transport')
+		params = headerParams(value)
+		if 'multicast' in params or not params.get('client_port'):
+			return
+		rtpPort, _, rtcpPort = params['client_port'].partition('-')
+		rtpPort = int(rtpPort)
+		rtcpPort = int(rtcpPort) if rtcpPort else rtpPort + 1
+		self.clientRtp = (self.clientHost, rtpPort)
+		self.clientRtcp = (self.clientHost, rtcpPort)
+		ours = f"client_port={self.rtpSocket.getsockname()[1]}-{self.rtcpSocket.getsockname()[1]}"
+		request.headers['Transport'] = re.sub(r'client_port\s*=\s*[\d-]+', ours, value)
+
+	def rewriteReply(self, reply):
+		"""Give the client back its ports, and our RTCP socket as the server's."""
+		value = reply.headers.get('Transport')
+		if not value or self.clientRtp is None:
+			return
+		params = headerParams(value)
+		value = re.sub(r'client_port\s*=\s*[\d-]+', f"client_port={self.clientRtp[1]}-{self.clientRtcp[1]}", value)
+		if params.get('server_port'):
+			self.serverRtcp = (self.emulator.serverAddr, int(params['server_port'].split('-')[-1]))
+			value = re.sub(r'server_port\s*=\s*[\d-]+', f"server_port={self.rtcpSocket.getsockname()[1]}", value)
+		reply.headers['Transport'] = value
+
+	def close(self):
+		self.rtpSocket.close()
+		self.rtcpSocket.close()
+
+class NetEmulator:
+	"""Local RTSP proxy that impairs the RTP/RTCP of the sessions going through it.
+
+	Clients connect to the emulator instead of the server. RTSP passes
+	through unimpaired, but SETUP is rewritten so the media flows through
+	the emulator's sockets and over an ImpairedLink each way. Multicast
+	sessions and DESCRIBE (which connects back to the client) bypass it.
+	"""
+
+	def __init__(self, serverAddr, serverPort, port, downlink, uplink=None):
+		self.serverAddr = serverAddr
+		self.serverPort = serverPort
+		self.port = port
+		self.downlink = ImpairedLink(downlink)
+		self.uplink = ImpairedLink(uplink or Impairment(delay=downlink.delay, jitter=downlink.jitter,
+														seed=None if downlink.seed is None else downlink.seed + 1))
+		self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.listener.bind(('', port))
+		self.listener.listen(16)
+		self.port = self.listener.getsockname()[1]
+
+	def start(self):
+		threading.Thread(target=self.main, daemon=True).start()
+		return self
+
+	def main(self):
+		while True:
+			try:
+				clientSocket, clientAddr = self.listener.accept()
+			except OSError:
+				return
+			threading.Thread(target=self.proxy, args=(clientSocket, clientAddr), daemon=True).start()
+
+	def proxy(self, clientSocket, clientAddr):
+		"""Pass one RTSP connection through, rewriting SETUP and its reply."""
+		serverSocket = socket.create_connection((self.serverAddr, self.serverPort))
+		session = EmulatedSession(self, clientAddr[0])
+		setups = set()		# CSeqs of the SETUP requests still waiting for a reply
+
+		def upstream():
+			parser = RtspParser()
+			try:
+				while not parser.closed:
+					for request in parser.feed(clientSocket.recv(4096)):
+						if request.method == 'SETUP':
+							session.rewriteSetup(request)
+							setups.add(request.cseq())
+						serverSocket.sendall(request.encode())
+			except (OSError, RtspError):
+				pass
+			serverSocket.close()
+
+		threading.Thread(target=upstream, daemon=True).start()
+		parser = RtspParser()
+		try:
+			while not parser.closed:
+				for reply in parser.feed(serverSocket.recv(4096)):
+					if reply.isReply and reply.cseq() in setups:
+						setups.discard(reply.cseq())
+						session.rewriteReply(reply)
+					clientSocket.sendall(reply.encode())
+		except (OSError, RtspError):
+			pass
+		clientSocket.close()
+		session.close()
+
+	def stats(self):
+		return {'downlink': dict(self.downlink.stats), 'uplink': dict(self.uplink.stats)}
+
+	def close(self):
+		self.listener.close()
+		self.downlink.close()
+		self.uplink.close()
+
+def burstOption(value):
+	"""Parse 'p,r[,lossBad[,lossGood]]' Gilbert-Elliott parameters."""
+	values = [float(v) for v in value.split(',')]
+	p, r = values[:2]
+	lossBad = values[2] if len(values) > 2 else 1.0
+	lossGood = values[3] if len(values) > 3 else 0.0
+	return p, r, lossGood, lossBad
+
+def impairmentArguments(parser):
+	"""Add the impairment options to an argument parser."""
+	parser.add_argument('--loss', type=float, default=0.0, help="random packet loss (0-1)")
+	parser.add_argument('--burst', type=burstOption, metavar='P,R[,LOSS_BAD[,LOSS_GOOD]]',
+						help="Gilbert-Elliott burst loss instead of random loss")
+	parser.add_argument('--delay-ms', type=float, default=0.0, help="one-way delay")
+	parser.add_argument('--jitter-ms', type=float, default=0.0, help="extra random delay, up to this much")
+	parser.add_argument('--reorder', type=float, default=0.0, help="share of packets that skip the delay")
+	parser.add_argument('--duplicate', type=float, default=0.0, help="share of packets sent twice")
+	parser.add_argument('--rate-kbps', type=float, help="bandwidth cap of the downlink")
+	parser.add_argument('--queue-kb', type=float, default=QUEUE_BYTES / 1024, help="queue of the bandwidth cap")
+	parser.add_argument('--seed', type=int, help="seed of the random decisions, for reproducible runs")
+
+def impairmentFromArguments(args):
+	return Impairment(args.loss, args.burst, args.delay_ms / 1000, args.jitter_ms / 1000, args.reorder, args.duplicate,
+					  args.rate_kbps * 1000 if args.rate_kbps else None, int(args.queue_kb * 1024), args.seed)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(usage="NetEmulator.py Server_name Server_port Listen_port [impairments]")
+	parser.add_argument('serverAddr')
+	parser.add_argument('serverPort', type=int)
+	parser.add_argument('port', type=int)
+	impairmentArguments(parser)
+	args = parser.parse_args()
+
+	emulator = NetEmulator(args.serverAddr, args.serverPort, args.port, impairmentFromArguments(args))
+	print(f"Emulating on port {emulator.port} for {args.serverAddr}:{args.serverPort}")
+	try:
+		emulator.main()
+	except KeyboardInterrupt:
+		print(emulator.stats())
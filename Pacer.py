@@ -0,0 +1,149 @@
+import heapq, itertools, logging, threading
+from collections import deque
+from time import monotonic
+
+from Metrics import metrics
+
+log = logging.getLogger(__name__)
+
+MAX_CATCH_UP = 2 # late frames sent back-to-back before the rest are dropped
+RETRY_DELAY = 0.002 # seconds before a frame that was not ready is tried again
+
+lateness = metrics.histogram('pacing_lateness_seconds', "How late frames were sent against their deadlines")
+framesDropped = metrics.counter('pacing_frames_dropped_total', "Frames skipped by streams too far behind")
+
+class PacingStats:
+	"""How late each send of a stream was against its deadline."""
+
+	def __init__(self, samples=1024):
+		self.sent = 0
+		self.dropped = 0
+		self.totalLate = 0.0
+		self.maxLate = 0.0
+		self.recent = deque(maxlen=samples)
+
+	def record(self, late):
+		self.sent += 1
+		self.totalLate += late
+		self.maxLate = max(self.maxLate, late)
+		self.recent.append(late)
+
+	def percentile(self, p):
+		"""Return the p-th percentile of the recent lateness samples, in seconds."""
+		if not self.recent:
+			return 0.0
+		samples = sorted(self.recent)
+		return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+	def summary(self):
+		return {
+			'sent': self.sent,
+			'dropped': self.dropped,
+			'meanLateMs': self.totalLate / self.sent * 1000 if self.sent else 0.0,
+			'p99LateMs': self.percentile(99) * 1000,
+			'maxLateMs': self.maxLate * 1000,
+		}
+
+	def __str__(self):
+		return ", ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+						 for key, value in self.summary().items())
+
+class PacedStream:
+	"""Absolute send deadlines of one stream at a fixed frame rate.
+
+	Frame n is due at start + n / fps on a monotonic clock, so time spent
+	reading and sending a frame never pushes the following frames back.
+	A stream that falls behind sends up to MAX_CATCH_UP late frames
+	back-to-back and skips any older ones. A frame that is not ready yet
+	is tried again RETRY_DELAY later, still against its own deadline.
+	"""
+
+	def __init__(self, send, fps, maxCatchUp=MAX_CATCH_UP):
+		self.send = send	# send(skip) sends one frame after skipping some; False when over, None if not ready
+		self.interval = 1.0 / fps
+		self.maxCatchUp = maxCatchUp
+		self.start = 0.0
+		self.next = 0
+		self.retry = 0.0
+		self.active = True
+		self.stats = PacingStats()
+
+	def begin(self, now):
+		self.start = now
+		self.next = 0
+		self.retry = 0.0
+
+	def deadline(self):
+		"""Return when the next frame is due, or when to try it again."""
+		return max(self.start + self.next * self.interval, self.retry)
+
+	def fire(self, now):
+		"""Send the frame that is due, dropping frames if far behind. Return False when over."""
+		late = now - (self.start + self.next * self.interval)
+		skip = max(0, int(late / self.interval) - self.maxCatchUp)
+		if skip:
+			self.next += skip
+			self.stats.dropped += skip
+			framesDropped.inc(skip)
+			late -= skip * self.interval
+		more = self.send(skip)
+		if more is None:
+			self.retry = now + RETRY_DELAY
+			return True
+		self.stats.record(late)
+		lateness.record(late)
+		self.next += 1
+		return more
+
+class PacingScheduler:
+	"""A single thread that sends the frames of every paced stream on time."""
+
+	def __init__(self):
+		self.heap = []
+		self.cond = threading.Condition()
+		self.counter = itertools.count()
+		self.thread = None
+
+	def add(self, stream):
+		"""Start pacing a stream from now."""
+		with self.cond:
+			if self.thread is None:
+				self.thread = threading.Thread(target=self.run, name="PacingScheduler", daemon=True)
+				self.thread.start()
+			stream.begin(monotonic())
+			heapq.heappush(self.heap, (stream.deadline(), next(self.counter), stream))
+			self.cond.notify()
+
+	def remove(self, stream):
+		"""Stop pacing a stream; it leaves the heap when it comes up next."""
+		stream.active = False
+
+	def run(self):
+		while True:
+			with self.cond:
+				while True:
+					if not self.heap:
+						self.cond.wait()
+						continue
+					deadline, _, stream = self.heap[0]
+					if not stream.active:
+						heapq.heappop(self.heap)
+						continue
+					delay = deadline - monotonic()
+					if delay <= 0:
+						heapq.heappop(self.heap)
+						break
+					self.cond.wait(delay)
+
+			try:
+				more = stream.fire(monotonic())
+			except Exception as e:
+				log.error("Pacing error: %s", e)
+				more = False
+			with self.cond:
+				if more and stream.active:
+					heapq.heappush(self.heap, (stream.deadline(), next(self.counter), stream))
+				else:
+					stream.active = False
+
+scheduler = PacingScheduler()
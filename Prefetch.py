@@ -0,0 +1,126 @@
+import logging, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from Metrics import metrics
+
+log = logging.getLogger(__name__)
+
+READ_AHEAD = 8 # frames read ahead of each stream
+IO_THREADS = 4 # reader threads shared by every stream of the process
+RAMP = 2 # reads queued per frame taken, so new streams do not wait behind the full read-ahead of others
+
+readTime = metrics.histogram('prefetch_read_seconds', "Time to read a frame into the page cache ahead of its streams")
+underruns = metrics.counter('prefetch_underruns_total', "Frames that were not read yet when due")
+
+class ReadAhead:
+	"""A FrameCursor whose next frames are brought into the page cache by the shared reader threads.
+
+	Up to `depth` upcoming frames are being read or ready at any time; the
+	read-ahead grows to that by RAMP reads per frame taken, after opening
+	and seeking. The reads are shared by every cursor on the movie (see
+	Media.prefetch), and frames are still handed out as zero-copy slices
+	of the mapping, now warm. nextFrame() only takes a frame that is
+	ready: when the next one is not, it returns None at once, for the
+	pacer to try again shortly, instead of holding up every stream paced
+	on the same thread while the storage catches up.
+	"""
+
+	def __init__(self, cursor, submit, depth):
+		self.cursor = cursor
+		self.filename = cursor.filename
+		self.submit = submit
+		self.depth = depth
+		self.lock = threading.Lock()
+		self.queue = deque()	# warm-up futures of the frames from the cursor's position on
+		self.underruns = 0
+		self.waiting = None		# frame found not read yet, counted once
+		self.fill()
+
+	def fill(self):
+		"""Queue reads up to the read-ahead depth. Call with the lock held, or from __init__."""
+		frameNum = self.cursor.frameNbr() + len(self.queue)
+		end = min(self.cursor.frameNbr() + self.depth, frameNum + RAMP, self.cursor.frameCount())
+		for frameNum in range(frameNum, end):
+			self.queue.append(self.cursor.prefetch(frameNum, self.submit))
+
+	def nextFrame(self):
+		"""Get next frame; None if it is still being read."""
+		with self.lock:
+			if not self.queue:
+				return b''
+			if not self.queue[0].done():
+				if self.waiting != self.cursor.frameNbr():
+					self.waiting = self.cursor.frameNbr()
+					self.underruns += 1
+					underruns.inc()
+				return None
+			self.queue.popleft()
+			data = self.cursor.nextFrame()
+			self.fill()
+			return data
+
+	def frameNbr(self):
+		"""Get frame number."""
+		return self.cursor.frameNbr()
+
+	def seek(self, frameNbr):
+		"""Make the frame after frameNbr the next one to be read."""
+		with self.lock:
+			frameNbr = max(0, min(frameNbr, self.frameCount()))
+			skip = frameNbr - self.cursor.frameNbr()
+			# Reads of frames skipped over are shared with other cursors, so they are left to finish
+			for _ in range(skip if 0 <= skip <= len(self.queue) else len(self.queue)):
+				self.queue.popleft()
+			self.cursor.seek(frameNbr)
+			self.fill()
+
+	def frameCount(self):
+		"""Get the number of frames in the movie."""
+		return self.cursor.frameCount()
+
+	def duration(self, fps):
+		"""Get the length of the movie in seconds."""
+		return self.cursor.duration(fps)
+
+	def close(self):
+		"""Give the movie back; reads still running hold its file open until they are over."""
+		with self.lock:
+			self.queue.clear()
+			self.cursor.close()
+
+class Prefetcher:
+	"""Process-wide pool of reader threads that keeps every stream's next frames read ahead."""
+
+	def __init__(self, depth=READ_AHEAD, threads=IO_THREADS):
+		self.depth = depth
+		self.threads = threads
+		self.lock = threading.Lock()
+		self.pool = None
+
+	def configure(self, depth, threads=IO_THREADS):
+		"""Set the frames read ahead of each stream (0 reads in the send loop) and the reader threads."""
+		self.depth = depth
+		self.threads = threads
+
+	def read(self, function, index):
+		tic = time.perf_counter()
+		function(index)
+		readTime.record(time.perf_counter() - tic)
+
+	def submit(self, function, index):
+		"""Run function(index) on a reader thread; return its future."""
+		return self.pool.submit(self.read, function, index)
+
+	def open(self, cursor):
+		"""Return the cursor reading ahead, or the cursor itself when read-ahead is off."""
+		if self.depth <= 0:
+			return cursor
+		with self.lock:
+			if self.pool is None:
+				# Created on first use, so pre-forked workers each get threads of their own
+				self.pool = ThreadPoolExecutor(self.threads, thread_name_prefix="Prefetch")
+				log.info("Reading %d frames ahead with %d threads", self.depth, self.threads)
+		return ReadAhead(cursor, self.submit, self.depth)
+
+prefetcher = Prefetcher()
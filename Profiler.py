@@ -0,0 +1,188 @@
+import linecache, logging, os, re, sys, threading, time, types
+from collections import Counter
+
+log = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = 0.005 # seconds between samples
+TOP_FUNCTIONS = 30 # functions listed in the report
+
+# Leaf lines and functions that block: a thread sampled there is waiting, not working
+BLOCKING = re.compile(r'\b_?(recv|recvfrom|recv_into|recvmsg|accept|sleep|select|poll|wait|acquire)\(')
+WAITING = {'Condition.wait', 'Event.wait', 'Thread.join', 'Thread._wait_for_tstate_lock', 'Queue.get',
+		   '_worker'} # an idle executor thread of the event loop
+
+# Pipeline stage of a function; a sample counts for the innermost function listed
+STAGES = {
+	'VideoStream.nextFrame': 'read',
+	'VideoStream.seek': 'read',
+	'FrameCursor.nextFrame': 'read',
+	'FrameCursor.prefetch': 'read',
+	'Media.frame': 'read',
+	'Media.warm': 'read',
+	'Prefetcher.read': 'read',
+	'ReadAhead.nextFrame': 'read',
+	'ReadAhead.seek': 'read',
+	'ServerWorker.adaptStream': 'read',
+	'JpegPacketizer.fragments': 'packetize',
+	'ServerWorker.makeRtp': 'packetize',
+	'RtpPacket.encode': 'packetize',
+	'RtpPacket.getPacket': 'getPacket',
+	'RtpPacket.copy': 'history',
+	'SendHistory.add': 'history',
+	'RtpPacket.sendTo': 'send',
+	'RtpProtocol.send': 'send',
+	'ServerWorker.sendTimed': 'send',
+	'ServerWorker.retransmit': 'send',
+	'Channel.sendRtp': 'send',
+	'FecEncoder.add': 'fec',
+	'FecDecoder.media': 'fec',
+	'FecDecoder.parity': 'fec',
+	'PacedStream.fire': 'pacing',
+	'PacingScheduler.run': 'pacing',
+	'RtspClient.listenRtp': 'receive',
+	'RtpPacket.decode': 'receive',
+	'JitterBuffer.put': 'jitter buffer',
+	'JitterBuffer.get': 'jitter buffer',
+	'FrameAssembler.add': 'reassembly',
+	'Client.decodeFrames': 'decode',
+	'Client.updateMovie': 'display',
+	'RtcpEndpoint.run': 'rtcp',
+	'ServerWorker.sendSenderReport': 'rtcp',
+	'ServerWorker.rtcpReceived': 'rtcp',
+	'RtspClient.reportReception': 'rtcp',
+	'RtspClient.requestRetransmission': 'rtcp',
+	'ServerWorker.handleRtspRequest': 'rtsp',
+	'RtspClient.parseRtspReply': 'rtsp',
+	'Histogram.record': 'metrics',
+}
+
+if not hasattr(types.CodeType, 'co_qualname'):
+	# Before Python 3.11 code objects only know their bare name: match stages and waits on that
+	STAGES = {name.rpartition('.')[2]: stage for name, stage in STAGES.items()}
+	WAITING = {name.rpartition('.')[2] for name in WAITING}
+
+def qualname(code):
+	return getattr(code, 'co_qualname', code.co_name)
+
+def frameName(code):
+	return f"{os.path.basename(code.co_filename)}:{qualname(code)}"
+
+class Profiler:
+	"""Sample the stacks of every thread for a window of time, then write what they were doing.
+
+	A thread of its own reads sys._current_frames() every interval, so the
+	profiled code runs unchanged, and nothing runs at all when profiling is
+	off. Samples of threads blocked in recv, wait, select and the like are
+	counted as idle and left out of the breakdowns and the stacks.
+
+	Two files are written, tagged with the pid so pre-forked workers do not
+	overwrite each other: <output>-<pid>.collapsed, one 'thread;frame;...
+	count' line per stack for flamegraph.pl or speedscope, and
+	<output>-<pid>.txt with the time per pipeline stage, per thread and
+	per function.
+	"""
+
+	def __init__(self, duration, output='profile', delay=0.0, interval=SAMPLE_INTERVAL):
+		self.duration = duration
+		self.output = output
+		self.delay = delay
+		self.interval = interval
+		self.samples = Counter()	# (thread name, code objects from the root, leaf line) -> samples
+		self.rounds = 0
+		self.elapsed = 0.0
+
+	def start(self):
+		threading.Thread(target=self.run, name="Profiler", daemon=True).start()
+		return self
+
+	def run(self):
+		time.sleep(self.delay)
+		log.info("Profiling for %.0f s", self.duration)
+		start = time.monotonic()
+		end = start + self.duration
+		while time.monotonic() < end:
+			self.sample()
+			time.sleep(self.interval)
+		self.elapsed = time.monotonic() - start
+		for path in self.write():
+			log.info("Profile written to %s", path)
+
+	def sample(self):
+		names = {thread.ident: thread.name for thread in threading.enumerate()}
+		own = threading.get_ident()
+		for ident, frame in sys._current_frames().items():
+			if ident == own:
+				continue
+			leafLine = frame.f_lineno
+			codes = []
+			while frame is not None:
+				codes.append(frame.f_code)
+				frame = frame.f_back
+			codes.reverse()
+			self.samples[(names.get(ident, str(ident)), tuple(codes), leafLine)] += 1
+		self.rounds += 1
+
+	def idle(self, codes, leafLine):
+		leaf = codes[-1]
+		return qualname(leaf) in WAITING or bool(BLOCKING.search(linecache.getline(leaf.co_filename, leafLine)))
+
+	def stage(self, codes):
+		for code in reversed(codes):
+			stage = STAGES.get(qualname(code))
+			if stage:
+				return stage
+		return 'other'
+
+	def write(self):
+		"""Write the collapsed stacks and the report; return their paths."""
+		active = Counter()
+		stages = Counter()
+		threads = Counter()
+		selfTime = Counter()
+		totalTime = Counter()
+		idle = 0
+		for (thread, codes, leafLine), count in self.samples.items():
+			if self.idle(codes, leafLine):
+				idle += count
+				continue
+			active[(thread, codes)] += count
+			stages[self.stage(codes)] += count
+			threads[thread] += count
+			selfTime[frameName(codes[-1])] += count
+			for name in {frameName(code) for code in codes}:
+				totalTime[name] += count
+
+		prefix = f"{self.output}-{os.getpid()}"
+		with open(prefix + '.collapsed', 'w') as f:
+			for (thread, codes), count in sorted(active.items(), key=lambda item: -item[1]):
+				f.write(';'.join([thread] + [frameName(code) for code in codes]) + f" {count}\n")
+
+		working = sum(stages.values())
+		ms = self.elapsed / self.rounds * 1000 if self.rounds else 0.0 # a round takes longer than the interval
+		def share(count):
+			return f"{count / working:7.1%} {count * ms:9.0f} ms" if working else ""
+		lines = [f"Profile of pid {os.getpid()}: {self.rounds} rounds of samples over {self.elapsed:.1f} s, "
+				 f"every {ms:.0f} ms; {working} samples working, {idle} idle",
+				 "", "Stages:"]
+		lines += [f"  {stage:<14} {share(count)}" for stage, count in stages.most_common()]
+		lines += ["", "Threads:"]
+		lines += [f"  {thread:<24} {share(count)}" for thread, count in threads.most_common()]
+		lines += ["", "Functions by self time (self, then including callees):"]
+		for name, count in selfTime.most_common(TOP_FUNCTIONS):
+			lines.append(f"  {share(count)} {share(totalTime[name])}  {name}")
+		lines += ["", "Functions by time including callees:"]
+		for name, count in totalTime.most_common(TOP_FUNCTIONS):
+			lines.append(f"  {share(count)}  {name}")
+		with open(prefix + '.txt', 'w') as f:
+			f.write('\n'.join(lines) + '\n')
+		return [prefix + '.collapsed', prefix + '.txt']
+
+def profileArguments(parser):
+	"""Add the profiling options to an argument parser."""
+	parser.add_argument('--profile', type=float, metavar='SECONDS',
+						help="sample what every thread is doing for this long, then write a profile "
+							 "(before Python 3.11, functions are named without their class)")
+	parser.add_argument('--profile-delay', type=float, default=0.0, metavar='SECONDS',
+						help="wait this long before profiling, e.g. until clients are playing")
+	parser.add_argument('--profile-output', default='profile', metavar='PREFIX',
+						help="profile files are PREFIX-<pid>.collapsed and PREFIX-<pid>.txt")
@@ -0,0 +1,73 @@
+import glob, os, re
+
+LOSS_HIGH = 0.05 # a report losing more than this steps the quality down
+LOSS_LOW = 0.01 # STEP_UP_REPORTS reports in a row losing less than this step it back up
+STEP_UP_REPORTS = 4
+DECIMATIONS = (1, 2, 4) # send every frame, every 2nd, every 4th
+
+def renditions(filename):
+	"""Return the renditions of a movie, best first.
+
+	Lower-quality renditions are pre-transcoded next to the movie as
+	name@<height>.ext (e.g. movie@480.Mjpeg) and have the same frames;
+	the higher the height, the better the rendition.
+	"""
+	stem, ext = os.path.splitext(filename)
+	found = []
+	for path in glob.glob(glob.escape(stem) + '@*' + glob.escape(ext)):
+		match = re.fullmatch(r'@(\d+)', path[len(stem):len(path) - len(ext)])
+		if match:
+			found.append((int(match.group(1)), path))
+	return [filename] + [path for _, path in sorted(found, reverse=True)]
+
+class RateAdapter:
+	"""Quality ladder of one session, moved by the receiver's loss reports.
+
+	Each level is a (rendition, decimation) pair: the ladder goes down
+	through the renditions at the full frame rate, then sends only every
+	2nd and 4th frame of the lowest one. Loss steps down at once; the way
+	back up is taken one level at a time after a run of clean reports.
+	"""
+
+	def __init__(self, filenames):
+		self.levels = [(filename, 1) for filename in filenames]
+		self.levels += [(filenames[-1], decimation) for decimation in DECIMATIONS[1:]]
+		self.level = 0
+		self.fixed = False		# Level set by the client with SET_PARAMETER; reports are ignored
+		self.cleanReports = 0
+		self.changes = 0
+
+	def report(self, fractionLost):
+		"""Take the loss fraction of a Receiver Report. Return True if the level changed."""
+		if self.fixed:
+			return False
+		if fractionLost > LOSS_HIGH:
+			self.cleanReports = 0
+			return self.setLevel(self.level + 1)
+		if fractionLost >= LOSS_LOW:
+			self.cleanReports = 0
+			return False
+		self.cleanReports += 1
+		if self.cleanReports < STEP_UP_REPORTS:
+			return False
+		self.cleanReports = 0
+		return self.setLevel(self.level - 1)
+
+	def setLevel(self, level, fixed=None):
+		"""Move to a level, clamped to the ladder. Return True if it changed."""
+		if fixed is not None:
+			self.fixed = fixed
+		level = max(0, min(level, len(self.levels) - 1))
+		if level == self.level:
+			return False
+		self.level = level
+		self.changes += 1
+		return True
+
+	def rendition(self):
+		"""Return the file to stream at the current level."""
+		return self.levels[self.level][0]
+
+	def sendsFrame(self, frameNbr):
+		"""Return True if the frame at a 0-based index is sent at the current level."""
+		return frameNbr % self.levels[self.level][1] == 0
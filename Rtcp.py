@@ -0,0 +1,220 @@
+import logging, socket, struct, threading
+from time import time
+
+log = logging.getLogger(__name__)
+
+SR = 200 # Sender Report packet type
+RR = 201 # Receiver Report packet type
+RTPFB = 205 # Transport layer feedback packet type (RFC 4585)
+GENERIC_NACK = 1 # RTPFB format of a generic NACK
+RTCP_INTERVAL = 5.0 # Seconds between reports (RFC 3550 minimum)
+NTP_OFFSET = 2208988800 # Seconds from 1900 (NTP epoch) to 1970
+
+# V/P/RC, PT, length in 32-bit words minus one
+RTCP_HEADER = struct.Struct('!BBH')
+# SSRC of sender, NTP timestamp (seconds, fraction), RTP timestamp, packet count, octet count
+SENDER_INFO = struct.Struct('!IIIIII')
+# SSRC, fraction lost + cumulative lost, extended highest sequence number, jitter, LSR, DLSR
+REPORT_BLOCK = struct.Struct('!IIIIII')
+# SSRC of packet sender, SSRC of media source
+FEEDBACK_HEADER = struct.Struct('!II')
+# PID (first lost sequence number), BLP (bitmask of the 16 following ones)
+NACK_ENTRY = struct.Struct('!HH')
+
+def ntpTime(t=None):
+	"""Return a wall clock time as a 64-bit NTP timestamp (seconds, fraction)."""
+	if t is None:
+		t = time()
+	seconds = int(t)
+	return (seconds + NTP_OFFSET) & 0xFFFFFFFF, int((t - seconds) * (1 << 32)) & 0xFFFFFFFF
+
+def ntpMiddle(ntp):
+	"""Return the middle 32 bits of an NTP timestamp, as used by LSR and round-trip times."""
+	return ((ntp[0] & 0xFFFF) << 16) | (ntp[1] >> 16)
+
+class ReportBlock:
+	"""Reception statistics about one source (RFC 3550 6.4.1)."""
+
+	def __init__(self, ssrc, fractionLost, cumulativeLost, highestSeq, jitter, lsr=0, dlsr=0):
+		self.ssrc = ssrc
+		self.fractionLost = fractionLost		# Lost since the last report, in 1/256
+		self.cumulativeLost = cumulativeLost	# Packets lost since reception began (may be negative)
+		self.highestSeq = highestSeq			# Extended highest sequence number received
+		self.jitter = jitter					# Interarrival jitter, in timestamp units
+		self.lsr = lsr							# Middle 32 bits of the last SR's NTP timestamp
+		self.dlsr = dlsr						# Delay since that SR, in 1/65536 s
+
+	def encode(self):
+		return REPORT_BLOCK.pack(self.ssrc & 0xFFFFFFFF,
+			(self.fractionLost & 0xFF) << 24 | (self.cumulativeLost & 0xFFFFFF),
+			self.highestSeq & 0xFFFFFFFF, self.jitter & 0xFFFFFFFF, self.lsr, self.dlsr)
+
+	@classmethod
+	def decode(cls, data, offset):
+		ssrc, lost, highestSeq, jitter, lsr, dlsr = REPORT_BLOCK.unpack_from(data, offset)
+		cumulativeLost = lost & 0xFFFFFF
+		if cumulativeLost & 0x800000:
+			cumulativeLost -= 0x1000000 # 24-bit signed
+		return cls(ssrc, lost >> 24, cumulativeLost, highestSeq, jitter, lsr, dlsr)
+
+	def roundTrip(self, arrival=None):
+		"""Return the round-trip time in seconds from LSR and DLSR, or None without an SR."""
+		if not self.lsr:
+			return None
+		now = ntpMiddle(ntpTime(arrival))
+		return ((now - self.lsr - self.dlsr) & 0xFFFFFFFF) / 65536
+
+class SenderReport:
+	"""RTCP SR: what a sender has sent, with its NTP to RTP timestamp mapping."""
+
+	packetType = SR
+
+	def __init__(self, ssrc, ntp, rtpTimestamp, packets, octets, blocks=()):
+		self.ssrc = ssrc
+		self.ntp = ntp
+		self.rtpTimestamp = rtpTimestamp
+		self.packets = packets
+		self.octets = octets
+		self.blocks = list(blocks)
+
+	def encode(self):
+		words = (SENDER_INFO.size + REPORT_BLOCK.size * len(self.blocks)) // 4
+		return (RTCP_HEADER.pack(2 << 6 | len(self.blocks), SR, words)
+				+ SENDER_INFO.pack(self.ssrc & 0xFFFFFFFF, self.ntp[0], self.ntp[1], self.rtpTimestamp & 0xFFFFFFFF,
+								   self.packets & 0xFFFFFFFF, self.octets & 0xFFFFFFFF)
+				+ b''.join(block.encode() for block in self.blocks))
+
+class ReceiverReport:
+	"""RTCP RR: reception statistics of a receiver that does not send."""
+
+	packetType = RR
+
+	def __init__(self, ssrc, blocks=()):
+		self.ssrc = ssrc
+		self.blocks = list(blocks)
+
+	def encode(self):
+		words = (4 + REPORT_BLOCK.size * len(self.blocks)) // 4
+		return (RTCP_HEADER.pack(2 << 6 | len(self.blocks), RR, words) + struct.pack('!I', self.ssrc & 0xFFFFFFFF)
+				+ b''.join(block.encode() for block in self.blocks))
+
+class Nack:
+	"""RTCP generic NACK: the sequence numbers a receiver asks to be sent again (RFC 4585 6.2.1)."""
+
+	packetType = RTPFB
+
+	def __init__(self, ssrc, mediaSsrc, lost):
+		self.ssrc = ssrc
+		self.mediaSsrc = mediaSsrc
+		self.lost = list(lost)
+
+	def encode(self):
+		entries = []
+		for seq in sorted(self.lost):
+			# Later sequence numbers within 16 of the last PID go into its bitmask
+			if entries and 0 < (seq - entries[-1][0]) & 0xFFFF <= 16:
+				entries[-1][1] |= 1 << (((seq - entries[-1][0]) & 0xFFFF) - 1)
+			else:
+				entries.append([seq & 0xFFFF, 0])
+		words = (FEEDBACK_HEADER.size + NACK_ENTRY.size * len(entries)) // 4
+		return (RTCP_HEADER.pack(2 << 6 | GENERIC_NACK, RTPFB, words)
+				+ FEEDBACK_HEADER.pack(self.ssrc & 0xFFFFFFFF, self.mediaSsrc & 0xFFFFFFFF)
+				+ b''.join(NACK_ENTRY.pack(pid, blp) for pid, blp in entries))
+
+def decode(data):
+	"""Return the SRs, RRs and NACKs of a (compound) RTCP packet; other packet types are skipped.
+
+	Decoding stops at the first packet that is malformed or too short for
+	what its header says it holds, keeping the reports before it.
+	"""
+	reports = []
+	offset = 0
+	while offset + RTCP_HEADER.size <= len(data):
+		first, packetType, words = RTCP_HEADER.unpack_from(data, offset)
+		end = offset + (words + 1) * 4
+		if first >> 6 != 2 or end > len(data):
+			break # Not RTCP version 2, or truncated
+		count = first & 0x1F
+		body = offset + RTCP_HEADER.size
+		if packetType == SR:
+			if body + SENDER_INFO.size + count * REPORT_BLOCK.size > end:
+				break # Fewer report blocks than counted
+			ssrc, msw, lsw, rtpTimestamp, packets, octets = SENDER_INFO.unpack_from(data, body)
+			body += SENDER_INFO.size
+			blocks = [ReportBlock.decode(data, body + i * REPORT_BLOCK.size) for i in range(count)]
+			reports.append(SenderReport(ssrc, (msw, lsw), rtpTimestamp, packets, octets, blocks))
+		elif packetType == RR:
+			if body + 4 + count * REPORT_BLOCK.size > end:
+				break
+			ssrc, = struct.unpack_from('!I', data, body)
+			body += 4
+			blocks = [ReportBlock.decode(data, body + i * REPORT_BLOCK.size) for i in range(count)]
+			reports.append(ReceiverReport(ssrc, blocks))
+		elif packetType == RTPFB and count == GENERIC_NACK:
+			if body + FEEDBACK_HEADER.size > end:
+				break
+			ssrc, mediaSsrc = FEEDBACK_HEADER.unpack_from(data, body)
+			lost = []
+			for entry in range(body + FEEDBACK_HEADER.size, end - NACK_ENTRY.size + 1, NACK_ENTRY.size):
+				pid, blp = NACK_ENTRY.unpack_from(data, entry)
+				lost.append(pid)
+				lost += [(pid + bit + 1) & 0xFFFF for bit in range(16) if blp >> bit & 1]
+			reports.append(Nack(ssrc, mediaSsrc, lost))
+		offset = end
+	return reports
+
+class RtcpEndpoint:
+	"""The server's RTCP socket, shared by every session of the process.
+
+	Sender Reports go out from it, and Receiver Reports coming in are handed
+	to the session registered for the address they come from.
+	"""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.sock = None
+		self.handlers = {}	# (address, port) -> handler(report, arrival)
+
+	def port(self):
+		"""Return the local port, opening the socket on first use."""
+		with self.lock:
+			if self.sock is None:
+				self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+				self.sock.bind(('', 0))
+				threading.Thread(target=self.run, name="RtcpEndpoint", daemon=True).start()
+			return self.sock.getsockname()[1]
+
+	def register(self, address, handler):
+		self.port()
+		with self.lock:
+			self.handlers[address] = handler
+
+	def unregister(self, address):
+		with self.lock:
+			self.handlers.pop(address, None)
+
+	def send(self, report, address):
+		try:
+			self.sock.sendto(report.encode(), address)
+		except OSError:
+			log.warning("Connection Error")
+
+	def run(self):
+		while True:
+			data, address = self.sock.recvfrom(2048)
+			arrival = time()
+			handler = self.handlers.get(address)
+			if handler is None:
+				continue
+			try:
+				reports = decode(data)
+			except (struct.error, ValueError) as e:
+				log.warning("Malformed RTCP packet from %s: %s", address, e)
+				continue
+			for report in reports:
+				try:
+					handler(report, arrival)
+				except Exception as e:
+					log.error("RTCP error: %s", e)
+
+rtcpEndpoint = RtcpEndpoint()
@@ -0,0 +1,89 @@
+import struct
+
+# RFC 2435 main JPEG header: type-specific/fragment offset, type, Q, width/8, height/8
+JPEG_HEADER = struct.Struct('!IBBBB')
+JPEG_HEADER_SIZE = JPEG_HEADER.size
+
+DEFAULT_MTU = 1400 # bytes of UDP payload per packet (RTP header included)
+CLOCK_RATE = 90000 # RTP timestamp units per second for JPEG video
+
+def imageSize(frame):
+	"""Return (width, height) from the JPEG SOF segment, or (0, 0) if not found."""
+	head = bytes(frame[:4096])
+	for marker in (b'\xff\xc0', b'\xff\xc1', b'\xff\xc2'):
+		pos = head.find(marker)
+		if pos >= 0 and pos + 9 <= len(head):
+			height, width = struct.unpack_from('!HH', head, pos + 5)
+			return width, height
+	return 0, 0
+
+class JpegPacketizer:
+	"""Split JPEG frames into MTU-sized RTP payloads as in RFC 2435.
+
+	Unlike RFC 2435 the fragments carry the complete JPEG file rather than
+	the bare scan data, so the receiver needs no table reconstruction; the
+	type, Q and size fields are informational.
+	"""
+
+	def __init__(self, mtu=DEFAULT_MTU):
+		self.chunkSize = mtu - 12 - JPEG_HEADER_SIZE
+		self.header = bytearray(JPEG_HEADER_SIZE)
+
+	def fragments(self, frame):
+		"""Yield (payload header, chunk, last) for every fragment of a frame.
+
+		The payload header buffer is reused, so send each fragment before
+		asking for the next one.
+		"""
+		frame = memoryview(frame)
+		width, height = imageSize(frame)
+		size = len(frame)
+		for offset in range(0, size, self.chunkSize):
+			JPEG_HEADER.pack_into(self.header, 0, offset & 0xFFFFFF, 1, 255,
+								  min(width // 8, 255), min(height // 8, 255))
+			chunk = frame[offset:offset + self.chunkSize]
+			yield self.header, chunk, offset + len(chunk) >= size
+
+def newer(a, b):
+	"""Return True if 32-bit RTP timestamp a is after b, allowing for wraparound."""
+	return a != b and (a - b) & 0xFFFFFFFF < 0x80000000
+
+class FrameAssembler:
+	"""Rebuild JPEG frames from RTP fragments, keyed by RTP timestamp.
+
+	A frame is complete once the fragment with the marker bit has arrived and
+	the fragments cover it without gaps. Completing a frame discards every
+	older incomplete frame; late fragments of those are ignored.
+	"""
+
+	def __init__(self):
+		self.pending = {}
+		self.lastTimestamp = None
+		self.discarded = 0
+
+	def add(self, rtpPacket):
+		"""Add a fragment. Return the frame it completes as bytes, or None."""
+		timestamp = rtpPacket.timestamp()
+		if self.lastTimestamp is not None and not newer(timestamp, self.lastTimestamp):
+			return None
+		payload = rtpPacket.getPayload()
+		fragmentOffset = JPEG_HEADER.unpack_from(payload)[0] & 0xFFFFFF
+		frame = self.pending.setdefault(timestamp, {'chunks': {}, 'size': None, 'received': 0})
+		chunk = payload[JPEG_HEADER_SIZE:]
+		if fragmentOffset not in frame['chunks']:
+			frame['chunks'][fragmentOffset] = chunk
+			frame['received'] += len(chunk)
+		if rtpPacket.marker():
+			frame['size'] = fragmentOffset + len(chunk)
+		if frame['size'] is None or frame['received'] != frame['size']:
+			return None
+
+		# Complete: drop it and every older frame still waiting for fragments
+		for ts in list(self.pending):
+			if ts == timestamp or newer(timestamp, ts):
+				if ts != timestamp:
+					self.discarded += 1
+				del self.pending[ts]
+		self.lastTimestamp = timestamp
+		chunks = frame['chunks']
+		return b''.join(chunks[offset] for offset in sorted(chunks))
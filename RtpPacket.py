@@ -1,49 +1,41 @@
-import sys
-from time import time
+import struct
 HEADER_SIZE = 12
 
+# V/P/X/CC, M/PT, sequence number, timestamp, SSRC
+RTP_HEADER = struct.Struct('!BBHII')
+
 class RtpPacket:	
 	header = bytearray(HEADER_SIZE)
 	
 	def __init__(self):
-		pass
-		
-	def encode(self, version, padding, extension, cc, seqnum, marker, pt, ssrc, payload):
-		"""Encode the RTP packet with header fields and payload."""
-		timestamp = int(time())
 		self.header = bytearray(HEADER_SIZE)
+		self.payloadHeader = b''
+		
+	def encode(self, version, padding, extension, cc, seqnum, marker, pt, ssrc, payload, timestamp=0, payloadHeader=b''):
+		"""Encode the RTP packet with header fields and payload.
 
-		# Fill the header bytearray with RTP header fields
-		self.header[0] = version << 6						# 2 bits for version
-		self.header[0] = self.header[0] | padding << 5		# 1 bit for padding
-		self.header[0] = self.header[0] | extension << 4	# 1 bit for extension
-		self.header[0] = self.header[0] | (cc & 0xF)		# 4 remained bits for contributing sources
-
-		self.header[1] = marker << 7						# 1 bit for marker
-		self.header[1] = self.header[1] | (pt & 0x7F)		# 7 remained bits for payload type
-
-		# 2 bytes for sequence number
-		self.header[2] = (seqnum >> 8) & 0xFF
-		self.header[3] = seqnum & 0xFF
-
-		# 4 bytes for timestamp
-		self.header[4] = (timestamp >> 24) & 0xFF
-		self.header[5] = (timestamp >> 16) & 0xFF
-		self.header[6] = (timestamp >> 8) & 0xFF
-		self.header[7] = timestamp & 0xFF
-
-		# 4 bytes for synchronization source identifier
-		self.header[8] = (ssrc >> 24) & 0xFF
-		self.header[9] = (ssrc >> 16) & 0xFF
-		self.header[10] = (ssrc >> 8) & 0xFF
-		self.header[11] = ssrc & 0xFF
+		The header is packed in place, so one RtpPacket can be reused for
+		every packet of a stream without allocating a new header buffer.
+		A payload-format header (e.g. the RFC 2435 JPEG header) can be given
+		separately so it is sent in front of the payload without joining them.
+		The timestamp is on the payload's media clock (90 kHz for JPEG); the
+		sequence number and timestamp wrap at 16 and 32 bits.
+		"""
+		RTP_HEADER.pack_into(self.header, 0,
+			version << 6 | padding << 5 | extension << 4 | (cc & 0xF),	# V(2) P(1) X(1) CC(4)
+			marker << 7 | (pt & 0x7F),									# M(1) PT(7)
+			seqnum & 0xFFFF,
+			timestamp & 0xFFFFFFFF,
+			ssrc & 0xFFFFFFFF)
 		
 		# Get the payload from the argument
+		self.payloadHeader = payloadHeader
 		self.payload = payload
 		
 	def decode(self, byteStream):
 		"""Decode the RTP packet."""
 		self.header = bytearray(byteStream[:HEADER_SIZE])
+		self.payloadHeader = b''
 		self.payload = byteStream[HEADER_SIZE:]
 	
 	def version(self):
@@ -51,7 +43,7 @@ class RtpPacket:
 		return int(self.header[0] >> 6)
 	
 	def seqNum(self):
-		"""Return sequence (frame) number."""
+		"""Return sequence number."""
 		seqNum = self.header[2] << 8 | self.header[3]
 		return int(seqNum)
 	
@@ -60,6 +52,14 @@ class RtpPacket:
 		timestamp = self.header[4] << 24 | self.header[5] << 16 | self.header[6] << 8 | self.header[7]
 		return int(timestamp)
 	
+	def ssrc(self):
+		"""Return the synchronization source identifier."""
+		return int.from_bytes(self.header[8:12], 'big')
+
+	def marker(self):
+		"""Return the marker bit (last fragment of a frame)."""
+		return int(self.header[1] >> 7)
+
 	def payloadType(self):
 		"""Return payload type."""
 		pt = self.header[1] & 127
@@ -67,8 +67,31 @@ class RtpPacket:
 	
 	def getPayload(self):
 		"""Return payload."""
+		if self.payloadHeader:
+			return self.payloadHeader + self.payload
 		return self.payload
 		
 	def getPacket(self):
 		"""Return RTP packet."""
-		return self.header + self.payload
\ No newline at end of file
+		return self.header + self.payloadHeader + self.payload
+
+	def size(self):
+		"""Return the size of the packet in bytes."""
+		return len(self.header) + len(self.payloadHeader) + len(self.payload)
+
+	def copy(self):
+		"""Return a copy of the packet that shares its payload instead of copying it."""
+		rtpPacket = RtpPacket()
+		rtpPacket.header = bytearray(self.header)
+		rtpPacket.payloadHeader = bytes(self.payloadHeader)
+		rtpPacket.payload = self.payload
+		return rtpPacket
+
+	def sendTo(self, sock, address):
+		"""Send header and payload with one scatter/gather call, without joining them.
+
+		Where sockets have no sendmsg (Windows), the packet is joined and sent with sendto.
+		"""
+		if hasattr(sock, 'sendmsg'):
+			return sock.sendmsg((self.header, self.payloadHeader, self.payload), (), 0, address)
+		return sock.sendto(self.getPacket(), address)
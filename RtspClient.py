@@ -0,0 +1,648 @@
+import socket, struct, threading
+import time, random, logging
+
+from RtpPacket import RtpPacket
+from RtpJpeg import FrameAssembler
+from JitterBuffer import JitterBuffer, MIN_DELAY, MAX_DELAY
+from RtspParser import RtspParser, RtspError, headerParams
+from Fec import FecDecoder, FEC_PT, FEC_HOLDOFF
+from Rtcp import ReceiverReport, ReportBlock, SenderReport, Nack, RTCP_INTERVAL, ntpMiddle, decode
+
+log = logging.getLogger(__name__)
+
+class RtspClient:
+	"""RTSP state machine and RTP receive path of a client, without any GUI.
+
+	Client adds the Tk interface on top of it; on its own it is a headless
+	client for scripts and load generation. Subclasses react to events by
+	overriding frameReceived, rangeReceived and showWarning.
+	"""
+	INIT = 0
+	READY = 1
+	PLAYING = 2
+	state = INIT
+	
+	SETUP = 0
+	PLAY = 1
+	PAUSE = 2
+	STOP = 3
+	TEARDOWN = 4
+	DESCRIBE = 5
+	GET_PARAMETER = 6
+	SET_PARAMETER = 7
+	
+	# Initiation..
+	def __init__(self, serveraddr, serverport, rtpport, filename, minDelay=MIN_DELAY, maxDelay=MAX_DELAY,
+				 broadcast=None, fec=None):
+		self.serverAddr = serveraddr			# IP address of the server
+		self.serverPort = int(serverport)		# Port number of the server
+		self.rtpPort = int(rtpport)				# Port number for RTP Packet Listener
+		self.fileName = filename
+		self.broadcast = broadcast				# None, or 'fanout' or 'multicast' to join a shared broadcast
+		self.fec = fec							# None, or (group size, interleaving depth) of FEC to ask for
+		self.fecDecoder = None					# Rebuilds lost packets if the server sends FEC
+		self.transport = {}						# Transport parameters of the SETUP reply
+		self.rtspSeq = 0						# Current request sequence number
+		self.sessionId = 0						# Client session ID
+		self.requestSent = -1					# Request code
+		self.teardownAcked = 0					# Flag to teardown all conections and stop client
+		self.frameNbr = 0						# Number of frames displayed
+		self.seekPos = None						# Position (seconds) to play from on the next PLAY
+		self.lastSeq = None						# Highest RTP sequence number received
+		self.packetsRecv = 0					# Number of RTP packets received
+		self.assembler = FrameAssembler()		# Rebuilds frames from their RTP fragments
+		self.jitterDelay = (minDelay, maxDelay)	# Bounds of the adaptive playout delay (seconds)
+		self.jitterBuffer = JitterBuffer(minDelay=minDelay, maxDelay=maxDelay)
+		self.replyEvent = threading.Event()		# Set once the reply to the last request is processed
+		self.requestTime = 0.0					# When the last request was sent
+		self.rtspRtts = []						# Round-trip times of the RTSP requests (seconds)
+		self.sessionTimeout = 60				# Session timeout announced by the server (seconds)
+		self.requestLock = threading.RLock()	# Keeps keep-alives from interleaving with other requests
+		self.keepAliveSeq = None				# CSeq of the last keep-alive
+		self.ssrc = random.getrandbits(32)		# Our SSRC in RTCP Receiver Reports
+		self.rtcpSocket = None					# RTCP socket, on the port after the RTP port
+		self.rtcpAddress = None					# The server's RTCP address
+		self.nextNack = 0.0						# When to look for missing packets to NACK next
+		self.lastSr = None						# (server SSRC, LSR, arrival) of the last Sender Report
+		self.rtcpInterval = RTCP_INTERVAL		# Seconds between Receiver Reports
+		self.quality = 'auto'					# Quality level asked for with SET_PARAMETER
+
+		# Keep track of lost packet if any
+		self.lostPacket = 0
+
+		# Payload bytes received, and the time spent receiving them
+		self.bytesRecv = 0
+		self.firstArrival = None
+		self.lastArrival = 0.0
+		self.recvTime = 0.0
+
+		# Connect and automatically setup the movie
+		self.connectToServer()
+		self.setupMovie()
+
+	def connectToServer(self):
+		"""Connect to the Server. Start a new RTSP/TCP session."""
+		self.rtspSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		try:
+			self.rtspSocket.connect((self.serverAddr, self.serverPort))
+		except:
+			self.showWarning("Connection Failed", f"Connection to \'{self.serverAddr}\' failed.")
+
+	###################################### CONTROL FUNCTIONS #######################################
+	def setupMovie(self):
+		"""Setup button handler."""
+		if self.state == self.INIT:
+			self.sendRtspRequest(self.SETUP)
+	
+	def playMovie(self):
+		"""Play button handler."""
+		if self.state == self.READY:
+			self.playEvent = threading.Event()
+			self.playEvent.clear()
+			self.jitterBuffer.rebase()
+			# The data rate only counts time spent playing
+			if self.firstArrival is not None:
+				self.recvTime += self.lastArrival - self.firstArrival
+				self.firstArrival = None
+			if self.broadcast:
+				self.lastSeq = None # The live stream moved on while paused; that is not loss
+			# Create threads to listen for RTP packets and to play them out
+			threading.Thread(target=self.listenRtp, name="RtpReceiver").start()
+			threading.Thread(target=self.playRtp, name="Playout").start()
+			self.sendRtspRequest(self.PLAY)
+	
+	def pauseMovie(self):
+		"""Pause button handler."""
+		if self.state == self.PLAYING:
+			self.sendRtspRequest(self.PAUSE)
+	
+	def stopMovie(self):
+		self.sendRtspRequest(self.STOP)
+
+	def seekMovie(self, position):
+		"""Play from a position in seconds."""
+		if self.state == self.INIT:
+			return
+		self.seekPos = position
+		if self.state == self.READY:
+			self.playMovie()
+		else:
+			self.sendRtspRequest(self.PLAY)
+
+	def teardownMovie(self):
+		"""End the RTSP session."""
+		self.sendRtspRequest(self.TEARDOWN)
+	
+	def getDescription(self):
+		"""Describe button handler."""
+		self.sendRtspRequest(self.DESCRIBE)
+
+	def setQuality(self, level):
+		"""Fix the server's quality level (0 is the best), or let it adapt again with 'auto'."""
+		self.quality = level
+		self.sendRtspRequest(self.SET_PARAMETER)
+
+	def keepAlive(self):
+		"""Refresh the session with GET_PARAMETER when no other request has done so lately."""
+		while self.state != self.INIT and not self.teardownAcked:
+			time.sleep(min(1.0, self.sessionTimeout / 4))
+			if time.perf_counter() - self.requestTime > self.sessionTimeout / 2:
+				self.sendRtspRequest(self.GET_PARAMETER)
+
+	def waitForReply(self, timeout=None):
+		"""Wait until the reply to the last request has been processed. Return False on timeout."""
+		return self.replyEvent.wait(timeout)
+
+	############################### RTP PACKET LISTENER ############################################
+	def listenRtp(self):		
+		"""Listen for RTP packets."""
+		debug = log.isEnabledFor(logging.DEBUG) # Checked once: the per-packet path logs nothing otherwise
+		while True:
+			try:
+				data, addr = self.rtpSocket.recvfrom(65536)
+				if data:
+					arrival = time.perf_counter()
+					if self.firstArrival is None:
+						self.firstArrival = arrival
+					self.lastArrival = arrival
+
+					rtpPacket = RtpPacket()
+					rtpPacket.decode(data)
+					self.bytesRecv += len(rtpPacket.getPayload())
+					if debug:
+						log.debug("RTP packet %d, %d bytes", rtpPacket.seqNum(), len(data))
+					if rtpPacket.payloadType() == FEC_PT:
+						recovered = self.fecDecoder.parity(rtpPacket) if self.fecDecoder else []
+					else:
+						self.jitterBuffer.put(rtpPacket)
+						recovered = self.fecDecoder.media(rtpPacket) if self.fecDecoder else []
+						self.requestRetransmission(rtpPacket.ssrc())
+					# Packets rebuilt from parity go to playout like received ones
+					for lostPacket in recovered:
+						self.jitterBuffer.put(lostPacket)
+			except:
+				# Stop listening if PAUSE or TEARDOWN
+				if self.playEvent.isSet():
+					break
+
+				# If teardown, close the RTP socket
+				if self.teardownAcked == 1:
+					try:
+						self.rtpSocket.shutdown(socket.SHUT_RDWR)
+						self.rtpSocket.close()
+						break
+					except:
+						break
+	
+	def requestRetransmission(self, mediaSsrc):
+		"""NACK the packets missing from the receive path, if the server takes RTCP."""
+		if self.rtcpSocket is None:
+			return
+		now = time.monotonic()
+		if now < self.nextNack:
+			return
+		self.nextNack = now + 0.01
+		# With FEC, give the parity packet of the group a chance to rebuild the loss first
+		lost = self.jitterBuffer.nackList(now, FEC_HOLDOFF if self.fecDecoder else 0.0)
+		if lost:
+			try:
+				self.rtcpSocket.sendto(Nack(self.ssrc, mediaSsrc, lost).encode(), self.rtcpAddress)
+			except OSError:
+				pass
+
+	def reportReception(self):
+		"""Receive the server's Sender Reports and send a Receiver Report every RTCP interval."""
+		rtcpSocket = self.rtcpSocket
+		nextReport = time.time() + self.rtcpInterval * random.uniform(0.5, 1.5)
+		while not self.teardownAcked:
+			try:
+				data = rtcpSocket.recv(2048)
+				for report in decode(data):
+					if isinstance(report, SenderReport):
+						self.lastSr = (report.ssrc, ntpMiddle(report.ntp), time.time())
+			except socket.timeout:
+				pass
+			except (struct.error, ValueError) as e:
+				log.warning("Malformed RTCP packet: %s", e)
+			except OSError:
+				break
+			now = time.time()
+			if now >= nextReport:
+				nextReport = now + self.rtcpInterval * random.uniform(0.5, 1.5)
+				try:
+					rtcpSocket.sendto(self.receiverReport(now).encode(), self.rtcpAddress)
+				except OSError:
+					pass
+		rtcpSocket.close()
+
+	def receiverReport(self, now):
+		"""Build a Receiver Report from the jitter buffer's reception statistics."""
+		reception = self.jitterBuffer.receptionReport()
+		if reception is None:
+			return ReceiverReport(self.ssrc)
+		fraction, cumulative, highestSeq, jitter = reception
+		ssrc, lsr, dlsr = 0, 0, 0
+		if self.lastSr is not None:
+			ssrc, lsr, received = self.lastSr
+			dlsr = int((now - received) * 65536)
+		return ReceiverReport(self.ssrc, [ReportBlock(ssrc, fraction, cumulative, highestSeq, jitter, lsr, dlsr)])
+
+	def playRtp(self):
+		"""Take packets from the jitter buffer in order and display the frames they complete."""
+		playEvent = self.playEvent # A later PLAY creates a new event for its own threads
+		while True:
+			rtpPacket = self.jitterBuffer.get(0.5)
+			if rtpPacket is None:
+				# Stop playing out if PAUSE or TEARDOWN
+				if playEvent.isSet() or self.teardownAcked == 1:
+					break
+				continue
+			currSeqNbr = rtpPacket.seqNum()
+
+			# The jitter buffer releases packets in order; gaps are lost packets
+			if self.lastSeq is not None:
+				self.lostPacket += ((currSeqNbr - self.lastSeq) & 0xFFFF) - 1
+			self.lastSeq = currSeqNbr
+			self.packetsRecv += 1
+
+			# Display the frame once all its fragments are in
+			frame = self.assembler.add(rtpPacket)
+			if frame:
+				self.frameNbr += 1
+				self.frameReceived(frame)
+	
+	######################################### HOOKS ################################################
+	def frameReceived(self, data):
+		"""Called with every complete frame, in playout order."""
+		pass
+
+	def rangeReceived(self, start, end):
+		"""Called with the movie length on SETUP and the start position on PLAY (seconds)."""
+		pass
+
+	def showWarning(self, title, message):
+		"""Report a problem to the user."""
+		log.warning("%s: %s", title, message)
+
+	def printStats(self):
+		"""Print packet statistics and video data rate."""
+		print(f"Packet loss: {self.lostPacket}")
+		print(f"Packet total: {self.packetsRecv + self.lostPacket}")
+		if self.packetsRecv != 0:
+			print(f"Packet loss rate: {self.lostPacket/(self.packetsRecv + self.lostPacket)}")
+		print(f"Frames displayed: {self.frameNbr}, incomplete frames discarded: {self.assembler.discarded}")
+		print(f"Jitter buffer: {self.jitterBuffer.stats()}")
+		if self.fecDecoder:
+			print(f"FEC: recovered {self.fecDecoder.recovered}, unrecoverable groups {self.fecDecoder.unrecoverable}")
+		self.printDataRate()
+
+	def printDataRate(self):
+		"""Print the payload bit rate over the time spent receiving it."""
+		recvTime = self.recvTime
+		if self.firstArrival is not None:
+			recvTime += self.lastArrival - self.firstArrival
+		if recvTime > 0:
+			print(f"Video data rate: {self.bytesRecv * 8 / recvTime:.0f} bits per second")
+
+	################################################################################################
+	def sendRtspRequest(self, requestCode):
+		"""Send RTSP request to the server."""
+		with self.requestLock:
+			# A keep-alive must not take the place of a request still waiting for its reply
+			if requestCode == self.GET_PARAMETER and not self.replyEvent.is_set():
+				return
+			self.writeRtspRequest(requestCode)
+
+	def writeRtspRequest(self, requestCode):
+		"""Write the RTSP request for a request code and send it. Call with requestLock held."""
+		# SETUP request
+		if requestCode == self.SETUP and self.state == self.INIT:
+			threading.Thread(target=self.recvRtspReply).start()
+
+			# Update RTSP sequence number
+			self.rtspSeq += 1
+
+			# Write the RTSP request to be sent
+			request = f"SETUP {self.fileName} RTSP/1.0"
+			request += f"\r\nCSeq: {self.rtspSeq}"
+			if self.broadcast == 'multicast':
+				request += f"\r\nTransport: RTP/UDP;multicast;client_port={self.rtpPort}"
+			elif self.broadcast == 'fanout':
+				request += f"\r\nTransport: RTP/UDP;unicast;client_port={self.rtpPort};broadcast"
+			else:
+				request += f"\r\nTransport: RTP/UDP; client_port= {self.rtpPort}-{self.rtpPort + 1}"
+				if self.fec:
+					request += f";fec={self.fec[0]};fec_depth={self.fec[1]}"
+
+			# Keep track of the sent request
+			self.requestSent = self.SETUP
+
+			# Send the RTSP request using rtspSocket
+			self.sendRtspMessage(request)
+			log.debug("Data Sent:\n%s", request)
+		
+		# PLAY request, or a seek while playing
+		elif requestCode == self.PLAY and (self.state == self.READY or
+										   (self.state == self.PLAYING and self.seekPos is not None)):
+
+			# Update RTSP sequence number
+			self.rtspSeq += 1
+
+			# Write the RTSP request to be sent
+			request = f"PLAY {self.fileName} RTSP/1.0"
+			request += f"\r\nCSeq: {self.rtspSeq}"
+			request += f"\r\nSession: {self.sessionId}"
+			if self.seekPos is not None:
+				request += f"\r\nRange: npt={self.seekPos:.3f}-"
+				self.seekPos = None
+
+			# Keep track of the sent request
+			self.requestSent = self.PLAY
+
+			# Send the RTSP request using rtspSocket
+			self.sendRtspMessage(request)
+			log.debug("Data Sent:\n%s", request)
+		
+		# PAUSE request
+		elif requestCode == self.PAUSE and self.state == self.PLAYING:
+
+			# Update RTSP sequence number
+			self.rtspSeq += 1
+
+			# Write the RTSP request to be sent
+			request = f"PAUSE {self.fileName} RTSP/1.0"
+			request += f"\r\nCSeq: {self.rtspSeq}"
+			request += f"\r\nSession: {self.sessionId}"
+
+			# Keep track of the sent request
+			self.requestSent = self.PAUSE
+
+			# Send the RTSP request using rtspSocket
+			self.sendRtspMessage(request)
+			log.debug("Data Sent:\n%s", request)
+		
+		# GET_PARAMETER request, sent as a keep-alive
+		elif requestCode == self.GET_PARAMETER and not self.state == self.INIT:
+
+			# Update RTSP sequence number
+			self.rtspSeq += 1
+
+			# Write the RTSP request to be sent
+			request = f"GET_PARAMETER {self.fileName} RTSP/1.0"
+			request += f"\r\nCSeq: {self.rtspSeq}"
+			request += f"\r\nSession: {self.sessionId}"
+
+			# Keep track of the keep-alive; requestSent still names the last real request
+			self.keepAliveSeq = self.rtspSeq
+
+			# Send the RTSP request using rtspSocket
+			self.sendRtspMessage(request)
+			log.debug("Data Sent:\n%s", request)
+
+		# SET_PARAMETER request, asking for a quality level
+		elif requestCode == self.SET_PARAMETER and not self.state == self.INIT:
+
+			# Update RTSP sequence number
+			self.rtspSeq += 1
+
+			# Write the RTSP request to be sent
+			request = f"SET_PARAMETER {self.fileName} RTSP/1.0"
+			request += f"\r\nCSeq: {self.rtspSeq}"
+			request += f"\r\nSession: {self.sessionId}"
+			request += f"\r\nContent-Type: text/parameters"
+			body = f"quality: {self.quality}\r\n"
+			request += f"\r\nContent-Length: {len(body)}"
+
+			# Keep track of the sent request
+			self.requestSent = self.SET_PARAMETER
+
+			# Send the RTSP request using rtspSocket
+			self.sendRtspMessage(request, body)
+			log.debug("Data Sent:\n%s\n%s", request, body)
+
+		# STOP request
+		elif (requestCode == self.STOP and not self.state == self.READY) or\
+			 (self.requestSent == self.PAUSE and self.state == self.READY):
+
+			# Update RTSP sequence number
+			self.rtspSeq += 1
+
+			# Write the RTSP request to be sent
+			request = f"STOP {self.fileName} RTSP/1.0"
+			request += f"\r\nCSeq: {self.rtspSeq}"
+			request += f"\r\nSession: {self.sessionId}"
+
+			# Keep track of the sent request
+			self.requestSent = self.STOP
+
+			# Send the RTSP request using rtspSocket
+			self.sendRtspMessage(request)
+			log.debug("Data Sent:\n%s", request)
+
+		# TEARDOWN request
+		elif requestCode == self.TEARDOWN and not self.state == self.INIT:
+
+			# Update RTSP sequence number
+			self.rtspSeq += 1
+
+			# Write the RTSP request to be sent
+			request = f"TEARDOWN {self.fileName} RTSP/1.0"
+			request += f"\r\nCSeq: {self.rtspSeq}"
+			request += f"\r\nSession: {self.sessionId}"
+
+			# Keep track of the sent request
+			self.requestSent = self.TEARDOWN
+
+			# Send the RTSP request using rtspSocket
+			self.sendRtspMessage(request)
+			log.debug("Data Sent:\n%s", request)
+		
+		# DESCRIBE request
+		elif requestCode == self.DESCRIBE:
+			self.descPort = 1024
+			threading.Thread(target=self.recvDescription).start()
+
+			# Update RTSP sequence number
+			self.rtspSeq += 1
+
+			# Write the RTSP request to be sent
+			request = f"DESCRIBE {self.fileName} RTSP/1.0"
+			request += f"\r\nCSeq: {self.rtspSeq}"
+			request += f"\r\nDescPort: {self.descPort}"
+
+			# Keep track of the sent request
+			self.requestSent = self.DESCRIBE
+
+			# Send the RTSP request using rtspSocket
+			self.sendRtspMessage(request)
+			log.debug("Data Sent:\n%s", request)
+
+	def sendRtspMessage(self, request, body=''):
+		"""Send an RTSP request, and its body if any, and start timing its round trip."""
+		self.replyEvent.clear()
+		self.requestTime = time.perf_counter()
+		self.rtspSocket.sendall((request + "\r\n\r\n" + body).encode())
+
+	def recvDescription(self):
+		description = ""
+		with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as descSocket:
+			descSocket.bind(('', self.descPort))
+			descSocket.listen(5)
+			conn, addr = descSocket.accept()
+			with conn:
+				while True:
+					data = conn.recv(1024)
+					if not data:
+						break
+					description += data.decode('utf-8')
+		print(description)
+
+	def recvRtspReply(self):
+		"""Receive RTSP replies from the server until TEARDOWN is acknowledged or the server closes."""
+		parser = RtspParser()
+		while not self.teardownAcked:
+			try:
+				data = self.rtspSocket.recv(4096)
+				for reply in parser.feed(data):
+					self.parseRtspReply(reply)
+			except RtspError as err:
+				self.showWarning("Bad RTSP reply", str(err))
+				break
+			except OSError:
+				break
+			if parser.closed:
+				break
+
+		# Close the RTSP socket
+		try:
+			self.rtspSocket.shutdown(socket.SHUT_RDWR)
+		except OSError:
+			pass
+		self.rtspSocket.close()
+	
+	def parseRtspReply(self, reply):
+		"""Parse an RTSP reply (an RtspMessage) from the server."""
+		seqNum = int(reply.headers.get('CSeq', -1))
+
+		# Process only if the match seqNum between server and client
+		if seqNum == self.rtspSeq:
+			self.rtspRtts.append(time.perf_counter() - self.requestTime)
+			session = int(reply.headers.get('Session', '0').split(';')[0])
+
+			# New RTSP session ID
+			if self.sessionId == 0:
+				self.sessionId = session
+			
+			# Process only if the session ID is the same
+			if self.sessionId == session:
+				# Keep-alive replies change no state
+				if reply.statusCode == 200 and seqNum != self.keepAliveSeq:
+					if self.requestSent == self.SETUP:
+
+						# Update RTSP state.
+						self.state = self.READY
+
+						# Keep the session alive within the timeout the server announced
+						try:
+							self.sessionTimeout = int(headerParams(reply.headers.get('Session'))['timeout'])
+						except (KeyError, ValueError):
+							pass
+						threading.Thread(target=self.keepAlive, daemon=True).start()
+
+						# Length of the movie
+						if 'Range' in reply.headers:
+							end = reply.headers['Range'].partition('=')[2].split('-')[1]
+							if end:
+								self.rangeReceived(None, float(end))
+
+						# Open RTP port, on the multicast group if the server gave one
+						self.transport = headerParams(reply.headers.get('Transport'))
+						if 'fec' in self.transport:
+							self.fecDecoder = FecDecoder()
+						self.openRtpPort()
+
+					elif self.requestSent == self.PLAY:
+						self.state = self.PLAYING
+
+						# The server echoes where it actually started playing
+						if 'Range' in reply.headers:
+							start = reply.headers['Range'].partition('=')[2].split('-')[0]
+							self.rangeReceived(float(start), None)
+
+					elif self.requestSent == self.PAUSE:
+						# Print video data rate at PAUSE moment
+						self.printDataRate()
+
+						self.state = self.READY
+						# The play thread exits. A new thread is created on resume.
+						self.playEvent.set()
+						
+					elif self.requestSent == self.STOP:
+						# Print packet statistic and video data rate
+						self.printStats()
+
+						# Change state
+						self.state = self.READY
+
+						# The listening and playout threads exit; PLAY starts new ones
+						if hasattr(self, 'playEvent'):
+							self.playEvent.set()
+						
+						# Reset everything
+						self.frameNbr = 0
+						self.lastSeq = None
+						self.packetsRecv = 0
+						self.assembler = FrameAssembler()
+						self.jitterBuffer = JitterBuffer(minDelay=self.jitterDelay[0], maxDelay=self.jitterDelay[1])
+						self.lostPacket = 0
+						self.bytesRecv = 0
+						self.firstArrival = None
+						self.recvTime = 0.0
+
+					elif self.requestSent == self.TEARDOWN:
+						# Print packet statistic and video data rate
+						self.printStats()
+
+						# Flag the teardownAcked to close the socket
+						self.state = self.INIT
+						self.teardownAcked = 1
+
+			self.replyEvent.set()
+	
+	def openRtpPort(self):
+		"""Open RTP socket binded to a specified port."""
+		# Create a new datagram socket to receive RTP packets from the server
+		self.rtpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		
+		# Set the timeout value of the socket to 0.5sec
+		self.rtpSocket.settimeout(0.5)
+		try:
+			# Bind the socket to the address using the RTP port given by the client user
+			self.state = self.READY
+			if 'multicast' in self.transport:
+				self.joinGroup(self.transport['destination'], int(self.transport['port']))
+			else:
+				self.rtpSocket.bind(('', self.rtpPort))
+		except:
+			self.showWarning("Unable to Bind", f"Unable to bind PORT={self.rtpPort}")
+
+		# Exchange RTCP reports with the server if it gave its RTCP port
+		if 'server_port' in self.transport and 'multicast' not in self.transport:
+			self.rtcpSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+			self.rtcpSocket.settimeout(0.5)
+			try:
+				self.rtcpSocket.bind(('', self.rtpPort + 1))
+			except OSError:
+				self.showWarning("Unable to Bind", f"Unable to bind PORT={self.rtpPort + 1}")
+				self.rtcpSocket = None
+				return
+			self.rtcpAddress = (self.serverAddr, int(self.transport['server_port'].split('-')[-1]))
+			threading.Thread(target=self.reportReception, name="RtcpReporter", daemon=True).start()
+
+	def joinGroup(self, group, port):
+		"""Receive RTP packets sent to a multicast group."""
+		# Every viewer on this host binds the group's port
+		self.rtpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.rtpSocket.bind(('', port))
+		membership = socket.inet_aton(group) + socket.inet_aton('0.0.0.0')
+		self.rtpSocket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
@@ -0,0 +1,173 @@
+import re
+
+HEADER_END = re.compile(rb'\r?\n\r?\n')	# Blank line that ends the start line and headers
+MAX_HEADER_BYTES = 16384				# Largest start line plus headers accepted
+MAX_BODY_BYTES = 1 << 20				# Largest Content-Length accepted
+
+class RtspError(ValueError):
+	"""Malformed, oversized or truncated RTSP message."""
+
+def headerParams(value):
+	"""Split a header value like 'RTP/UDP; client_port=5000' into its ';'-separated parameters.
+
+	The first element is returned under the key '' and parameter names are lower-cased.
+	"""
+	parts = (value or '').split(';')
+	params = {'': parts[0].strip()}
+	for part in parts[1:]:
+		key, _, val = part.partition('=')
+		params[key.strip().lower()] = val.strip()
+	return params
+
+class RtspHeaders:
+	"""Case-insensitive header map that keeps the names as they were sent."""
+
+	def __init__(self, items=()):
+		self.fields = {}
+		for name, value in items:
+			self[name] = value
+
+	def __setitem__(self, name, value):
+		self.fields[name.lower()] = (name, str(value))
+
+	def __getitem__(self, name):
+		return self.fields[name.lower()][1]
+
+	def __delitem__(self, name):
+		del self.fields[name.lower()]
+
+	def __contains__(self, name):
+		return name.lower() in self.fields
+
+	def __len__(self):
+		return len(self.fields)
+
+	def get(self, name, default=None):
+		field = self.fields.get(name.lower())
+		return field[1] if field else default
+
+	def items(self):
+		return self.fields.values()
+
+class RtspMessage:
+	"""One RTSP request or reply: start line, headers and an optional body."""
+
+	def __init__(self, startLine, headers=None, body=b''):
+		self.startLine = startLine
+		self.headers = headers if headers is not None else RtspHeaders()
+		self.body = body
+		parts = startLine.split(' ', 2)
+		self.isReply = parts[0].startswith('RTSP/')
+		if self.isReply:
+			if len(parts) < 2 or not parts[1].isdigit():
+				raise RtspError(f"bad status line '{startLine}'")
+			self.version = parts[0]
+			self.statusCode = int(parts[1])
+			self.reason = parts[2] if len(parts) > 2 else ''
+		else:
+			if len(parts) < 3:
+				raise RtspError(f"bad request line '{startLine}'")
+			self.method, self.uri, self.version = parts
+
+	def cseq(self):
+		return self.headers.get('CSeq')
+
+	def encode(self):
+		"""Serialize the message with CRLF line endings and a Content-Length for the body."""
+		lines = [self.startLine]
+		for name, value in self.headers.items():
+			if name.lower() != 'content-length':
+				lines.append(f"{name}: {value}")
+		if self.body:
+			lines.append(f"Content-Length: {len(self.body)}")
+		return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + self.body
+
+	def __str__(self):
+		lines = [self.startLine] + [f"{name}: {value}" for name, value in self.headers.items()]
+		return '\n'.join(lines) + ('\n\n' + self.body.decode('utf-8', 'replace') if self.body else '')
+
+class RtspParser:
+	"""Incremental RTSP framer for one connection.
+
+	Bytes are fed as they arrive from the socket, in chunks of any size;
+	feed() returns every message they complete, so pipelined requests in a
+	single segment and messages split over several segments both come out
+	whole. A message ends at the first blank line (CRLF or bare LF line
+	endings), followed by Content-Length bytes of body if that header is set.
+	"""
+
+	def __init__(self):
+		self.buffer = bytearray()
+		self.scanned = 0		# Bytes of the buffer already searched for the header end
+		self.pending = None		# Message whose body is still arriving
+		self.bodyLength = 0
+		self.closed = False
+
+	def feed(self, data):
+		"""Add received bytes and return the messages they complete, in order.
+
+		Empty data is end of file: it raises RtspError if a message was cut
+		short, and otherwise marks the parser closed.
+		"""
+		if not data:
+			self.closed = True
+			if self.pending is not None or self.buffer.strip():
+				raise RtspError("connection closed in the middle of a message")
+			return []
+		self.buffer += data
+		messages = []
+		message = self.nextMessage()
+		while message is not None:
+			messages.append(message)
+			message = self.nextMessage()
+		return messages
+
+	def nextMessage(self):
+		"""Take one complete message off the buffer, or return None if more bytes are needed."""
+		if self.pending is None:
+			# Blank lines between messages are allowed (and used as keep-alives)
+			if self.buffer[:1] in (b'\r', b'\n'):
+				del self.buffer[:len(self.buffer) - len(self.buffer.lstrip(b'\r\n'))]
+				self.scanned = 0
+			end = HEADER_END.search(self.buffer, max(0, self.scanned - 3))
+			if end is None:
+				self.scanned = len(self.buffer)
+				if self.scanned > MAX_HEADER_BYTES:
+					raise RtspError(f"headers longer than {MAX_HEADER_BYTES} bytes")
+				return None
+			head = self.buffer[:end.start()].decode('utf-8', 'replace')
+			del self.buffer[:end.end()]
+			self.scanned = 0
+			self.pending = self.parseHead(head)
+		if len(self.buffer) < self.bodyLength:
+			return None
+		message, self.pending = self.pending, None
+		if self.bodyLength:
+			message.body = bytes(self.buffer[:self.bodyLength])
+			del self.buffer[:self.bodyLength]
+		return message
+
+	def parseHead(self, head):
+		"""Build a message from its start line and header lines."""
+		lines = head.replace('\r\n', '\n').split('\n')
+		headers = RtspHeaders()
+		fields = headers.fields
+		name = None
+		for line in lines[1:]:
+			if line[:1] in (' ', '\t') and name:
+				# Folded continuation of the previous header
+				headers[name] = headers[name] + ' ' + line.strip()
+				continue
+			name, sep, value = line.partition(':')
+			if not sep:
+				raise RtspError(f"bad header line '{line}'")
+			name = name.strip()
+			fields[name.lower()] = (name, value.strip())
+		message = RtspMessage(lines[0], headers)
+		try:
+			self.bodyLength = int(headers.get('Content-Length', 0))
+		except ValueError:
+			raise RtspError(f"bad Content-Length '{headers.get('Content-Length')}'")
+		if not 0 <= self.bodyLength <= MAX_BODY_BYTES:
+			raise RtspError(f"Content-Length {self.bodyLength} out of range")
+		return message
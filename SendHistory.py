@@ -0,0 +1,47 @@
+from collections import deque
+
+HISTORY_PACKETS = 1024 # packets kept for retransmission at most
+HISTORY_BYTES = 2 * 1024 * 1024 # bytes of packets kept at most
+
+class SendHistory:
+	"""Ring buffer of the RTP packets a session sent lately, by sequence number.
+
+	Packets keep their payload by reference (a slice of the mapped movie), so
+	a retransmission never reads the movie again; the byte cap bounds how
+	much of it the history holds on to. The oldest packets are forgotten
+	first once either cap is reached.
+	"""
+
+	def __init__(self, maxPackets=HISTORY_PACKETS, maxBytes=HISTORY_BYTES):
+		self.maxPackets = maxPackets
+		self.maxBytes = maxBytes
+		self.order = deque()		# sequence numbers, oldest first
+		self.packets = {}			# sequence number -> RtpPacket
+		self.bytes = 0
+		self.retransmitted = 0
+		self.misses = 0
+
+	def add(self, seq, rtpPacket):
+		if seq in self.packets:
+			self.forget(seq) # The sequence number wrapped around
+		self.order.append(seq)
+		self.packets[seq] = rtpPacket
+		self.bytes += rtpPacket.size()
+		while len(self.order) > self.maxPackets or self.bytes > self.maxBytes:
+			self.forget(self.order[0])
+
+	def forget(self, seq):
+		if self.order[0] == seq:
+			self.order.popleft()
+		else:
+			self.order.remove(seq)
+		self.bytes -= self.packets.pop(seq).size()
+
+	def get(self, seq):
+		"""Return the packet sent with a sequence number, or None if it is no longer kept."""
+		rtpPacket = self.packets.get(seq)
+		if rtpPacket is None:
+			self.misses += 1
+		else:
+			self.retransmitted += 1
+		return rtpPacket
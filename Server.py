@@ -1,25 +1,74 @@
-import sys, socket
+import argparse, logging, socket
 
 from ServerWorker import ServerWorker
+from MediaRegistry import registry
+from Prefetch import prefetcher, READ_AHEAD, IO_THREADS
+from SessionManager import sessions, DEFAULT_TIMEOUT
+from Metrics import serveMetrics
+from Profiler import Profiler, profileArguments
 
 class Server:	
 	
 	def main(self):
-		try:
-			SERVER_PORT = int(sys.argv[1])
-		except:
-			print("[Usage: Server.py Server_port]\n")
+		parser = argparse.ArgumentParser(usage="Server.py Server_port [--mode threaded|async] [--workers N]")
+		parser.add_argument('port', type=int)
+		parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded',
+							help="one thread per client (default) or a single asyncio event loop")
+		parser.add_argument('--cache-mb', type=int, default=512,
+							help="memory budget for mapped movies no session is playing")
+		parser.add_argument('--prefetch', type=int, default=READ_AHEAD, metavar='FRAMES',
+							help="frames read ahead of each stream by background threads; 0 reads them in the send loop")
+		parser.add_argument('--io-threads', type=int, default=IO_THREADS,
+							help="threads reading frames ahead, shared by every stream")
+		parser.add_argument('--session-timeout', type=int, default=DEFAULT_TIMEOUT,
+							help="seconds without a request before a session is closed")
+		parser.add_argument('--workers', type=int, default=1,
+							help="server processes sharing the port with SO_REUSEPORT, restarted if they die")
+		parser.add_argument('--metrics-port', type=int,
+							help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics (worker N on PORT+N)")
+		parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error'], default='info',
+							help="debug logs every RTSP message")
+		profileArguments(parser)
+		args = parser.parse_args()
+		logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+		SERVER_PORT = args.port
+		profile = (args.profile, args.profile_output, args.profile_delay) if args.profile else None
+		registry.setBudget(args.cache_mb * 1024 * 1024)
+		prefetcher.configure(args.prefetch, args.io_threads)
+		sessions.setTimeout(args.session_timeout)
+
+		if args.workers > 1:
+			if not hasattr(socket, 'SO_REUSEPORT'):
+				parser.error("--workers needs SO_REUSEPORT, which this platform does not have")
+			from WorkerPool import WorkerPool
+			WorkerPool(args.workers, self.serve, (SERVER_PORT, args.mode, True, args.metrics_port, profile)).main()
+			return
+
+		self.serve(SERVER_PORT, args.mode, metricsPort=args.metrics_port, profile=profile)
+
+	def serve(self, port, mode, reusePort=False, metricsPort=None, profile=None):
+		"""Accept RTSP clients on the port, with a thread each or on a single event loop."""
+		if metricsPort:
+			serveMetrics(metricsPort)
+		if profile:
+			Profiler(*profile).start() # Every worker profiles itself
+		if mode == 'async':
+			from AsyncServer import AsyncServer
+			AsyncServer(port, reusePort).main()
+			return
+
 		rtspSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		rtspSocket.bind(('', SERVER_PORT))
-		rtspSocket.listen(5)        
+		rtspSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		if reusePort:
+			rtspSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+		rtspSocket.bind(('', port))
+		rtspSocket.listen(128)
 
 		# Receive client info (address,port) through RTSP/TCP session
 		while True:
 			clientInfo = {}
 			clientInfo['rtspSocket'] = rtspSocket.accept()
-			ServerWorker(clientInfo).run()		
+			ServerWorker(clientInfo).run()
 
 if __name__ == "__main__":
 	(Server()).main()
-
-
@@ -1,11 +1,37 @@
-from random import randint
-import sys, traceback, threading, socket
+import sys, traceback, threading, socket, time, logging, math
 
-from VideoStream import VideoStream
+from MediaRegistry import registry
+from Prefetch import prefetcher
+from SessionManager import sessions
+from Broadcast import broadcaster
+from VideoStream import DEFAULT_FPS, MAX_FPS
+from Pacer import PacedStream, scheduler
 from RtpPacket import RtpPacket
+from RtpJpeg import JpegPacketizer, CLOCK_RATE
+from RtspParser import RtspParser, RtspMessage, RtspError, headerParams
+from RateAdapter import RateAdapter, renditions
+from SendHistory import SendHistory
+from Fec import FecEncoder, MIN_GROUP
+from Rtcp import SenderReport, ReceiverReport, Nack, RTCP_INTERVAL, ntpTime, rtcpEndpoint
+from Metrics import metrics
 
 import random
 
+log = logging.getLogger(__name__)
+
+# Hot-path instrumentation, shared by the sessions of the process
+frameReadTime = metrics.histogram('frame_read_seconds', "Time to read a frame from the movie")
+packetizeTime = metrics.histogram('packetize_seconds', "Time to packetize a frame, its sends excluded")
+sendTime = metrics.histogram('sendto_seconds', "Time to send one RTP packet")
+packetsSent = metrics.counter('rtp_packets_sent_total', "RTP media packets sent")
+bytesSent = metrics.counter('rtp_payload_bytes_sent_total', "RTP media payload bytes sent")
+framesSent = metrics.counter('frames_sent_total', "Frames sent")
+parityPacketsSent = metrics.counter('fec_packets_sent_total', "FEC parity packets sent")
+packetsRetransmitted = metrics.counter('rtp_packets_retransmitted_total', "RTP packets sent again on a NACK")
+sendErrors = metrics.counter('rtp_send_errors_total', "Frames whose sending failed")
+rtcpPackets = metrics.counter('rtcp_packets_received_total', "RTCP reports and NACKs received from clients")
+metrics.addCollector(lambda: dict(sessions.stats(), mappedBytes=registry.mappedBytes()))
+
 class ServerWorker:
 	SETUP = 'SETUP'
 	PLAY = 'PLAY'
@@ -13,6 +39,10 @@ class ServerWorker:
 	STOP = 'STOP'
 	TEARDOWN = 'TEARDOWN'
 	DESCRIBE = 'DESCRIBE'
+	GET_PARAMETER = 'GET_PARAMETER'
+	SET_PARAMETER = 'SET_PARAMETER'
+	OPTIONS = 'OPTIONS'
+	METHODS = (SETUP, PLAY, PAUSE, STOP, TEARDOWN, DESCRIBE, GET_PARAMETER, SET_PARAMETER, OPTIONS)
 	
 	INIT = 0
 	READY = 1
@@ -22,100 +52,199 @@ class ServerWorker:
 	OK_200 = 0
 	FILE_NOT_FOUND_404 = 1
 	CON_ERR_500 = 2
+	BAD_REQUEST_400 = 3
 	
 	clientInfo = {}
 	
 	def __init__(self, clientInfo):
 		self.clientInfo = clientInfo
+		self.parser = RtspParser()
+		self.streamLock = threading.Lock() # the send loop swaps renditions while RTSP requests close the stream
 		
 	def run(self):
+		sessions.add(self)
 		threading.Thread(target=self.recvRtspRequest).start()
 	
 	def recvRtspRequest(self):
-		"""Receive RTSP request from the client."""
+		"""Receive RTSP requests from the client until it closes the connection."""
 		connSocket = self.clientInfo['rtspSocket'][0]
-		while True:            
-			data = connSocket.recv(256)
-			if data:
-				print("Data received:\n" + data.decode("utf-8"))
-				self.processRtspRequest(data.decode("utf-8"))
-
-	def processRtspRequest(self, data):
-		"""Process RTSP request sent from the client."""
+		try:
+			while not self.parser.closed:
+				data = connSocket.recv(4096)
+				for request in self.parser.feed(data):
+					self.handleRtspRequest(request)
+		except RtspError as err:
+			log.warning("Bad RTSP request: %s", err)
+		except OSError:
+			pass # Connection reset by the client
+		finally:
+			self.connectionClosed()
+			connSocket.close()
+
+	def connectionClosed(self):
+		"""Release the session's resources once its RTSP connection is gone."""
+		sessions.remove(self)
+		if self.state == self.PLAYING:
+			self.stopSending()
+			self.closeRtpSocket()
+		self.state = self.INIT
+		self.closeVideoStream()
+		self.stopReports()
+
+	def handleRtspRequest(self, request):
+		"""Process a request, timing how long it took by method.
+
+		Raise RtspError, after answering 400, for a reply sent where a request belongs.
+		"""
+		log.debug("Data received:\n%s", request)
+		if request.isReply:
+			self.replyRtsp(self.BAD_REQUEST_400, request.cseq() or '0')
+			raise RtspError(f"reply '{request.startLine}' instead of a request")
+		tic = time.perf_counter()
+		self.processRtspRequest(request)
+		method = request.method if request.method in self.METHODS else 'other'
+		metrics.histogram('rtsp_request_seconds', "Time to handle an RTSP request", method=method).record(time.perf_counter() - tic)
+
+	def processRtspRequest(self, request):
+		"""Process an RTSP request (an RtspMessage) sent from the client."""
 		# Get the request type
-		request = data.split('\n')
-		line1 = request[0].split(' ')
-		requestType = line1[0]
-		
+		requestType = request.method
+
 		# Get the media file name
-		filename = line1[1]
-		
-		# Get the RTSP sequence number 
-		seq = request[1].split(' ')
-		
+		filename = request.uri
+
+		# Get the RTSP sequence number
+		seq = request.headers.get('CSeq', '0')
+
+		# Any request keeps the session alive
+		sessions.touch(self)
+
 		# Process SETUP request
 		if requestType == self.SETUP and self.state == self.INIT:
 			# Update state
-			print("processing SETUP\n")
+			log.debug("processing SETUP")
 			
 			try:
-				self.clientInfo['videoStream'] = VideoStream(filename)
+				self.openVideoStream(filename)
 				self.state = self.READY
 			except IOError:
-				self.replyRtsp(self.FILE_NOT_FOUND_404, seq[1])
-			
-			# Generate a randomized RTSP session ID
-			self.clientInfo['session'] = randint(100000, 999999)
+				self.replyRtsp(self.FILE_NOT_FOUND_404, seq)
+				return
+
+			# Frame rate asked for by the client, if any
+			self.clientInfo['fps'] = DEFAULT_FPS
+			try:
+				fps = float(request.headers.get('Frame-Rate'))
+				if math.isfinite(fps):
+					self.clientInfo['fps'] = min(MAX_FPS, max(1.0, fps))
+			except (TypeError, ValueError):
+				pass
 			
-			# Send RTSP reply
-			self.replyRtsp(self.OK_200, seq[1])
+			# RTP source of the session: random SSRC, first sequence number and timestamp (RFC 3550 5.1)
+			self.clientInfo['ssrc'] = random.getrandbits(32)
+			self.clientInfo['rtpSeq'] = random.getrandbits(16)
+			self.clientInfo['rtpOffset'] = random.getrandbits(32)
+			self.clientInfo['rtpFrames'] = 0
+			self.clientInfo['rtpPackets'] = 0
+			self.clientInfo['rtpOctets'] = 0
+			self.clientInfo['packetizer'] = JpegPacketizer()
 			
-			# Get the RTP/UDP port from the last line
-			self.clientInfo['rtpPort'] = request[2].split(' ')[3]
+			# Get the RTP/UDP port, and the RTCP port after it, from the Transport header
+			transport = headerParams(request.headers.get('Transport'))
+			rtpPort, _, rtcpPort = (transport.get('client_port') or '').partition('-')
+			self.clientInfo['rtpPort'] = rtpPort
+
+			# Send RTSP reply, announcing the playable range
+			headers = {}
+			if 'videoStream' in self.clientInfo:
+				headers['Range'] = f"npt=0.000-{self.clientInfo['videoStream'].duration(self.clientInfo['fps']):.3f}"
+
+				# Broadcast sessions share one stream of the movie instead of pacing their own
+				if 'multicast' in transport or 'broadcast' in transport:
+					channel = broadcaster.attach(filename, self.clientInfo['fps'], 'multicast' in transport)
+					self.clientInfo['channel'] = channel
+					headers['Transport'] = channel.transport(self.clientInfo['rtpPort'])
+				else:
+					# Sessions of their own adapt their quality to the client's reports
+					self.openRenditions(filename)
+					self.clientInfo['adapter'] = RateAdapter(list(self.clientInfo['renditions']))
+					# Recently sent packets, resent when the client NACKs them
+					self.clientInfo['history'] = SendHistory()
+					if rtpPort.isdigit():
+						# Receiver Reports come back to the process-wide RTCP port
+						rtcpPort = int(rtcpPort) if rtcpPort.isdigit() else int(rtpPort) + 1
+						self.startReports((self.clientInfo['rtspSocket'][1][0], rtcpPort))
+						headers['Transport'] = (f"RTP/UDP;unicast;client_port={rtpPort}-{rtcpPort};"
+												f"server_port={rtcpEndpoint.port()}")
+					# Parity packets over groups of fec= packets, interleaved fec_depth= deep, if asked for (fec=0 or 1: none)
+					if transport.get('fec', '').isdigit() and int(transport['fec']) >= MIN_GROUP:
+						depth = transport.get('fec_depth', '1')
+						fec = FecEncoder(int(transport['fec']), int(depth) if depth.isdigit() else 1)
+						self.clientInfo['fec'] = fec
+						headers['Transport'] = headers.get('Transport', 'RTP/UDP;unicast') + f";fec={fec.k};fec_depth={fec.depth}"
+			self.replyRtsp(self.OK_200, seq, headers)
 		
 		# Process PLAY request
 		elif requestType == self.PLAY and self.state == self.READY:
-			print("processing PLAY\n")
+			log.debug("processing PLAY")
 			self.state = self.PLAYING
 			
+			# Jump to the requested position, if any
+			headers = self.seekVideoStream(request.headers.get('Range'))
+
 			# Create a new socket for RTP/UDP
-			self.clientInfo["rtpSocket"] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)				
-			self.replyRtsp(self.OK_200, seq[1])
+			self.openRtpSocket()
+			self.replyRtsp(self.OK_200, seq, headers)
 			
-			# Create a new thread and start sending RTP packets
-			self.clientInfo['event'] = threading.Event()
-			self.clientInfo['worker']= threading.Thread(target=self.sendRtp) 
-			self.clientInfo['worker'].start()
+			# Start sending RTP packets
+			self.startSending()
+		
+		# Process PLAY request with a Range while playing (seek)
+		elif requestType == self.PLAY and self.state == self.PLAYING and request.headers.get('Range'):
+			log.debug("processing PLAY (seek)")
+			headers = self.seekVideoStream(request.headers.get('Range'))
+			self.replyRtsp(self.OK_200, seq, headers)
 		
 		# Process PAUSE request
 		elif requestType == self.PAUSE and self.state == self.PLAYING:
-			print("processing PAUSE\n")
+			log.debug("processing PAUSE")
 			self.state = self.READY
-			self.clientInfo['event'].set()
-			self.replyRtsp(self.OK_200, seq[1])
+			self.stopSending()
+			self.replyRtsp(self.OK_200, seq)
 		
 		# Process STOP request
 		elif requestType == self.STOP:
-			print("processing STOP\n")
+			log.debug("processing STOP")
 			try:
-				self.clientInfo['videoStream'] = VideoStream(filename)
+				# Rewind the stream, or open it if there is none yet
+				if 'videoStream' in self.clientInfo:
+					self.clientInfo['videoStream'].seek(0)
+				else:
+					self.openVideoStream(filename)
 				self.state = self.READY
 			except IOError:
-				self.replyRtsp(self.FILE_NOT_FOUND_404, seq[1])
+				self.replyRtsp(self.FILE_NOT_FOUND_404, seq)
+				return
 
-			self.clientInfo['event'].set()
-			self.replyRtsp(self.OK_200, seq[1])
+			self.stopSending()
+			self.replyRtsp(self.OK_200, seq)
 
 			# Close the RTP socket
-			self.clientInfo['rtpSocket'].close()
+			self.closeRtpSocket()
 		
 		# Process TEARDOWN request
 		elif requestType == self.TEARDOWN:
-			print("processing TEARDOWN\n")
+			log.debug("processing TEARDOWN")
 			if self.state == self.PLAYING:
-				self.clientInfo['event'].set()
-				self.clientInfo['rtpSocket'].close()
-			self.replyRtsp(self.OK_200, seq[1])
+				self.stopSending()
+				self.closeRtpSocket()
+			self.state = self.INIT
+			self.closeVideoStream()
+			self.stopReports()
+			self.replyRtsp(self.OK_200, seq)
+
+			# A later SETUP on this connection starts a new session
+			sessions.renew(self)
 
 			# Close the RTP socket
 			# if self.state == self.PLAYING:
@@ -123,36 +252,345 @@ class ServerWorker:
 			
 		# Process DESCRIBE request
 		elif requestType == self.DESCRIBE:
-			print("processing DESCRIBE\n")
-			self.clientInfo['description'] = self.getDescription(data)
-			self.clientInfo['descPort'] = request[2].split(' ')[1]
-			threading.Thread(target=self.sendDescription).start()
+			log.debug("processing DESCRIBE")
+			self.clientInfo['description'] = self.getDescription(request)
+			self.clientInfo['descPort'] = request.headers.get('DescPort')
+			self.startDescription()
+
+			self.replyRtsp(self.OK_200, seq)
+
+		# Process GET_PARAMETER request: a keep-alive, or a query of the named parameters
+		elif requestType == self.GET_PARAMETER:
+			log.debug("processing GET_PARAMETER")
+			body = self.getParameters(request.body.decode('utf-8', 'replace').split())
+			self.replyRtsp(self.OK_200, seq, {'Content-Type': 'text/parameters'} if body else None, body)
+
+		# Process SET_PARAMETER request: 'quality: <level>' fixes the quality level, 'quality: auto' adapts it
+		elif requestType == self.SET_PARAMETER:
+			log.debug("processing SET_PARAMETER")
+			self.setParameters(request.body.decode('utf-8', 'replace'))
+			self.replyRtsp(self.OK_200, seq)
+
+		# Process OPTIONS request
+		elif requestType == self.OPTIONS:
+			log.debug("processing OPTIONS")
+			self.replyRtsp(self.OK_200, seq, {'Public': ', '.join(self.METHODS)})
+
+	def getParameters(self, names):
+		"""Return 'name: value' lines for the requested server parameters.
+
+		'metrics' asks for every counter and latency histogram of the process.
+		"""
+		values = sessions.stats()
+		values['mappedBytes'] = registry.mappedBytes()
+		values.update(self.quality())
+		if 'adapter' in self.clientInfo:
+			values['qualityLevel'] = self.clientInfo['adapter'].level
+		if 'history' in self.clientInfo:
+			values['retransmitted'] = self.clientInfo['history'].retransmitted
+			values['historyMisses'] = self.clientInfo['history'].misses
+		if 'metrics' in names or any(name not in values for name in names):
+			snapshot = metrics.snapshot()
+			values.update(snapshot)
+			if 'metrics' in names:
+				names = [name for name in names if name != 'metrics'] + list(snapshot)
+		lines = [f"{name}: {values[name]}\r\n" for name in names if name in values]
+		return ''.join(lines).encode()
+
+	def startReports(self, rtcpAddress):
+		"""Send Sender Reports to, and take Receiver Reports from, the client's RTCP port."""
+		self.stopReports()
+		self.clientInfo['rtcpAddress'] = rtcpAddress
+		self.clientInfo['nextReport'] = 0.0
+		rtcpEndpoint.register(rtcpAddress, self.rtcpReceived)
+
+	def stopReports(self):
+		if 'rtcpAddress' in self.clientInfo:
+			rtcpEndpoint.unregister(self.clientInfo.pop('rtcpAddress'))
+		self.clientInfo.pop('receptionReport', None)
+
+	def sendSenderReport(self, now):
+		"""Tell the client how much was sent and how the RTP clock maps to wall clock time."""
+		timestamp, sentAt = self.clientInfo['rtpClock']
+		rtpTimestamp = timestamp + int((now - sentAt) * CLOCK_RATE)
+		report = SenderReport(self.clientInfo['ssrc'], ntpTime(now), rtpTimestamp, self.clientInfo['rtpPackets'], self.clientInfo['rtpOctets'])
+		rtcpEndpoint.send(report, self.clientInfo['rtcpAddress'])
+		# Randomize the interval so that sessions started together do not report together
+		self.clientInfo['nextReport'] = now + RTCP_INTERVAL * random.uniform(0.5, 1.5)
+
+	def rtcpReceived(self, report, arrival):
+		"""Handle an RTCP packet from the client. Called from the RTCP thread."""
+		rtcpPackets.inc()
+		if isinstance(report, ReceiverReport):
+			self.receiverReport(report, arrival)
+		elif isinstance(report, Nack):
+			self.retransmit(report.lost)
 
-			self.replyRtsp(self.OK_200, seq[1])
+	def receiverReport(self, report, arrival):
+		"""Keep the client's latest reception statistics."""
+		if not report.blocks:
+			return
+		block = report.blocks[0]
+		self.clientInfo['receptionReport'] = (block, block.roundTrip(arrival))
+		log.debug("RTCP RR from session %s: %s", self.clientInfo['session'], self.quality())
+		adapter = self.clientInfo.get('adapter')
+		if adapter and adapter.report(block.fractionLost / 256):
+			log.info("Session %s quality level %s", self.clientInfo['session'], adapter.level)
+
+	def retransmit(self, lost):
+		"""Send the NACKed packets again from the send history."""
+		history = self.clientInfo.get('history')
+		if history is None or self.state != self.PLAYING:
+			return
+		address = self.rtpAddress()
+		try:
+			for seq in lost:
+				rtpPacket = history.get(seq)
+				if rtpPacket is not None:
+					self.sendRtpPacket(rtpPacket, address)
+					packetsRetransmitted.inc()
+		except OSError:
+			pass # The RTP socket closed under us
+
+	def quality(self):
+		"""Return the reception quality last reported by the client, or {} before its first report."""
+		if 'receptionReport' not in self.clientInfo:
+			return {}
+		block, roundTrip = self.clientInfo['receptionReport']
+		quality = {'fractionLost': round(block.fractionLost / 256, 4),
+				   'cumulativeLost': block.cumulativeLost,
+				   'jitterMs': round(block.jitter * 1000 / CLOCK_RATE, 2)}
+		if roundTrip is not None:
+			quality['roundTripMs'] = round(roundTrip * 1000, 2)
+		return quality
+
+	def setParameters(self, body):
+		"""Apply the 'name: value' lines of a SET_PARAMETER body; unknown names are ignored."""
+		for line in body.splitlines():
+			name, _, value = line.partition(':')
+			name, value = name.strip().lower(), value.strip().lower()
+			if name == 'quality' and 'adapter' in self.clientInfo:
+				adapter = self.clientInfo['adapter']
+				if value == 'auto':
+					adapter.fixed = False
+				elif value.isdigit():
+					adapter.setLevel(int(value), fixed=True)
+
+	def openRenditions(self, filename):
+		"""Open every rendition of the movie now, so switching later opens no file on the send path."""
+		opened = {}
+		for rendition in renditions(filename):
+			try:
+				opened[rendition] = registry.open(rendition)
+			except IOError:
+				log.warning("Rendition %s cannot be read", rendition)
+		self.clientInfo['renditions'] = opened
+
+	def adaptStream(self):
+		"""Switch to the rendition of the current quality level, at the same frame."""
+		rendition = self.clientInfo['adapter'].rendition()
+		with self.streamLock:
+			if rendition == self.clientInfo.get('rendition') or 'videoStream' not in self.clientInfo:
+				return
+			held = self.clientInfo.get('renditions', {}).get(rendition)
+			if held is None:
+				return # Keep streaming the rendition we have
+			videoStream = prefetcher.open(held.copy())
+			videoStream.seek(self.clientInfo['videoStream'].frameNbr())
+			self.clientInfo.pop('videoStream').close()
+			self.clientInfo['videoStream'] = videoStream
+			self.clientInfo['rendition'] = rendition
+		log.info("Session %s switched to %s", self.clientInfo['session'], rendition)
+
+	def resources(self):
+		"""Return the file descriptors, threads and buffer bytes this session holds.
+
+		The mapped movie is shared by every session playing it and is not counted.
+		"""
+		fds = 1 # The RTSP connection
+		rtpSocket = self.clientInfo.get('rtpSocket')
+		if rtpSocket is not None and rtpSocket.fileno() != -1:
+			fds += 1
+		bufferBytes = len(self.parser.buffer)
+		if 'rtpPacket' in self.clientInfo:
+			bufferBytes += len(self.clientInfo['rtpPacket'].header)
+		if 'history' in self.clientInfo:
+			bufferBytes += self.clientInfo['history'].bytes
+		return fds, 1, bufferBytes
+
+	def expire(self):
+		"""Close the RTSP connection of a timed-out session; the receive thread then cleans up."""
+		try:
+			self.clientInfo['rtspSocket'][0].shutdown(socket.SHUT_RDWR)
+		except OSError:
+			pass
+
+	def openVideoStream(self, filename):
+		"""Open a cursor on the shared movie, reading ahead, and release the previous one."""
+		videoStream = prefetcher.open(registry.open(filename))
+		self.closeVideoStream()
+		with self.streamLock:
+			self.clientInfo['videoStream'] = videoStream
+			self.clientInfo['rendition'] = filename
+
+	def closeVideoStream(self):
+		"""Give the movie, its renditions, and the broadcast channel if any, back."""
+		with self.streamLock:
+			if 'videoStream' in self.clientInfo:
+				self.clientInfo.pop('videoStream').close()
+			for held in self.clientInfo.pop('renditions', {}).values():
+				held.close()
+		if 'channel' in self.clientInfo:
+			broadcaster.detach(self.clientInfo.pop('channel'))
+
+	def seekVideoStream(self, rangeValue):
+		"""Move the stream to the start of an RTSP Range and return the reply headers.
+
+		Both 'npt=<seconds>-' (seconds, or hh:mm:ss) and 'frames=<n>-' are
+		accepted; the reply echoes the position actually reached in the same unit.
+		"""
+		if not rangeValue:
+			return {}
+		if 'channel' in self.clientInfo:
+			# Broadcasts are live: report where the shared stream is instead
+			return {'Range': f"npt={self.clientInfo['channel'].position():.3f}-"}
+		unit, _, spec = rangeValue.partition('=')
+		unit = unit.strip().lower()
+		start = spec.split('-')[0].strip()
+		videoStream = self.clientInfo['videoStream']
+		fps = self.clientInfo['fps']
+		frame = None
+		try:
+			if unit == 'frames':
+				frame = int(start)
+			elif unit == 'npt' and start and start != 'now':
+				seconds = 0.0
+				for part in start.split(':'):
+					seconds = seconds * 60 + float(part)
+				frame = int(seconds * fps)
+		except (ValueError, OverflowError):
+			pass # Unparsable or infinite range: keep playing from the current position
+		if frame is not None:
+			videoStream.seek(max(0, min(frame, videoStream.frameCount() - 1)))
+		if unit == 'frames':
+			return {'Range': f"frames={videoStream.frameNbr()}-"}
+		return {'Range': f"npt={videoStream.frameNbr() / fps:.3f}-"}
+
+	def openRtpSocket(self):
+		"""Create the RTP/UDP socket used for this session."""
+		self.clientInfo["rtpSocket"] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+	def closeRtpSocket(self):
+		"""Close the RTP/UDP socket of this session."""
+		self.clientInfo['rtpSocket'].close()
+
+	def startSending(self):
+		"""Start sending RTP packets: join the broadcast channel, or pace a stream of our own."""
+		if 'channel' in self.clientInfo:
+			self.clientInfo['channel'].join(self.rtpAddress())
+			self.clientInfo['joined'] = True
+		else:
+			self.startPacing()
+
+	def stopSending(self):
+		"""Stop sending RTP packets on PAUSE, STOP or TEARDOWN."""
+		if self.clientInfo.pop('joined', False):
+			self.clientInfo['channel'].leave(self.rtpAddress())
+		else:
+			self.stopPacing()
+
+	def rtpAddress(self):
+		return (self.clientInfo['rtspSocket'][1][0], int(self.clientInfo['rtpPort']))
+
+	def startPacing(self):
+		"""Hand the session to the shared pacing scheduler and start sending RTP packets."""
+		self.clientInfo['pacer'] = PacedStream(self.sendRtp, self.clientInfo['fps'])
+		scheduler.add(self.clientInfo['pacer'])
+
+	def stopPacing(self):
+		"""Take the session's stream off the pacing scheduler."""
+		pacer = self.clientInfo.get('pacer')
+		if pacer and pacer.active:
+			scheduler.remove(pacer)
+			log.info("Pacing: %s", pacer.stats)
+
+	def startDescription(self):
+		"""Send the session description to the client in the background."""
+		threading.Thread(target=self.sendDescription).start()
 
 	def sendDescription(self):
 		with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as descSocket:
 			descSocket.connect((self.clientInfo['rtspSocket'][1][0], int(self.clientInfo['descPort'])))
 			descSocket.sendall(self.clientInfo["description"].encode())
 			
-	def sendRtp(self):
-		"""Send RTP packets over UDP."""
-		while True:
-			self.clientInfo['event'].wait(0.05) 
-			
-			# Stop sending if request is PAUSE or TEARDOWN
-			if self.clientInfo['event'].isSet(): 
-				break 
-				
-			data = self.clientInfo['videoStream'].nextFrame()
-			if data:
-				frameNumber = self.clientInfo['videoStream'].frameNbr()
-				try:
-					address = self.clientInfo['rtspSocket'][1][0]
-					port = int(self.clientInfo['rtpPort'])
-					self.clientInfo['rtpSocket'].sendto(self.makeRtp(data, frameNumber),(address,port))
-				except:
-					print("Connection Error")
+	def sendRtp(self, skip=0):
+		"""Send the next frame over UDP, after skipping frames the pacer dropped.
+
+		Called at each frame deadline; returns False at the end of the movie,
+		None if the frame is not read yet.
+		"""
+		adapter = self.clientInfo.get('adapter')
+		if adapter:
+			self.adaptStream() # Renditions change at frame boundaries only
+		videoStream = self.clientInfo.get('videoStream')
+		if videoStream is None:
+			return False # Torn down meanwhile
+		if skip:
+			videoStream.seek(videoStream.frameNbr() + skip)
+		tic = time.perf_counter()
+		data = videoStream.nextFrame()
+		frameReadTime.record(time.perf_counter() - tic)
+		if data is None:
+			self.clientInfo['rtpFrames'] += skip
+			return None # Still being read ahead: the pacer tries again shortly
+		if not data:
+			return False
+
+		# The media clock advances by every frame slot, sent or dropped
+		self.clientInfo['rtpFrames'] += skip + 1
+		timestamp = self.mediaTimestamp()
+		if adapter and not adapter.sendsFrame(videoStream.frameNbr() - 1):
+			return True # Lowered frame rate
+		try:
+			address = self.clientInfo['rtspSocket'][1][0]
+			port = int(self.clientInfo['rtpPort'])
+			fec = self.clientInfo.get('fec')
+			packets, octets = self.clientInfo['rtpPackets'], self.clientInfo['rtpOctets']
+			start = time.perf_counter()
+			sending = 0.0
+			for payloadHeader, chunk, last in self.clientInfo['packetizer'].fragments(data):
+				rtpPacket = self.makeRtp(chunk, payloadHeader, last, timestamp)
+				sending += self.sendTimed(rtpPacket, (address, port))
+				if fec:
+					for parity in fec.add(rtpPacket):
+						sending += self.sendTimed(parity, (address, port))
+						parityPacketsSent.inc()
+			packetizeTime.record(time.perf_counter() - start - sending)
+			framesSent.inc()
+			packetsSent.inc(self.clientInfo['rtpPackets'] - packets)
+			bytesSent.inc(self.clientInfo['rtpOctets'] - octets)
+		except OSError:
+			sendErrors.inc()
+			log.warning("Connection Error")
+
+		# Sender Report at the RTCP interval
+		now = time.time()
+		self.clientInfo['rtpClock'] = (timestamp, now)
+		if 'rtcpAddress' in self.clientInfo and now >= self.clientInfo['nextReport']:
+			self.sendSenderReport(now)
+		return True
+
+	def sendRtpPacket(self, rtpPacket, address):
+		"""Send an encoded RTP packet on the session's RTP socket."""
+		rtpPacket.sendTo(self.clientInfo['rtpSocket'], address)
+
+	def sendTimed(self, rtpPacket, address):
+		"""Send a packet, recording how long the send took; return that time."""
+		tic = time.perf_counter()
+		self.sendRtpPacket(rtpPacket, address)
+		elapsed = time.perf_counter() - tic
+		sendTime.record(elapsed)
+		return elapsed
 
 	# Testing packet loss function
 	# def sendRtp(self):
@@ -193,40 +631,66 @@ class ServerWorker:
 	# 					print("Connection Error")
 	# 			break
 
-	def makeRtp(self, payload, frameNbr):
-		"""RTP-packetize the video data."""
+	def mediaTimestamp(self):
+		"""Return the RTP timestamp of the current frame slot on the 90 kHz clock."""
+		elapsed = int(self.clientInfo['rtpFrames'] * CLOCK_RATE / self.clientInfo['fps'])
+		return (self.clientInfo['rtpOffset'] + elapsed) & 0xFFFFFFFF
+
+	def makeRtp(self, payload, payloadHeader, last, timestamp):
+		"""RTP-packetize one fragment of a frame into the session's reusable RtpPacket."""
 		version = 2
 		padding = 0
 		extension = 0
 		cc = 0
-		marker = 0
+		marker = 1 if last else 0 # Set on the last fragment of a frame
 		pt = 26 # MJPEG type
-		seqnum = frameNbr
-		ssrc = 0 
+		seqnum = self.clientInfo['rtpSeq']
+		ssrc = self.clientInfo['ssrc']
+		self.clientInfo['rtpSeq'] = (seqnum + 1) & 0xFFFF
 		
-		rtpPacket = RtpPacket()
+		rtpPacket = self.clientInfo.setdefault('rtpPacket', RtpPacket())
 		
-		rtpPacket.encode(version, padding, extension, cc, seqnum, marker, pt, ssrc, payload)
+		rtpPacket.encode(version, padding, extension, cc, seqnum, marker, pt, ssrc, payload,
+						 timestamp, payloadHeader)
+		self.clientInfo['rtpPackets'] += 1
+		self.clientInfo['rtpOctets'] += len(payloadHeader) + len(payload)
+		if 'history' in self.clientInfo:
+			self.clientInfo['history'].add(seqnum, rtpPacket.copy())
 		
-		return rtpPacket.getPacket()
+		return rtpPacket
 		
-	def replyRtsp(self, code, seq):
+	def replyRtsp(self, code, seq, headers=None, body=b''):
 		"""Send RTSP reply to the client."""
 		if code == self.OK_200:
 			#print("200 OK")
-			reply = 'RTSP/1.0 200 OK\nCSeq: ' + seq + '\nSession: ' + str(self.clientInfo['session'])
-			connSocket = self.clientInfo['rtspSocket'][0]
-			connSocket.send(reply.encode())
+			reply = RtspMessage('RTSP/1.0 200 OK')
+			reply.headers['CSeq'] = seq
+			reply.headers['Session'] = f"{self.clientInfo['session']};timeout={sessions.timeout}"
+			for name, value in (headers or {}).items():
+				reply.headers[name] = value
+			reply.body = body
+			self.sendRtspReply(reply.encode())
 		
 		# Error messages
 		elif code == self.FILE_NOT_FOUND_404:
-			print("404 NOT FOUND")
+			log.warning("404 NOT FOUND")
+			reply = RtspMessage('RTSP/1.0 404 Not Found')
+			reply.headers['CSeq'] = seq
+			self.sendRtspReply(reply.encode())
 		elif code == self.CON_ERR_500:
-			print("500 CONNECTION ERROR")
+			log.warning("500 CONNECTION ERROR")
+		elif code == self.BAD_REQUEST_400:
+			log.warning("400 BAD REQUEST")
+			reply = RtspMessage('RTSP/1.0 400 Bad Request')
+			reply.headers['CSeq'] = seq
+			self.sendRtspReply(reply.encode())
 	
-	def getDescription(self, data):
-		request = data.split('\n')
-		line1 = request[0].split(' ')
-		description = f"v= {line1[2]}"
-		description += f"\nu= {line1[1]}"
+	def sendRtspReply(self, reply):
+		"""Write an encoded RTSP reply on the RTSP/TCP connection."""
+		connSocket = self.clientInfo['rtspSocket'][0]
+		connSocket.sendall(reply)
+
+	def getDescription(self, request):
+		description = f"v= {request.version}"
+		description += f"\nu= {request.uri}"
 		return description
\ No newline at end of file
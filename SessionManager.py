@@ -0,0 +1,117 @@
+from random import randint
+from time import monotonic, sleep
+import logging, os, threading
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 60	# Seconds without a request before a session is closed (RFC 2326 default)
+
+class SessionManager:
+	"""Process-wide table of RTSP sessions keyed by Session ID.
+
+	Every RTSP connection holds a session from the moment it is accepted, so
+	connections that never get as far as SETUP are timed out too. Each
+	request refreshes its session; a reaper thread closes the connections of
+	sessions idle for longer than the timeout, and the worker's normal
+	end-of-connection path then frees the stream, socket and thread.
+	"""
+
+	def __init__(self, timeout=DEFAULT_TIMEOUT):
+		self.timeout = timeout
+		self.lock = threading.Lock()
+		self.workers = {}		# Session ID -> ServerWorker
+		self.lastSeen = {}		# Session ID -> monotonic time of the last request
+		self.reaped = 0
+		self.thread = None
+
+	def setTimeout(self, timeout):
+		self.timeout = timeout
+
+	def add(self, worker):
+		"""Give the worker a new unique Session ID and start timing it."""
+		with self.lock:
+			if self.thread is None:
+				self.thread = threading.Thread(target=self.run, name="SessionReaper", daemon=True)
+				self.thread.start()
+			session = randint(100000, 999999)
+			while session in self.workers:
+				session = randint(100000, 999999)
+			self.workers[session] = worker
+			self.lastSeen[session] = monotonic()
+		worker.clientInfo['session'] = session
+		return session
+
+	def remove(self, worker):
+		"""Forget the worker's session."""
+		with self.lock:
+			session = worker.clientInfo.get('session')
+			if self.workers.get(session) is worker:
+				del self.workers[session]
+				del self.lastSeen[session]
+
+	def renew(self, worker):
+		"""End the worker's session and start a new one on the same connection."""
+		self.remove(worker)
+		return self.add(worker)
+
+	def touch(self, worker):
+		"""Note activity on the worker's session."""
+		session = worker.clientInfo.get('session')
+		with self.lock:
+			if session in self.lastSeen:
+				self.lastSeen[session] = monotonic()
+
+	def get(self, session):
+		with self.lock:
+			return self.workers.get(session)
+
+	def expired(self, now):
+		"""Remove and return the workers whose sessions have timed out."""
+		with self.lock:
+			idle = [s for s, seen in self.lastSeen.items() if now - seen > self.timeout]
+			workers = [self.workers.pop(s) for s in idle]
+			for s in idle:
+				del self.lastSeen[s]
+			self.reaped += len(idle)
+		return workers
+
+	def run(self):
+		while True:
+			sleep(min(1.0, self.timeout / 4))
+			for worker in self.expired(monotonic()):
+				log.info("Session %s timed out", worker.clientInfo.get('session'))
+				try:
+					worker.expire()
+				except Exception as e:
+					log.error("Session reaping error: %s", e)
+
+	def stats(self):
+		"""Counts of sessions and of the resources they hold, plus process-wide totals."""
+		with self.lock:
+			workers = list(self.workers.values())
+		stats = {'connections': len(workers),
+				 'sessions': sum(1 for w in workers if w.state != w.INIT),
+				 'playing': sum(1 for w in workers if w.state == w.PLAYING),
+				 'reaped': self.reaped,
+				 'sessionFds': 0, 'sessionThreads': 0, 'sessionBufferBytes': 0}
+		for worker in workers:
+			fds, threads, bufferBytes = worker.resources()
+			stats['sessionFds'] += fds
+			stats['sessionThreads'] += threads
+			stats['sessionBufferBytes'] += bufferBytes
+
+		# Reception quality from the sessions' latest RTCP Receiver Reports
+		reports = [quality for quality in (worker.quality() for worker in workers) if quality]
+		stats['reportingSessions'] = len(reports)
+		if reports:
+			stats['meanFractionLost'] = round(sum(q['fractionLost'] for q in reports) / len(reports), 4)
+			stats['maxFractionLost'] = max(q['fractionLost'] for q in reports)
+			stats['maxJitterMs'] = max(q['jitterMs'] for q in reports)
+		try:
+			stats['processFds'] = len(os.listdir('/proc/self/fd'))
+		except OSError:
+			stats['processFds'] = None # Not available on this platform
+		stats['processThreads'] = threading.active_count()
+		return stats
+
+sessions = SessionManager()
@@ -1,3 +1,8 @@
+from FrameIndex import FrameIndex
+
+DEFAULT_FPS = 20
+MAX_FPS = 120 # highest frame rate a client may ask for, so one session cannot monopolize the pacing thread
+
 class VideoStream:
 	def __init__(self, filename):
 		self.filename = filename
@@ -5,21 +10,32 @@ class VideoStream:
 			self.file = open(filename, 'rb')
 		except:
 			raise IOError
+		self.index = FrameIndex.open(filename)
 		self.frameNum = 0
 		
 	def nextFrame(self):
 		"""Get next frame."""
-		data = self.file.read(5) # Get the framelength from the first 5 bits
-		if data: 
-			framelength = int(data)
-							
-			# Read the current frame
-			data = self.file.read(framelength)
-			self.frameNum += 1
+		if self.frameNum >= len(self.index):
+			return b''
+		offset, framelength = self.index.frame(self.frameNum)
+		self.file.seek(offset)
+		data = self.file.read(framelength)
+		self.frameNum += 1
 		return data
 		
 	def frameNbr(self):
 		"""Get frame number."""
 		return self.frameNum
+
+	def seek(self, frameNbr):
+		"""Make the frame after frameNbr the next one to be read."""
+		self.frameNum = max(0, min(frameNbr, len(self.index)))
+
+	def frameCount(self):
+		"""Get the number of frames in the movie."""
+		return len(self.index)
+
+	def duration(self, fps=DEFAULT_FPS):
+		"""Get the length of the movie in seconds."""
+		return len(self.index) / fps
 	
-	
\ No newline at end of file
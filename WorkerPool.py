@@ -0,0 +1,154 @@
+import logging, multiprocessing, os, queue, signal, sys, threading, time
+
+from SessionManager import sessions
+from Broadcast import broadcaster
+from Metrics import metrics
+
+log = logging.getLogger(__name__)
+
+STATS_INTERVAL = 5.0	# Seconds between stats reports from the workers
+RESTART_DELAY = 1.0		# First delay before restarting a crashed worker; doubles while it keeps crashing
+MAX_RESTART_DELAY = 30.0
+STABLE_AFTER = 60.0		# A worker up this long is healthy again and restarts quickly next time
+STOP_TIMEOUT = 5.0		# Seconds a terminated worker has to exit before it is killed
+
+class Worker:
+	"""Parent-side record of one worker process slot."""
+
+	def __init__(self, index):
+		self.index = index
+		self.process = None
+		self.started = 0.0
+		self.restarts = 0
+		self.restartDelay = RESTART_DELAY
+		self.restartAt = None
+		self.stats = {}
+		self.cpu = (0.0, 0.0)	# (process CPU seconds, wall clock) of the last report
+
+class WorkerPool:
+	"""Pre-forked server processes sharing the RTSP port, supervised by the parent.
+
+	Each worker runs serve(*args) with its own sessions, media registry and
+	pacing scheduler; the kernel spreads new connections over the workers'
+	SO_REUSEPORT listening sockets. The parent restarts workers that die,
+	backing off while one keeps crashing, and prints the workers' stats
+	added together.
+	"""
+
+	def __init__(self, count, serve, args=(), statsInterval=STATS_INTERVAL):
+		self.serve = serve
+		self.args = args
+		self.statsInterval = statsInterval
+		self.workers = [Worker(i) for i in range(count)]
+		self.queue = multiprocessing.Queue()
+		self.stopping = False
+
+	def main(self):
+		# Stop the workers too when the parent is terminated
+		signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+		for worker in self.workers:
+			self.start(worker)
+		try:
+			self.supervise()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			self.stop()
+
+	def start(self, worker):
+		worker.process = multiprocessing.Process(target=self.runWorker, args=(worker.index,),
+												 name=f"ServerWorker-{worker.index}")
+		worker.process.start()
+		worker.started = time.monotonic()
+		worker.restartAt = None
+		log.info("Worker %d started, pid %d", worker.index, worker.process.pid)
+
+	def runWorker(self, index):
+		"""Entry point of a worker process."""
+		# Not the parent's handler: sys.exit would only end the main thread, and the sessions' threads keep running
+		signal.signal(signal.SIGTERM, signal.SIG_DFL)
+		broadcaster.setWorker(index) # Multicast groups must not clash with other workers'
+		metrics.setWorker(index) # Nor metrics endpoints
+		threading.Thread(target=self.reportStats, args=(index,), daemon=True).start()
+		self.serve(*self.args)
+
+	def reportStats(self, index):
+		parent = os.getppid()
+		while True:
+			time.sleep(self.statsInterval)
+			if os.getppid() != parent:
+				os._exit(1) # The supervisor is gone
+			self.queue.put((index, os.getpid(), sessions.stats(), time.process_time(), time.monotonic()))
+
+	def supervise(self):
+		nextSummary = time.monotonic() + self.statsInterval
+		while True:
+			self.collectStats(timeout=0.5)
+			now = time.monotonic()
+			for worker in self.workers:
+				self.check(worker, now)
+			if now >= nextSummary:
+				log.info(self.summary())
+				nextSummary = now + self.statsInterval
+
+	def check(self, worker, now):
+		"""Restart a worker that has exited, after its back-off delay."""
+		if worker.restartAt is not None:
+			if now >= worker.restartAt:
+				worker.restarts += 1
+				self.start(worker)
+			return
+		if worker.process.is_alive():
+			if now - worker.started > STABLE_AFTER:
+				worker.restartDelay = RESTART_DELAY
+			return
+		log.warning("Worker %d (pid %d) exited with code %s, restarting in %.0fs",
+					worker.index, worker.process.pid, worker.process.exitcode, worker.restartDelay)
+		worker.process.join()
+		worker.stats = {}
+		worker.restartAt = now + worker.restartDelay
+		worker.restartDelay = min(MAX_RESTART_DELAY, worker.restartDelay * 2)
+
+	def collectStats(self, timeout):
+		"""Take the stats reports the workers have sent."""
+		try:
+			while True:
+				index, pid, stats, cpu, clock = self.queue.get(timeout=timeout)
+				timeout = 0
+				worker = self.workers[index]
+				if worker.process is None or worker.process.pid != pid:
+					continue # Report from a worker that has since been replaced
+				lastCpu, lastClock = worker.cpu
+				stats['cpu'] = (cpu - lastCpu) / (clock - lastClock) if lastClock else 0.0
+				worker.cpu = (cpu, clock)
+				worker.stats = stats
+		except queue.Empty:
+			pass
+
+	def summary(self):
+		"""One line with the stats of every worker added together."""
+		up = sum(1 for w in self.workers if w.process.is_alive())
+		restarts = sum(w.restarts for w in self.workers)
+		total = {}
+		for worker in self.workers:
+			for key, value in worker.stats.items():
+				if isinstance(value, (int, float)):
+					total[key] = total.get(key, 0) + value
+		cpu = ' '.join(f"{w.stats.get('cpu', 0.0):.0%}" for w in self.workers)
+		return (f"Workers: {up}/{len(self.workers)} up, {restarts} restarts, "
+				f"connections={total.get('connections', 0)} sessions={total.get('sessions', 0)} "
+				f"playing={total.get('playing', 0)} reaped={total.get('reaped', 0)} "
+				f"fds={total.get('processFds', 0)} threads={total.get('processThreads', 0)} cpu=[{cpu}]")
+
+	def stop(self):
+		for worker in self.workers:
+			if worker.process and worker.process.is_alive():
+				worker.process.terminate()
+		deadline = time.monotonic() + STOP_TIMEOUT
+		for worker in self.workers:
+			if worker.process:
+				worker.process.join(max(0.0, deadline - time.monotonic()))
+				if worker.process.is_alive():
+					log.warning("Worker %d (pid %d) did not stop, killing it", worker.index, worker.process.pid)
+					worker.process.kill()
+					worker.process.join()
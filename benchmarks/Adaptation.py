@@ -0,0 +1,50 @@
+"""Goodput and freeze time through a constrained link, with and without adaptive bitrate.
+
+A headless client plays a synthetic movie whose full-quality stream is wider
+than an emulated link (fixed bit rate, drop-tail queue, optional random
+loss); the movie@480 rendition fits. With adaptation the server steps down on
+the client's Receiver Reports; without it the client pins the top quality
+level with SET_PARAMETER and the queue overflows.
+"""
+import argparse, os, tempfile
+
+from benchmarks import makeMovie
+from benchmarks.Network import runSession
+from NetEmulator import Impairment
+
+def runOnce(adapt, args, movie):
+	impairment = Impairment(loss=args.loss, rate=args.rate * 1e6, queueBytes=args.queue * 1024, seed=args.seed)
+	prepare = None if adapt else lambda client: client.setQuality(0)
+	r = runSession(movie, impairment, f'play:{args.duration}', args.mode, prepare=prepare,
+				   reportInterval=args.rtcp_interval)
+	return {
+		'adapt': adapt,
+		'fps': r['fps'],
+		'goodput': r['goodputMbps'] * 1e6,
+		'freeze': r['freezeSec'],
+		'dropped': r['link']['lost'] + r['link']['queueDrops'],
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--mode', choices=['threaded', 'async'], default='async')
+	parser.add_argument('--rate', type=float, default=3.0, help="link rate in Mbit/s")
+	parser.add_argument('--queue', type=int, default=64, help="link queue in KiB")
+	parser.add_argument('--loss', type=float, default=0.0, help="random loss on the link (0-1)")
+	parser.add_argument('--duration', type=float, default=20.0)
+	parser.add_argument('--rtcp-interval', type=float, default=1.0)
+	parser.add_argument('--seed', type=int, default=1)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		# About 4.8 Mbit/s at full quality and 1.3 Mbit/s at 480 lines, at 20 fps
+		movie = makeMovie(os.path.join(tmp, 'movie.Mjpeg'), frames=2000, frameSize=30000)
+		makeMovie(os.path.join(tmp, 'movie@480.Mjpeg'), frames=2000, frameSize=8000)
+		print(f"{'adapt':>5} {'shown fps':>9} {'goodput Mbit/s':>14} {'freeze s':>8} {'dropped':>7}")
+		for adapt in (False, True):
+			r = runOnce(adapt, args, movie)
+			print(f"{'yes' if r['adapt'] else 'no':>5} {r['fps']:>9.1f} {r['goodput'] / 1e6:>14.2f} "
+				  f"{r['freeze']:>8.1f} {r['dropped']:>7}")
+
+if __name__ == '__main__':
+	main()
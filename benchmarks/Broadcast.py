@@ -0,0 +1,96 @@
+"""Server CPU as viewers of one movie grow: per-session unicast vs. broadcast fan-out and multicast.
+
+Every viewer SETUPs and PLAYs the same synthetic movie on a fresh asyncio
+server. Unicast sessions each pace, read and encode their own copy of the
+stream; broadcast sessions share one channel, so only the per-viewer sends
+(fan-out) or nothing at all (multicast) grows with the audience.
+"""
+import argparse, asyncio, os, socket, subprocess, sys, tempfile
+
+from benchmarks import makeMovie
+from benchmarks.ServerLoad import ROOT, Receiver, procStats, request, freePort, waitForServer
+from RtspParser import headerParams
+
+TRANSPORTS = {
+	'unicast': "RTP/UDP; client_port= {port}",
+	'fanout': "RTP/UDP;unicast;client_port={port};broadcast",
+	'multicast': "RTP/UDP;multicast;client_port={port}",
+}
+
+async def startViewer(port, movie, delivery):
+	loop = asyncio.get_running_loop()
+	transport, receiver = await loop.create_datagram_endpoint(Receiver, local_addr=('127.0.0.1', 0))
+	rtpPort = transport.get_extra_info('sockname')[1]
+	reader, writer = await asyncio.open_connection('127.0.0.1', port)
+	reply = await request(reader, writer, f"SETUP {movie} RTSP/1.0\r\nCSeq: 1\r\n"
+								f"Transport: {TRANSPORTS[delivery].format(port=rtpPort)}")
+	lines = reply.decode().split('\r\n')
+	session = lines[2].split(' ')[1].split(';')[0]
+	if delivery == 'multicast':
+		# Listen on the group the server handed out instead
+		transport.close()
+		params = headerParams([l for l in lines if l.startswith('Transport:')][0].partition(':')[2])
+		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		sock.bind(('', int(params['port'])))
+		sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+						socket.inet_aton(params['destination']) + socket.inet_aton('0.0.0.0'))
+		transport, receiver = await loop.create_datagram_endpoint(Receiver, sock=sock)
+	await request(reader, writer, f"PLAY {movie} RTSP/1.0\r\nCSeq: 2\r\nSession: {session}")
+	return transport, receiver, writer
+
+async def startViewers(port, movie, delivery, viewers):
+	sessions = []
+	for i in range(0, viewers, 50):
+		batch = [startViewer(port, movie, delivery) for _ in range(i, min(viewers, i + 50))]
+		sessions += await asyncio.gather(*batch)
+	await asyncio.sleep(1.0)
+	return sessions, [r.packets for _, r, _ in sessions]
+
+def runOnce(delivery, viewers, duration, movie):
+	port = freePort()
+	server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'Server.py'), str(port), '--mode', 'async'],
+							  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	probe = None
+	try:
+		probe = waitForServer(port)
+		loop = asyncio.new_event_loop()
+		sessions, start = loop.run_until_complete(startViewers(port, movie, delivery, viewers))
+		cpu0 = procStats(server.pid)[0]
+		loop.run_until_complete(asyncio.sleep(duration))
+		cpu1 = procStats(server.pid)[0]
+		received = [r.packets - s for (_, r, _), s in zip(sessions, start)]
+		for transport, _, writer in sessions:
+			transport.close()
+			writer.close()
+		loop.close()
+	finally:
+		server.kill()
+		server.wait()
+		if probe:
+			probe.close()
+	return {
+		'delivery': delivery,
+		'viewers': viewers,
+		'active': sum(1 for n in received if n > 0),
+		'pps': sum(received) / duration / viewers,
+		'cpu': (cpu1 - cpu0) / duration,
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--viewers', type=int, nargs='+', default=[1, 10, 50, 200])
+	parser.add_argument('--deliveries', nargs='+', choices=list(TRANSPORTS), default=list(TRANSPORTS))
+	parser.add_argument('--duration', type=float, default=5.0)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		movie = makeMovie(os.path.join(tmp, 'movie.Mjpeg'), frames=2000)
+		print(f"{'delivery':>9} {'viewers':>7} {'active':>6} {'pkts/s/viewer':>13} {'cpu':>6}")
+		for viewers in args.viewers:
+			for delivery in args.deliveries:
+				r = runOnce(delivery, viewers, args.duration, movie)
+				print(f"{r['delivery']:>9} {r['viewers']:>7} {r['active']:>6} {r['pps']:>13.1f} {r['cpu']:>6.1%}")
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,117 @@
+"""XOR FEC: encode/decode cost per packet, and residual loss under simulated loss.
+
+The cost is measured on MTU-sized packets, against a per-byte XOR loop for
+reference. Residual loss is simulated in-process: a stream of packets and
+its parity goes through a channel that loses packets at random (or in
+bursts with --burst), and the decoder rebuilds what it can.
+"""
+import argparse, os, random, time
+
+from Fec import FecEncoder, FecDecoder, fecOption
+from RtpPacket import RtpPacket
+
+PAYLOAD = 1400 - 12 - 8 # an MTU-sized JPEG fragment
+JPEG_HEADER = bytes(8)
+
+def makePackets(n, rng, size=PAYLOAD):
+	packets = []
+	for seq in range(n):
+		rtpPacket = RtpPacket()
+		length = size if rng.random() < 0.9 else rng.randint(100, size) # last fragments are shorter
+		rtpPacket.encode(2, 0, 0, 0, seq, 0, 26, 1, os.urandom(length), seq // 10 * 4500, JPEG_HEADER)
+		packets.append(rtpPacket)
+	return packets
+
+def transmissions(packets, k, depth):
+	"""Return the encoded datagrams of the packets and their parity, in send order."""
+	encoder = FecEncoder(k, depth) if k else None
+	sent = []
+	for rtpPacket in packets:
+		sent.append((False, bytes(rtpPacket.getPacket())))
+		if encoder:
+			sent += [(True, bytes(parity.getPacket())) for parity in encoder.add(rtpPacket)]
+	return sent
+
+def bytewiseParity(payloads):
+	"""The per-byte loop the big-int XOR replaces."""
+	parity = bytearray(max(len(p) for p in payloads))
+	for payload in payloads:
+		for i, b in enumerate(payload):
+			parity[i] ^= b
+	return parity
+
+def costs(k, depth, rng, n=4096):
+	packets = makePackets(n, rng)
+	encoder = FecEncoder(k, depth)
+	tic = time.perf_counter()
+	for rtpPacket in packets:
+		encoder.add(rtpPacket)
+	encode = (time.perf_counter() - tic) / n
+
+	# Lose the first packet of every group so each parity packet rebuilds one
+	sent = transmissions(packets, k, depth)
+	received = []
+	for isParity, data in sent:
+		rtpPacket = RtpPacket()
+		rtpPacket.decode(data)
+		if isParity or (rtpPacket.seqNum() % (k * depth)) >= depth:
+			received.append((isParity, rtpPacket))
+	decoder = FecDecoder()
+	tic = time.perf_counter()
+	for isParity, rtpPacket in received:
+		if isParity:
+			decoder.parity(rtpPacket)
+		else:
+			decoder.media(rtpPacket)
+	decode = (time.perf_counter() - tic) / n
+
+	payloads = [rtpPacket.getPayload() for rtpPacket in packets[:k * 20]]
+	tic = time.perf_counter()
+	for i in range(0, len(payloads), k):
+		bytewiseParity(payloads[i:i + k])
+	bytewise = (time.perf_counter() - tic) / len(payloads)
+	return encode, decode, bytewise
+
+def residualLoss(k, depth, loss, burst, rng, n=20000):
+	"""Share of media packets neither received nor rebuilt."""
+	packets = makePackets(n, rng, size=200) # payload size does not matter here
+	decoder = FecDecoder(history=4096)
+	got = set()
+	lossy = False # Gilbert model: bursts of mean length `burst`
+	for isParity, data in transmissions(packets, k, depth):
+		if burst > 1:
+			lossy = rng.random() < (1 - 1 / burst if lossy else loss / (burst * (1 - loss)))
+		else:
+			lossy = rng.random() < loss
+		if lossy:
+			continue
+		rtpPacket = RtpPacket()
+		rtpPacket.decode(data)
+		if isParity:
+			got.update(p.seqNum() for p in decoder.parity(rtpPacket))
+		else:
+			got.add(rtpPacket.seqNum())
+			got.update(p.seqNum() for p in decoder.media(rtpPacket))
+	return 1 - len(got) / n
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--fec', type=fecOption, nargs='+', default=[(4, 1), (8, 1), (8, 4), (16, 1)], metavar='K[:D]')
+	parser.add_argument('--loss', type=float, nargs='+', default=[0.01, 0.02, 0.05, 0.1])
+	parser.add_argument('--burst', type=float, default=1.0, help="mean length of a loss burst (1 for random loss)")
+	args = parser.parse_args()
+	rng = random.Random(0)
+
+	print(f"{'fec':>5} {'overhead':>8} {'encode us/pkt':>13} {'decode us/pkt':>13} {'bytewise us/pkt':>15}")
+	for k, depth in args.fec:
+		encode, decode, bytewise = costs(k, depth, rng)
+		print(f"{k}:{depth:<3} {1 / k:>8.1%} {encode * 1e6:>13.1f} {decode * 1e6:>13.1f} {bytewise * 1e6:>15.1f}")
+
+	print()
+	print(f"{'loss':>5} {'none':>7}" + ''.join(f" {f'{k}:{d}':>7}" for k, d in args.fec))
+	for loss in args.loss:
+		row = [residualLoss(None, 1, loss, args.burst, rng)] + [residualLoss(k, d, loss, args.burst, rng) for k, d in args.fec]
+		print(f"{loss:>5.0%} " + ' '.join(f"{r:>7.2%}" for r in row))
+
+if __name__ == '__main__':
+	main()
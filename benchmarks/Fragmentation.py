@@ -0,0 +1,76 @@
+"""Throughput of RFC 2435 fragmentation and reassembly at HD frame sizes.
+
+Frames are packetized with JpegPacketizer, sent over loopback with
+scatter/gather sends and rebuilt by FrameAssembler in a receiver thread.
+The sender runs flat out, so frames lost to socket buffer overflow show
+up as incomplete.
+"""
+import argparse, os, socket, threading, time
+
+from RtpPacket import RtpPacket
+from RtpJpeg import JpegPacketizer, FrameAssembler, DEFAULT_MTU
+
+FRAME_SIZES = {'480p': 40000, '720p': 90000, '1080p': 200000}
+
+def receive(sock, assembler, result):
+	packet = RtpPacket()
+	while True:
+		try:
+			data = sock.recv(65536)
+		except socket.timeout:
+			break
+		packet.decode(data)
+		result['packets'] += 1
+		frame = assembler.add(packet)
+		if frame:
+			result['frames'] += 1
+			result['bytes'] += len(frame)
+
+def run(frameSize, frames, mtu):
+	receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+	receiver.bind(('127.0.0.1', 0))
+	receiver.settimeout(0.5)
+	address = receiver.getsockname()
+	sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+	result = {'packets': 0, 'frames': 0, 'bytes': 0}
+	assembler = FrameAssembler()
+	thread = threading.Thread(target=receive, args=(receiver, assembler, result))
+	thread.start()
+
+	frame = b'\xff\xd8' + os.urandom(frameSize - 4) + b'\xff\xd9'
+	packetizer = JpegPacketizer(mtu)
+	packet = RtpPacket()
+	seqnum = sent = 0
+	tic = time.perf_counter()
+	for n in range(frames):
+		for payloadHeader, chunk, last in packetizer.fragments(frame):
+			packet.encode(2, 0, 0, 0, seqnum, int(last), 26, 0, chunk, n * 3000, payloadHeader)
+			packet.sendTo(sender, address)
+			seqnum = (seqnum + 1) & 0xFFFF
+			sent += 1
+	elapsed = time.perf_counter() - tic
+	thread.join()
+	return {
+		'sent': sent,
+		'packetsPerFrame': sent / frames,
+		'sendFps': frames / elapsed,
+		'sendMbps': frames * frameSize * 8 / elapsed / 1e6,
+		'complete': result['frames'] / frames,
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--frames', type=int, default=500)
+	parser.add_argument('--mtu', type=int, default=DEFAULT_MTU)
+	args = parser.parse_args()
+
+	print(f"{'format':>6} {'frame B':>8} {'pkts/frame':>10} {'send fps':>9} {'Mbit/s':>8} {'complete':>8}")
+	for name, size in FRAME_SIZES.items():
+		r = run(size, args.frames, args.mtu)
+		print(f"{name:>6} {size:>8} {r['packetsPerFrame']:>10.1f} {r['sendFps']:>9.0f} "
+			  f"{r['sendMbps']:>8.0f} {r['complete']:>8.1%}")
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,59 @@
+"""Per-frame latency and CPU of the client's frame decode step, disk vs. memory.
+
+"disk" is the former Client path: write the frame to cache-<session>.jpg,
+then Image.open() it; "memory" decodes straight from io.BytesIO. Both
+stop at a loaded PIL image; the PhotoImage conversion that follows is the
+same for both and needs a Tk display, so it is left out. Requires Pillow.
+"""
+import argparse, io, os, tempfile, time
+
+from PIL import Image
+
+RESOLUTIONS = {'360p': (640, 360), '720p': (1280, 720)}
+
+def makeJpeg(width, height, quality=80):
+	image = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+	image = image.resize((width // 8, height // 8)).resize((width, height)) # compressible, like video
+	out = io.BytesIO()
+	image.save(out, 'JPEG', quality=quality)
+	return out.getvalue()
+
+def diskDecode(data, cachename):
+	with open(cachename, 'wb') as f:
+		f.write(data)
+	image = Image.open(cachename)
+	image.load()
+	return image
+
+def memoryDecode(data, cachename=None):
+	image = Image.open(io.BytesIO(data))
+	image.load()
+	return image
+
+def measure(decode, data, frames, cachename):
+	latencies = []
+	cpu = time.process_time()
+	for _ in range(frames):
+		tic = time.perf_counter()
+		decode(data, cachename)
+		latencies.append(time.perf_counter() - tic)
+	cpu = time.process_time() - cpu
+	latencies.sort()
+	return sum(latencies) / frames, latencies[int(frames * 0.99) - 1], cpu / frames
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--frames', type=int, default=500)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		cachename = os.path.join(tmp, 'cache-0.jpg')
+		print(f"{'size':>5} {'frame kB':>8} {'path':>7} {'mean ms':>8} {'p99 ms':>8} {'cpu ms':>8}")
+		for name, (width, height) in RESOLUTIONS.items():
+			data = makeJpeg(width, height)
+			for label, decode in (('disk', diskDecode), ('memory', memoryDecode)):
+				mean, p99, cpu = measure(decode, data, args.frames, cachename)
+				print(f"{name:>5} {len(data) / 1024:>8.1f} {label:>7} {mean * 1000:>8.3f} {p99 * 1000:>8.3f} {cpu * 1000:>8.3f}")
+
+if __name__ == '__main__':
+	main()
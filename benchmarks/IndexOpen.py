@@ -0,0 +1,65 @@
+"""Open and seek time of VideoStream with and without the sidecar frame index.
+
+A large movie is written once (default 2 GB), then the benchmark times
+building the index, opening with a fresh sidecar, random seeks through the
+index, and the old way of reaching a frame by reading every frame before it.
+"""
+import argparse, os, random, tempfile, time
+
+from FrameIndex import SIDECAR_EXT
+from VideoStream import VideoStream
+
+def writeLargeMovie(filename, sizeMB, frameSize):
+	payload = b'\xff\xd8' + bytes(frameSize - 4) + b'\xff\xd9'
+	frame = b'%05d' % frameSize + payload
+	with open(filename, 'wb') as f:
+		for _ in range(sizeMB * 1024 * 1024 // len(frame)):
+			f.write(frame)
+
+def sequentialSeek(filename, target):
+	"""Reach a frame the way VideoStream did before the index existed."""
+	with open(filename, 'rb') as f:
+		for _ in range(target):
+			f.read(int(f.read(5)))
+		return f.read(int(f.read(5)))
+
+def timed(fn, *args):
+	tic = time.perf_counter()
+	fn(*args)
+	return time.perf_counter() - tic
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--size-mb', type=int, default=2048)
+	parser.add_argument('--frame-size', type=int, default=60000)
+	parser.add_argument('--seeks', type=int, default=1000)
+	parser.add_argument('--dir', default=None, help="where to write the movie (default: a temp dir)")
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+		movie = os.path.join(tmp, 'large.Mjpeg')
+		writeLargeMovie(movie, args.size_mb, args.frame_size)
+
+		build = timed(VideoStream, movie)
+		opened = timed(VideoStream, movie)
+		stream = VideoStream(movie)
+		frames = stream.frameCount()
+		rng = random.Random(0)
+		targets = [rng.randrange(frames) for _ in range(args.seeks)]
+
+		tic = time.perf_counter()
+		for target in targets:
+			stream.seek(target)
+			stream.nextFrame()
+		indexedSeek = (time.perf_counter() - tic) / len(targets)
+		legacySeek = sum(timed(sequentialSeek, movie, t) for t in targets[:3]) / 3
+		sidecar = os.path.getsize(movie + SIDECAR_EXT)
+
+		print(f"movie: {os.path.getsize(movie) / 2**20:.0f} MB, {frames} frames, sidecar {sidecar / 1024:.0f} kB")
+		print(f"open, building index:   {build * 1000:10.2f} ms")
+		print(f"open, sidecar present:  {opened * 1000:10.2f} ms")
+		print(f"seek, sidecar index:    {indexedSeek * 1000:10.3f} ms")
+		print(f"seek, sequential scan:  {legacySeek * 1000:10.2f} ms")
+
+if __name__ == '__main__':
+	main()
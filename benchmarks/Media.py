@@ -0,0 +1,94 @@
+"""Write synthetic MJPEG movies, in any of the container formats of Demux.
+
+Frames have a given resolution and follow a size distribution. By default
+they are stand-ins: an SOI, an SOF0 segment carrying the resolution, seeded
+random bytes and an EOI, which is all the server and the RTP path look at.
+With --decodable they are real JPEG images of a moving pattern (needs
+Pillow), for benchmarks that decode frames; their size is then whatever
+the encoder makes of the pattern at the given quality. Frame sizes are
+limited to 99999 bytes only in the legacy 5-digit-length-prefix format.
+
+The same arguments and seed always write the same file.
+"""
+import argparse, io, math, random, struct
+
+import Demux
+
+MAX_FRAME = 1 << 24 # largest synthetic frame of the length-prefix-free formats
+MIN_FRAME = 32
+
+DISTRIBUTIONS = ('constant', 'normal', 'uniform', 'lognormal', 'gop')
+GOP = 12 # frames per group in the 'gop' distribution: a large key frame, then small ones
+KEY_FRAME_RATIO = 4 # key frame size over the other frames'
+
+def frameSizes(count, meanSize, distribution, rng, maxSize=MAX_FRAME):
+	"""Return the sizes of count frames averaging about meanSize bytes."""
+	if distribution == 'constant':
+		sizes = [meanSize] * count
+	elif distribution == 'normal':
+		sizes = [rng.gauss(meanSize, meanSize / 10) for _ in range(count)]
+	elif distribution == 'uniform':
+		sizes = [rng.uniform(meanSize / 2, meanSize * 3 / 2) for _ in range(count)]
+	elif distribution == 'lognormal':
+		sigma = 0.5
+		sizes = [rng.lognormvariate(math.log(meanSize) - sigma ** 2 / 2, sigma) for _ in range(count)]
+	elif distribution == 'gop':
+		small = meanSize * GOP / (GOP - 1 + KEY_FRAME_RATIO)
+		sizes = [rng.gauss(small * (KEY_FRAME_RATIO if i % GOP == 0 else 1), small / 20) for i in range(count)]
+	else:
+		raise ValueError(f"unknown size distribution {distribution!r}")
+	return [max(MIN_FRAME, min(maxSize, int(size))) for size in sizes]
+
+def syntheticFrame(width, height, size, rng):
+	"""Return a size-byte JPEG stand-in: SOI, an SOF0 segment with the resolution, random data, EOI.
+
+	The data has no 0xFF bytes, so like entropy-coded data it holds no
+	markers and concatenated frames split where they should.
+	"""
+	sof = b'\xff\xc0' + struct.pack('!HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+	head = Demux.SOI + sof
+	return head + rng.randbytes(size - len(head) - 2).replace(b'\xff', b'\x00') + Demux.EOI
+
+def decodableFrame(width, height, n, quality, rng):
+	"""Return a real JPEG of frame n of a pattern that moves from frame to frame."""
+	from PIL import Image
+	tile = Image.frombytes('RGB', (16, 9), rng.randbytes(16 * 9 * 3))
+	image = tile.resize((width, height), Image.BILINEAR) # smooth areas and edges, like video
+	image = image.rotate(n % 360, translate=(n % width, 0))
+	out = io.BytesIO()
+	image.save(out, 'JPEG', quality=quality)
+	return out.getvalue()
+
+def makeMjpeg(filename, frames=500, width=640, height=360, frameSize=8000, distribution='normal',
+			  seed=0, decodable=False, quality=80, container='legacy'):
+	"""Write a synthetic movie and return its filename."""
+	demuxer = Demux.demuxer(container)
+	rng = random.Random(seed)
+	sizes = frameSizes(frames, frameSize, distribution, rng, getattr(demuxer, 'MAX_FRAME', MAX_FRAME))
+	with open(filename, 'wb') as f:
+		for n, size in enumerate(sizes):
+			if decodable:
+				frame = decodableFrame(width, height, n, quality, rng)
+			else:
+				frame = syntheticFrame(width, height, size, rng)
+			f.write(demuxer.pack(frame))
+	return filename
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('filename')
+	parser.add_argument('--frames', type=int, default=500)
+	parser.add_argument('--width', type=int, default=640)
+	parser.add_argument('--height', type=int, default=360)
+	parser.add_argument('--size', type=int, default=8000, help="mean frame size in bytes")
+	parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='normal')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--decodable', action='store_true', help="real JPEG frames (needs Pillow)")
+	parser.add_argument('--quality', type=int, default=80, help="JPEG quality of decodable frames")
+	parser.add_argument('--container', choices=[demuxer.name for demuxer in Demux.DEMUXERS], default='legacy')
+	args = parser.parse_args()
+	makeMjpeg(args.filename, args.frames, args.width, args.height, args.size, args.distribution,
+			  args.seed, args.decodable, args.quality, args.container)
+
+if __name__ == '__main__':
+	main()
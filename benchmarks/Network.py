@@ -0,0 +1,171 @@
+"""Scripted sessions through the network emulator, with loss/jitter/fps/latency results as JSON.
+
+Each scenario pairs an impairment profile with a session script in the
+LoadGenerator syntax (e.g. 'play:5,pause:1,seek:10,play:2'). A headless
+client plays the script through a NetEmulator in front of a fresh server.
+The impairments come from a seeded RNG, so the same seed replays the same
+losses and runs can be compared with each other.
+"""
+import argparse, contextlib, io, json, os, platform, subprocess, sys, tempfile, time
+
+from benchmarks import makeMovie
+from benchmarks.ServerLoad import ROOT, freePort, waitForServer
+from LoadGenerator import parseScenario, percentile, REPLY_TIMEOUT
+from NetEmulator import NetEmulator, Impairment
+from Rtcp import RTCP_INTERVAL
+from RtspClient import RtspClient
+
+FREEZE_GAP = 0.3 # seconds without a new frame that count as a freeze
+
+# name -> (Impairment arguments, session script)
+SCENARIOS = {
+	'clean': ({}, 'play:5'),
+	'random-loss': ({'loss': 0.02, 'delay': 0.01}, 'play:5'),
+	'burst-loss': ({'burst': (0.01, 0.3, 0.0, 0.8), 'delay': 0.01}, 'play:5'),
+	'jitter': ({'delay': 0.02, 'jitter': 0.03}, 'play:5'),
+	'reorder-duplicate': ({'delay': 0.02, 'reorder': 0.05, 'duplicate': 0.02}, 'play:5'),
+	'bandwidth': ({'rate': 3e6, 'delay': 0.02}, 'play:5'),
+	'pause-seek': ({'loss': 0.01, 'delay': 0.01}, 'play:2,pause:1,seek:10,play:2'),
+}
+
+class TimedClient(RtspClient):
+	"""Headless client that records when each frame is shown."""
+
+	def __init__(self, *args, reportInterval=RTCP_INTERVAL, **kwargs):
+		self.frameTimes = []
+		self.frameBytes = 0
+		self.reportInterval = reportInterval
+		super().__init__(*args, **kwargs)
+
+	def openRtpPort(self):
+		self.rtcpInterval = self.reportInterval
+		super().openRtpPort()
+
+	def frameReceived(self, data):
+		self.frameTimes.append(time.monotonic())
+		self.frameBytes += len(data)
+
+def freezeTime(frameTimes, start, end):
+	"""Total length of the gaps between shown frames longer than FREEZE_GAP."""
+	times = [start] + [t for t in frameTimes if start <= t <= end] + [end]
+	return sum(b - a for a, b in zip(times, times[1:]) if b - a > FREEZE_GAP)
+
+def runSession(movie, impairment, script, mode='async', clientClass=TimedClient, prepare=None, **clientOptions):
+	"""Play a script through an emulated path; return the session's figures and the link's counters.
+
+	With no impairment the client talks to the server directly, over plain loopback.
+	"""
+	port = freePort()
+	server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'Server.py'), str(port), '--mode', mode],
+							  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	probe = None
+	emulator = None
+	counters = {'lost': 0, 'played': 0, 'frames': 0}
+	plays = []
+	stats = {}
+
+	def collect(client):
+		# STOP and TEARDOWN reset the client's counters
+		nonlocal stats
+		counters['lost'] += client.lostPacket
+		counters['played'] += client.packetsRecv
+		counters['frames'] += client.frameNbr
+		stats = client.jitterBuffer.stats()
+
+	try:
+		probe = waitForServer(port)
+		if impairment is not None:
+			emulator = NetEmulator('127.0.0.1', port, 0, impairment).start()
+		with contextlib.redirect_stdout(io.StringIO()): # The client prints its statistics
+			client = clientClass('127.0.0.1', emulator.port if emulator else port, freePort(), movie, **clientOptions)
+			client.waitForReply(REPLY_TIMEOUT)
+			if prepare:
+				prepare(client)
+				client.waitForReply(REPLY_TIMEOUT)
+			for action, arg in parseScenario(script):
+				if action == 'play':
+					client.playMovie()
+					client.waitForReply(REPLY_TIMEOUT)
+					start = time.monotonic()
+					time.sleep(arg)
+					plays.append((start, time.monotonic()))
+				elif action == 'pause':
+					client.pauseMovie()
+					client.waitForReply(REPLY_TIMEOUT)
+					time.sleep(arg)
+				elif action == 'seek':
+					client.seekMovie(arg)
+					client.waitForReply(REPLY_TIMEOUT)
+				elif action == 'stop':
+					collect(client)
+					client.stopMovie()
+					client.waitForReply(REPLY_TIMEOUT)
+			collect(client)
+			client.teardownMovie()
+			client.waitForReply(REPLY_TIMEOUT)
+			time.sleep(1.0) # Let the receive threads see the teardown
+	finally:
+		if emulator:
+			emulator.close()
+		server.kill()
+		server.wait()
+		if probe:
+			probe.close()
+
+	playTime = sum(end - start for start, end in plays)
+	link = emulator.stats()['downlink'] if emulator else {'sent': 0, 'lost': 0, 'queueDrops': 0}
+	rtts = [rtt * 1000 for rtt in client.rtspRtts]
+	return {
+		'frames': counters['frames'],
+		'fps': counters['frames'] / playTime if playTime else 0.0,
+		'freezeSec': sum(freezeTime(client.frameTimes, start, end) for start, end in plays),
+		'goodputMbps': client.frameBytes * 8 / playTime / 1e6 if playTime else 0.0,
+		'linkLoss': (link['lost'] + link['queueDrops']) / link['sent'] if link['sent'] else 0.0,
+		'residualLoss': counters['lost'] / (counters['lost'] + counters['played']) if counters['played'] else 0.0,
+		'jitterMs': stats.get('jitterMs'),
+		'playoutDelayMs': stats.get('delayMs'),
+		'recoveryRate': stats.get('recoveryRate'),
+		'recoveryMs': stats.get('recoveryMs'),
+		'fecRecovered': client.fecDecoder.recovered if client.fecDecoder else None,
+		'rtspRttMs': {'p50': percentile(rtts, 50), 'p95': percentile(rtts, 95)},
+		'link': link,
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+	parser.add_argument('--mode', choices=['threaded', 'async'], default='async')
+	parser.add_argument('--seed', type=int, default=1)
+	parser.add_argument('--repeat', type=int, default=1, help="runs of every scenario")
+	parser.add_argument('--output', help="JSON file to write (default: standard output)")
+	args = parser.parse_args()
+
+	results = []
+	with tempfile.TemporaryDirectory() as tmp:
+		movie = makeMovie(os.path.join(tmp, 'movie.Mjpeg'), frames=2000)
+		for name in args.scenarios:
+			options, script = SCENARIOS[name]
+			for run in range(args.repeat):
+				impairment = Impairment(seed=args.seed + run, **options)
+				result = runSession(movie, impairment, script, args.mode)
+				print(f"{name}: {result['fps']:.1f} fps, residual loss {result['residualLoss']:.2%}, "
+					  f"jitter {result['jitterMs'] or 0:.1f} ms, freeze {result['freezeSec']:.1f} s", file=sys.stderr)
+				results.append({'scenario': name, 'run': run, 'script': script, 'impairment': options, **result})
+
+	document = {
+		'benchmark': 'network',
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python': platform.python_version(),
+		'mode': args.mode,
+		'seed': args.seed,
+		'results': results,
+	}
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(document, f, indent=2)
+	else:
+		json.dump(document, sys.stdout, indent=2)
+		print()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,171 @@
+"""Frame send lateness on slow storage, with and without reading frames ahead.
+
+Sessions are real ServerWorkers paced on the process's PacingScheduler,
+with their packets dropped instead of sent. Their movie is served by a
+SlowMedia, a throttled stand-in for a cold disk or network storage: the
+first access to a frame, a page fault in the send loop or a read ahead,
+sleeps for a latency plus the frame's size over a bandwidth, and a share
+of them stall for much longer. Later accesses find the frame in the page
+cache, so the sessions sharing the movie only wait for it once.
+
+A frame's lateness is when the send loop took it (or, for a read-ahead
+underrun, the later slot that finally did) against when it was due; the
+frames the pacer dropped for being too far behind are counted apart.
+"""
+import argparse, json, os, platform, random, sys, tempfile, threading, time
+
+from benchmarks import makeMovie
+from MediaRegistry import Media, registry
+from Metrics import Histogram
+from Prefetch import prefetcher, READ_AHEAD, IO_THREADS
+from ServerWorker import ServerWorker
+from SessionManager import sessions as sessionManager
+
+class SlowMedia(Media):
+	"""A mapped movie whose frames wait like a slow disk would, the first time they are touched."""
+
+	def __init__(self, filename, latency, bandwidth, stallRate, stall, seed):
+		super().__init__(filename)
+		self.latency = latency
+		self.bandwidth = bandwidth
+		self.stallRate = stallRate
+		self.stall = stall
+		self.rng = random.Random(seed)
+		self.rngLock = threading.Lock()
+		self.cached = set()
+
+	def wait(self, index):
+		if index in self.cached:
+			return
+		with self.rngLock:
+			stalled = self.rng.random() < self.stallRate
+		time.sleep(self.latency + self.index.frame(index)[1] / self.bandwidth + (self.stall if stalled else 0.0))
+		self.cached.add(index)
+
+	def frame(self, index):
+		self.wait(index)
+		return super().frame(index)
+
+	def warm(self, index):
+		self.wait(index)
+		super().warm(index)
+
+class TimedWorker(ServerWorker):
+	"""A ServerWorker that drops its packets and replies and records how late each frame was taken."""
+
+	def __init__(self, clientInfo, lateness):
+		super().__init__(clientInfo)
+		self.lateness = lateness
+
+	def sendRtspReply(self, reply):
+		pass
+
+	def sendRtpPacket(self, rtpPacket, address):
+		pass
+
+	def sendRtp(self, skip=0):
+		now = time.monotonic()
+		videoStream = self.clientInfo['videoStream']
+		before = videoStream.frameNbr() + skip
+		more = super().sendRtp(skip)
+		if videoStream.frameNbr() > before:
+			pacer = self.clientInfo['pacer']
+			self.lateness.record(max(0.0, now - pacer.start - before * pacer.interval))
+		return more
+
+def request(worker, text):
+	for message in worker.parser.feed(text.encode()):
+		worker.handleRtspRequest(message)
+
+def runOnce(movie, depth, sessions, duration, storage, seed):
+	"""Stream a movie on slow storage to some sessions; return their lateness figures."""
+	prefetcher.configure(depth, prefetcher.threads)
+	key = os.path.realpath(movie)
+	registry.media[key] = SlowMedia(key, seed=seed, **storage) # sessions open this one
+
+	lateness = Histogram()
+	workers = []
+	for n in range(sessions):
+		worker = TimedWorker({'rtspSocket': (None, ('127.0.0.1', 0))}, lateness)
+		sessionManager.add(worker)
+		request(worker, f"SETUP {movie} RTSP/1.0\r\nCSeq: 1\r\nTransport: RTP/UDP; client_port= {40000 + 2 * n}-{40001 + 2 * n}\r\n\r\n")
+		workers.append(worker)
+	for worker in workers:
+		request(worker, "PLAY * RTSP/1.0\r\nCSeq: 2\r\n\r\n")
+	time.sleep(duration)
+
+	dropped = slots = underruns = 0
+	for worker in workers:
+		pacer = worker.clientInfo['pacer']
+		videoStream = worker.clientInfo['videoStream']
+		dropped += pacer.stats.dropped
+		slots += pacer.next
+		underruns += getattr(videoStream, 'underruns', 0)
+		request(worker, "TEARDOWN * RTSP/1.0\r\nCSeq: 3\r\n\r\n")
+		sessionManager.remove(worker)
+	media = registry.media.pop(key)
+	time.sleep(1.0) # let a send caught in a stall finish with the movie
+	while media.refs:
+		time.sleep(0.01) # reads ahead still running hold the movie
+	media.close()
+
+	p50, p90, p99, p999 = (value * 1000 for value in lateness.quantiles())
+	return {
+		'prefetch': depth,
+		'frames': lateness.count,
+		'slots': slots,
+		'dropped': dropped,
+		'underruns': underruns,
+		'latenessMs': {'p50': p50, 'p90': p90, 'p99': p99, 'p999': p999, 'max': lateness.max * 1000,
+					   'mean': lateness.total / lateness.count * 1000 if lateness.count else 0.0},
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--sessions', type=int, default=8)
+	parser.add_argument('--duration', type=float, default=10.0, help="seconds of each run")
+	parser.add_argument('--prefetch', type=int, nargs='+', default=[0, READ_AHEAD],
+						help="read-ahead depths to compare; 0 reads in the send loop")
+	parser.add_argument('--io-threads', type=int, default=IO_THREADS)
+	parser.add_argument('--frame-size', type=int, default=30000, help="mean frame size of the movie")
+	parser.add_argument('--latency', type=float, default=2.0, help="ms every frame access waits")
+	parser.add_argument('--bandwidth', type=float, default=50.0, help="MB/s the storage reads at")
+	parser.add_argument('--stall-rate', type=float, default=0.02, help="share of accesses that stall")
+	parser.add_argument('--stall', type=float, default=100.0, help="ms a stalled access waits on top")
+	parser.add_argument('--seed', type=int, default=1)
+	parser.add_argument('--output', help="JSON file to write (default: standard output)")
+	args = parser.parse_args()
+
+	storage = {'latency': args.latency / 1000, 'bandwidth': args.bandwidth * 1e6,
+			   'stallRate': args.stall_rate, 'stall': args.stall / 1000}
+	prefetcher.configure(0, args.io_threads)
+	results = []
+	with tempfile.TemporaryDirectory() as tmp:
+		movie = makeMovie(os.path.join(tmp, 'movie.Mjpeg'), frames=5000, frameSize=args.frame_size)
+		for depth in args.prefetch:
+			result = runOnce(movie, depth, args.sessions, args.duration, storage, args.seed)
+			late = result['latenessMs']
+			print(f"prefetch {depth}: {result['frames']} frames of {result['slots']} slots, "
+				  f"lateness p50 {late['p50']:.1f} p99 {late['p99']:.1f} max {late['max']:.1f} ms, "
+				  f"{result['dropped']} dropped, {result['underruns']} underruns", file=sys.stderr)
+			results.append(result)
+
+	document = {
+		'benchmark': 'prefetch',
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python': platform.python_version(),
+		'sessions': args.sessions,
+		'ioThreads': args.io_threads,
+		'storage': {'latencyMs': args.latency, 'bandwidthMBps': args.bandwidth,
+					'stallRate': args.stall_rate, 'stallMs': args.stall},
+		'results': results,
+	}
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(document, f, indent=2)
+	else:
+		json.dump(document, sys.stdout, indent=2)
+		print()
+
+if __name__ == '__main__':
+	main()
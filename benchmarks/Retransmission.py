@@ -0,0 +1,53 @@
+"""Packet recovery with NACK retransmission over a lossy link.
+
+A headless client plays a synthetic movie through a link that loses packets
+at random and delays them by a fixed one-way latency, once with NACKs and
+once without. Reports the packets still missing at playout, the complete
+frames shown, and, with NACKs, the share of missing packets recovered in
+time and how long recovery took.
+"""
+import argparse, os, tempfile
+
+from benchmarks import makeMovie
+from benchmarks.Network import TimedClient, runSession
+from NetEmulator import Impairment
+
+class NoNackClient(TimedClient):
+	def requestRetransmission(self, mediaSsrc):
+		pass
+
+def runOnce(nack, args, movie):
+	impairment = Impairment(loss=args.loss, delay=args.delay / 1000, seed=args.seed)
+	r = runSession(movie, impairment, f'play:{args.duration}', args.mode,
+				   clientClass=TimedClient if nack else NoNackClient,
+				   prepare=lambda client: client.setQuality(0), # Keep the adaptation out of the comparison
+				   minDelay=args.min_delay / 1000)
+	return {
+		'nack': nack,
+		'residual': r['residualLoss'],
+		'frames': r['frames'],
+		'recoveryRate': r['recoveryRate'],
+		'recoveryMs': r['recoveryMs'],
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--mode', choices=['threaded', 'async'], default='async')
+	parser.add_argument('--loss', type=float, default=0.02, help="random loss on the link (0-1)")
+	parser.add_argument('--delay', type=float, default=10.0, help="one-way link delay in ms")
+	parser.add_argument('--min-delay', type=float, default=80.0, help="client playout delay in ms")
+	parser.add_argument('--duration', type=float, default=10.0)
+	parser.add_argument('--seed', type=int, default=1)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		movie = makeMovie(os.path.join(tmp, 'movie.Mjpeg'), frames=2000)
+		print(f"{'nack':>4} {'residual loss':>13} {'frames':>6} {'recovered':>9} {'recovery ms':>11}")
+		for nack in (False, True):
+			r = runOnce(nack, args, movie)
+			recovered = f"{r['recoveryRate']:.1%}" if r['recoveryRate'] is not None else '-'
+			recoveryMs = f"{r['recoveryMs']:.1f}" if r['recoveryMs'] is not None else '-'
+			print(f"{'yes' if r['nack'] else 'no':>4} {r['residual']:>13.2%} {r['frames']:>6} {recovered:>9} {recoveryMs:>11}")
+
+if __name__ == '__main__':
+	main()
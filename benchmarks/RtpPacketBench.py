@@ -0,0 +1,78 @@
+"""Packets/sec of RtpPacket encode, decode, getPacket and send at MJPEG frame sizes.
+
+The byte-at-a-time header encoder RtpPacket used before the struct-based
+one is kept here as a reference, and sending is compared between joining
+header and payload (sendto(getPacket())) and scatter/gather (sendTo).
+"""
+import argparse, os, socket, timeit
+from time import time
+
+from RtpPacket import RtpPacket, HEADER_SIZE
+
+def legacyEncode(seqnum, ssrc, payload):
+	timestamp = int(time())
+	header = bytearray(HEADER_SIZE)
+	header[0] = 2 << 6
+	header[1] = 26 & 0x7F
+	header[2] = (seqnum >> 8) & 0xFF
+	header[3] = seqnum & 0xFF
+	header[4] = (timestamp >> 24) & 0xFF
+	header[5] = (timestamp >> 16) & 0xFF
+	header[6] = (timestamp >> 8) & 0xFF
+	header[7] = timestamp & 0xFF
+	header[8] = (ssrc >> 24) & 0xFF
+	header[9] = (ssrc >> 16) & 0xFF
+	header[10] = (ssrc >> 8) & 0xFF
+	header[11] = ssrc & 0xFF
+	return header + payload
+
+def rate(stmt, number):
+	return number / min(timeit.repeat(stmt, number=number, repeat=3))
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--sizes', type=int, nargs='+', default=[8000, 20000, 60000])
+	parser.add_argument('--number', type=int, default=20000)
+	args = parser.parse_args()
+
+	receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	receiver.bind(('127.0.0.1', 0))
+	receiver.setblocking(False)
+	address = receiver.getsockname()
+	sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+	def drain():
+		try:
+			while True:
+				receiver.recv(65536)
+		except BlockingIOError:
+			pass
+
+	print(f"{'size':>6} {'legacy+join':>11} {'encode':>10} {'decode':>10} {'getPacket':>10} {'sendto+join':>12} {'sendTo':>10}")
+	for size in args.sizes:
+		payload = os.urandom(size)
+		packet = RtpPacket()
+		packet.encode(2, 0, 0, 0, 1, 0, 26, 0, payload)
+		data = bytes(packet.getPacket())
+		decoded = RtpPacket()
+		n = args.number
+
+		legacy = rate(lambda: legacyEncode(1, 0, payload), n)
+		encode = rate(lambda: packet.encode(2, 0, 0, 0, 1, 0, 26, 0, payload, 0), n)
+		decode = rate(lambda: decoded.decode(data), n)
+		join = rate(packet.getPacket, n)
+
+		def sendJoined():
+			sender.sendto(packet.getPacket(), address)
+			drain()
+
+		def sendGathered():
+			packet.sendTo(sender, address)
+			drain()
+
+		joined = rate(sendJoined, n // 10)
+		gathered = rate(sendGathered, n // 10)
+		print(f"{size:>6} {legacy:>11.0f} {encode:>10.0f} {decode:>10.0f} {join:>10.0f} {joined:>12.0f} {gathered:>10.0f}")
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,60 @@
+"""Messages/sec of RTSP request parsing: legacy split, and RtspParser per message, pipelined and fragmented.
+
+The legacy parser is the positional split on '\\n' that ServerWorker used
+before RtspParser; it is kept here as a reference. It cannot frame a
+stream, so it is only measured on one whole message per call.
+"""
+import argparse, timeit
+
+from RtspParser import RtspParser
+
+REQUEST = (b"PLAY movie.Mjpeg RTSP/1.0\r\n"
+		   b"CSeq: 42\r\n"
+		   b"Session: 123456\r\n"
+		   b"Range: npt=12.500-\r\n"
+		   b"User-Agent: benchmark\r\n\r\n")
+
+def legacyParse(data):
+	request = data.decode("utf-8").split('\n')
+	line1 = request[0].split(' ')
+	requestType = line1[0]
+	filename = line1[1]
+	seq = request[1].split(' ')
+	headers = {}
+	for line in request[2:]:
+		key, sep, value = line.partition(':')
+		if sep:
+			headers[key.strip().lower()] = value.strip()
+	return requestType, filename, seq[1], headers
+
+def rate(stmt, messages, number):
+	return messages * number / min(timeit.repeat(stmt, number=number, repeat=3))
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--number', type=int, default=20000, help="messages per measurement")
+	parser.add_argument('--pipeline', type=int, default=64, help="messages per segment when pipelined")
+	parser.add_argument('--chunk', type=int, default=7, help="segment size in bytes when fragmented")
+	args = parser.parse_args()
+
+	n = args.number
+	rtsp = RtspParser()
+	batch = REQUEST * args.pipeline
+	chunks = [REQUEST[i:i + args.chunk] for i in range(0, len(REQUEST), args.chunk)]
+
+	def fragmented():
+		for chunk in chunks:
+			rtsp.feed(chunk)
+
+	results = [
+		("legacy split, 1 per recv", rate(lambda: legacyParse(REQUEST), 1, n)),
+		("RtspParser, 1 per recv", rate(lambda: rtsp.feed(REQUEST), 1, n)),
+		(f"RtspParser, {args.pipeline} pipelined", rate(lambda: rtsp.feed(batch), args.pipeline, n // args.pipeline)),
+		(f"RtspParser, {args.chunk}-byte segments", rate(fragmented, 1, n // 10)),
+	]
+	print(f"{'parser':<32} {'msgs/sec':>10}")
+	for name, value in results:
+		print(f"{name:<32} {value:>10.0f}")
+
+if __name__ == '__main__':
+	main()
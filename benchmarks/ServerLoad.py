@@ -0,0 +1,126 @@
+"""Concurrent-session benchmark: threaded server vs. asyncio server.
+
+For every client count a fresh server process is started, the clients
+SETUP and PLAY the same synthetic movie, and after a warm-up the server's
+CPU time, resident memory and thread count are sampled from /proc while
+the clients count the RTP packets they receive (Linux only).
+"""
+import argparse, asyncio, os, socket, subprocess, sys, tempfile, time
+
+from benchmarks import makeMovie
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TICKS = os.sysconf('SC_CLK_TCK')
+
+class Receiver(asyncio.DatagramProtocol):
+	def __init__(self):
+		self.packets = 0
+		self.bytes = 0
+
+	def datagram_received(self, data, addr):
+		self.packets += 1
+		self.bytes += len(data)
+
+def procStats(pid):
+	"""Return (cpu seconds, rss kB, threads) of a process."""
+	with open(f'/proc/{pid}/stat') as f:
+		fields = f.read().rsplit(')', 1)[1].split()
+	cpu = (int(fields[11]) + int(fields[12])) / TICKS
+	rss = threads = 0
+	with open(f'/proc/{pid}/status') as f:
+		for line in f:
+			if line.startswith('VmRSS:'):
+				rss = int(line.split()[1])
+			elif line.startswith('Threads:'):
+				threads = int(line.split()[1])
+	return cpu, rss, threads
+
+async def request(reader, writer, text):
+	writer.write((text + "\r\n\r\n").encode())
+	await writer.drain()
+	return await reader.readuntil(b"\r\n\r\n")
+
+async def startSession(port, movie):
+	loop = asyncio.get_running_loop()
+	transport, receiver = await loop.create_datagram_endpoint(Receiver, local_addr=('127.0.0.1', 0))
+	rtpPort = transport.get_extra_info('sockname')[1]
+	reader, writer = await asyncio.open_connection('127.0.0.1', port)
+	reply = await request(reader, writer, f"SETUP {movie} RTSP/1.0\r\nCSeq: 1\r\nTransport: RTP/UDP; client_port= {rtpPort}")
+	session = reply.decode().split('\r\n')[2].split(' ')[1]
+	await request(reader, writer, f"PLAY {movie} RTSP/1.0\r\nCSeq: 2\r\nSession: {session}")
+	return transport, receiver, writer
+
+async def runClients(port, movie, clients):
+	sessions = []
+	for i in range(0, clients, 50):
+		batch = [startSession(port, movie) for _ in range(i, min(clients, i + 50))]
+		sessions += await asyncio.gather(*batch)
+	await asyncio.sleep(1.0)
+	start = [r.packets for _, r, _ in sessions]
+	return sessions, start
+
+def freePort():
+	with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+		s.bind(('', 0))
+		return s.getsockname()[1]
+
+def waitForServer(port, timeout=10.0):
+	"""Connect once the server listens; the idle probe stays open until the run ends."""
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		try:
+			return socket.create_connection(('127.0.0.1', port), timeout=1.0)
+		except OSError:
+			time.sleep(0.1)
+	raise RuntimeError(f"server did not start on port {port}")
+
+def runOnce(mode, clients, duration, movie):
+	port = freePort()
+	server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'Server.py'), str(port), '--mode', mode],
+							  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	probe = None
+	try:
+		probe = waitForServer(port)
+		loop = asyncio.new_event_loop()
+		sessions, start = loop.run_until_complete(runClients(port, movie, clients))
+		cpu0 = procStats(server.pid)[0]
+		loop.run_until_complete(asyncio.sleep(duration))
+		cpu1, rss, threads = procStats(server.pid)
+		received = [r.packets - s for (_, r, _), s in zip(sessions, start)]
+		for transport, _, writer in sessions:
+			transport.close()
+			writer.close()
+		loop.close()
+	finally:
+		server.kill()
+		server.wait()
+		if probe:
+			probe.close()
+	return {
+		'mode': mode,
+		'clients': clients,
+		'active': sum(1 for n in received if n > 0),
+		'fps': sum(received) / duration / clients,
+		'cpu': (cpu1 - cpu0) / duration,
+		'rssMB': rss / 1024,
+		'threads': threads,
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--clients', type=int, nargs='+', default=[10, 100, 1000])
+	parser.add_argument('--modes', nargs='+', default=['threaded', 'async'])
+	parser.add_argument('--duration', type=float, default=5.0)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		movie = makeMovie(os.path.join(tmp, 'movie.Mjpeg'), frames=2000)
+		print(f"{'mode':>9} {'clients':>7} {'active':>6} {'fps/client':>10} {'cpu':>6} {'rss MB':>7} {'threads':>7}")
+		for clients in args.clients:
+			for mode in args.modes:
+				r = runOnce(mode, clients, args.duration, movie)
+				print(f"{r['mode']:>9} {r['clients']:>7} {r['active']:>6} {r['fps']:>10.1f} "
+					  f"{r['cpu']:>6.0%} {r['rssMB']:>7.1f} {r['threads']:>7}")
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,91 @@
+"""Throughput of the pre-forked server as worker processes are added.
+
+For each worker count a fresh `Server.py --workers N` is started and the
+sessions are opened from several client processes, so the clients are not
+the bottleneck. After a warm-up the RTP packets and bytes the clients
+receive are counted, and the CPU time of every worker is read from /proc
+(Linux only). Throughput can only scale up to the number of cores.
+"""
+import argparse, asyncio, multiprocessing, os, subprocess, sys, tempfile, time
+
+from benchmarks import makeMovie
+from benchmarks.ServerLoad import ROOT, procStats, startSession, freePort, waitForServer
+
+def runClients(port, movie, sessions, warmup, duration, ready, results):
+	"""Client process: open the sessions, then count what arrives over the measured window."""
+	async def run():
+		opened = []
+		for i in range(0, sessions, 50):
+			opened += await asyncio.gather(*[startSession(port, movie) for _ in range(i, min(sessions, i + 50))])
+		await asyncio.sleep(warmup)
+		start = [(r.packets, r.bytes) for _, r, _ in opened]
+		ready.put(True)
+		await asyncio.sleep(duration)
+		received = [(r.packets - p, r.bytes - b) for (_, r, _), (p, b) in zip(opened, start)]
+		for transport, _, writer in opened:
+			transport.close()
+			writer.close()
+		return received
+	results.put(asyncio.run(run()))
+
+def workerPids(pid):
+	with open(f'/proc/{pid}/task/{pid}/children') as f:
+		return [int(child) for child in f.read().split()]
+
+def runOnce(workers, sessions, clientProcesses, duration, movie):
+	port = freePort()
+	server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'Server.py'), str(port), '--mode', 'async',
+							   '--workers', str(workers)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	probe = None
+	try:
+		probe = waitForServer(port)
+		time.sleep(0.5) # Let every worker bind before connections are spread
+		ready, results = multiprocessing.Queue(), multiprocessing.Queue()
+		shares = [sessions // clientProcesses + (i < sessions % clientProcesses) for i in range(clientProcesses)]
+		clients = [multiprocessing.Process(target=runClients, args=(port, movie, n, 1.0, duration, ready, results))
+				   for n in shares if n]
+		for client in clients:
+			client.start()
+		for _ in clients:
+			ready.get()
+		pids = workerPids(server.pid) if workers > 1 else [server.pid]
+		cpu0 = sum(procStats(pid)[0] for pid in pids)
+		time.sleep(duration)
+		cpu1 = sum(procStats(pid)[0] for pid in pids)
+		received = [r for _ in clients for r in results.get()]
+		for client in clients:
+			client.join()
+	finally:
+		server.terminate()
+		server.wait()
+		if probe:
+			probe.close()
+	return {
+		'workers': workers,
+		'sessions': sessions,
+		'active': sum(1 for packets, _ in received if packets),
+		'pps': sum(packets for packets, _ in received) / duration,
+		'mbps': sum(size for _, size in received) * 8 / duration / 1e6,
+		'cpu': (cpu1 - cpu0) / duration,
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, os.cpu_count() or 1}))
+	parser.add_argument('--sessions', type=int, nargs='+', default=[100, 400])
+	parser.add_argument('--client-processes', type=int, default=max(2, os.cpu_count() or 1))
+	parser.add_argument('--duration', type=float, default=5.0)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		movie = makeMovie(os.path.join(tmp, 'movie.Mjpeg'), frames=2000)
+		print(f"cores: {os.cpu_count()}")
+		print(f"{'workers':>7} {'sessions':>8} {'active':>6} {'pkts/s':>9} {'Mbit/s':>8} {'server cpu':>10}")
+		for sessions in args.sessions:
+			for workers in args.workers:
+				r = runOnce(workers, sessions, args.client_processes, args.duration, movie)
+				print(f"{r['workers']:>7} {r['sessions']:>8} {r['active']:>6} {r['pps']:>9.0f} "
+					  f"{r['mbps']:>8.1f} {r['cpu']:>10.0%}")
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,251 @@
+"""Benchmark suite of the VideoStream -> RtpPacket -> UDP path, with JSON results checked against a baseline.
+
+Every run generates the same synthetic media (benchmarks.Media, fixed
+seeds), then measures:
+
+  parse    frame index scan of each container format, and frame reads, from
+           the file and from the mapped registry
+  packet   RTP encode, getPacket, decode, JPEG fragmentation and reassembly
+  decode   the client's frame decode (Pillow, skipped without it)
+  rtsp     request parsing, and request handling by a ServerWorker in-process
+  stream   loopback streams from a server process: its CPU per session, and
+           what one client gets (frame rate, loss, jitter, RTSP latency)
+
+Micro benchmarks keep the best of several repeats. Results are written as
+JSON; with --baseline every metric is compared with the stored run, and
+the exit status is 1 when one is worse by more than the threshold.
+Record a baseline with --save-baseline on the machine that checks for
+regressions; numbers from different machines do not compare.
+"""
+import argparse, json, os, platform, sys, tempfile, time, timeit
+
+from benchmarks.Media import makeMjpeg
+from benchmarks.Network import runSession
+from benchmarks.ServerLoad import runOnce
+from benchmarks.RtspParse import REQUEST
+from FrameIndex import FrameIndex
+from MediaRegistry import registry
+from RtpJpeg import JpegPacketizer, FrameAssembler, DEFAULT_MTU
+from RtpPacket import RtpPacket
+from RtspParser import RtspParser
+from ServerWorker import ServerWorker
+from SessionManager import sessions
+from VideoStream import VideoStream
+
+REPEAT = 5 # repeats of a micro benchmark; the fastest counts
+THRESHOLD = 0.15 # relative change that counts as a regression
+PAYLOAD = DEFAULT_MTU - 12 - 8 # an MTU-sized JPEG fragment
+
+BENCHMARKS = {}
+
+def benchmark(function):
+	"""Register a benchmark: function(args, media) yields (metric, value, unit, better, slack)."""
+	BENCHMARKS[function.__name__] = function
+	return function
+
+def best(stmt, number):
+	"""Seconds per call of stmt, best of REPEAT runs of number calls."""
+	return min(timeit.repeat(stmt, number=number, repeat=REPEAT)) / number
+
+def micro(name, stmt, number):
+	return name, best(stmt, number) * 1e6, 'us', 'lower', 0.0
+
+@benchmark
+def parse(args, media):
+	for container, movie in media['containers'].items():
+		with open(movie, 'rb') as f:
+			data = f.read()
+		frames = len(FrameIndex.scan(data))
+		metric = 'index_scan_per_frame' if container == 'legacy' else f'index_scan_{container}_per_frame'
+		yield metric, best(lambda: FrameIndex.scan(data), 1) / frames * 1e6, 'us', 'lower', 0.0
+
+	movie = media['movie']
+
+	stream = VideoStream(movie)
+	def readFile():
+		stream.seek(0)
+		while stream.nextFrame():
+			pass
+	yield 'file_read_per_frame', best(readFile, 1) / frames * 1e6, 'us', 'lower', 0.0
+
+	cursor = registry.open(movie)
+	def readMapped():
+		cursor.seek(0)
+		while cursor.nextFrame():
+			pass
+	yield 'mapped_read_per_frame', best(readMapped, 1) / frames * 1e6, 'us', 'lower', 0.0
+	cursor.close()
+
+@benchmark
+def packet(args, media):
+	payload = os.urandom(PAYLOAD)
+	header = bytes(8)
+	rtpPacket = RtpPacket()
+	n = args.number
+	yield micro('encode', lambda: rtpPacket.encode(2, 0, 0, 0, 1, 0, 26, 1, payload, 3000, header), n)
+	yield micro('getPacket', rtpPacket.getPacket, n)
+	data = bytes(rtpPacket.getPacket())
+	received = RtpPacket()
+	yield micro('decode', lambda: received.decode(data), n)
+
+	frame = media['frame']
+	packetizer = JpegPacketizer()
+	packets = []
+	for seq, (payloadHeader, chunk, last) in enumerate(packetizer.fragments(frame)):
+		fragment = RtpPacket()
+		fragment.encode(2, 0, 0, 0, seq, int(last), 26, 1, bytes(chunk), 0, bytes(payloadHeader))
+		packets.append(fragment)
+	def fragments():
+		for _ in packetizer.fragments(frame):
+			pass
+	yield micro('fragment_frame', fragments, n // len(packets))
+	def reassemble():
+		assembler = FrameAssembler()
+		for fragment in packets:
+			assembler.add(fragment)
+	yield micro('reassemble_frame', reassemble, n // len(packets))
+
+@benchmark
+def decode(args, media):
+	frames = media['jpegs']
+	if not frames:
+		return # Pillow is not installed
+	from benchmarks.FrameDecode import memoryDecode
+	def decodeAll():
+		for frame in frames:
+			memoryDecode(frame)
+	yield 'client_decode_per_frame', best(decodeAll, 1) / len(frames) * 1e6, 'us', 'lower', 0.0
+
+class QuietWorker(ServerWorker):
+	"""A ServerWorker that drops its replies instead of sending them."""
+
+	def sendRtspReply(self, reply):
+		pass
+
+@benchmark
+def rtsp(args, media):
+	parser = RtspParser()
+	n = args.number
+	batch = REQUEST * 64
+	yield 'parse_request', best(lambda: parser.feed(batch), n // 64) / 64 * 1e6, 'us', 'lower', 0.0
+
+	worker = QuietWorker({'rtspSocket': (None, ('127.0.0.1', 0))})
+	sessions.add(worker)
+	movie = media['movie']
+	options, keepAlive, setup, teardown = parser.feed(
+		b"OPTIONS * RTSP/1.0\r\nCSeq: 1\r\n\r\n"
+		b"GET_PARAMETER * RTSP/1.0\r\nCSeq: 2\r\n\r\n" +
+		f"SETUP {movie} RTSP/1.0\r\nCSeq: 3\r\nTransport: RTP/UDP; client_port= 40000-40001\r\n\r\n".encode() +
+		b"TEARDOWN * RTSP/1.0\r\nCSeq: 4\r\n\r\n")
+	yield micro('handle_options', lambda: worker.handleRtspRequest(options), n // 10)
+	yield micro('handle_keepalive', lambda: worker.handleRtspRequest(keepAlive), n // 10)
+	def session():
+		worker.handleRtspRequest(setup)
+		worker.handleRtspRequest(teardown)
+	yield micro('handle_setup_teardown', session, n // 100)
+	sessions.remove(worker)
+
+@benchmark
+def stream(args, media):
+	movie = media['movie']
+	server = runOnce(args.mode, args.sessions, args.duration, movie)
+	yield 'server_packets_per_session_second', server['fps'], 'packets', 'higher', 5.0
+	yield 'server_cpu_ms_per_session_second', server['cpu'] * 1000 / args.sessions, 'ms', 'lower', 1.0
+	yield 'server_rss', server['rssMB'], 'MB', 'lower', 2.0
+
+	client = runSession(movie, None, f'play:{args.duration}', args.mode)
+	yield 'client_fps', client['fps'], 'fps', 'higher', 0.5
+	yield 'client_loss', client['residualLoss'], 'ratio', 'lower', 0.005
+	yield 'client_jitter', client['jitterMs'] or 0.0, 'ms', 'lower', 1.0
+	yield 'rtsp_rtt_p50', client['rtspRttMs']['p50'], 'ms', 'lower', 1.0
+
+def makeMedia(tmp, args):
+	"""The suite's media, the same on every run."""
+	containers = {}
+	for container in ('legacy', 'binary', 'jpeg'):
+		containers[container] = makeMjpeg(os.path.join(tmp, f'movie-{container}.Mjpeg'), frames=2000, width=1280,
+										  height=720, frameSize=args.frame_size, distribution='gop', seed=1,
+										  container=container)
+	movie = containers['legacy']
+	media = {'movie': movie, 'containers': containers}
+	with open(movie, 'rb') as f:
+		data = f.read()
+	offset, length = FrameIndex.scan(data).frame(0) # a key frame
+	media['frame'] = data[offset:offset + length]
+	try:
+		clip = makeMjpeg(os.path.join(tmp, 'clip.Mjpeg'), frames=20, width=640, height=360, seed=2, decodable=True)
+		with open(clip, 'rb') as f:
+			data = f.read()
+		index = FrameIndex.scan(data)
+		media['jpegs'] = [data[offset:offset + length] for offset, length in map(index.frame, range(len(index)))]
+	except ImportError:
+		media['jpegs'] = [] # Pillow is not installed; the decode benchmark is skipped
+	return media
+
+def compare(results, baseline, threshold):
+	"""Print each metric against the baseline; return the names of those that got worse by more than the threshold."""
+	regressions = []
+	print(f"{'metric':<44} {'baseline':>10} {'now':>10} {'change':>8}", file=sys.stderr)
+	for name, result in results.items():
+		old = baseline.get(name)
+		if old is None:
+			continue
+		before, now = old['value'], result['value']
+		worse = now - before if result['better'] == 'lower' else before - now
+		change = f"{(now - before) / before:+.1%}" if before else '-'
+		regressed = worse > max(abs(before) * threshold, result['slack'])
+		if regressed:
+			regressions.append(name)
+		print(f"{name:<44} {before:>10.3f} {now:>10.3f} {change:>8}{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+	parser.add_argument('--mode', choices=['threaded', 'async'], default='async', help="server mode of the stream benchmark")
+	parser.add_argument('--sessions', type=int, default=20, help="concurrent sessions of the stream benchmark")
+	parser.add_argument('--duration', type=float, default=5.0, help="seconds of each stream")
+	parser.add_argument('--number', type=int, default=20000, help="calls per micro benchmark repeat")
+	parser.add_argument('--frame-size', type=int, default=60000, help="mean frame size of the movie")
+	parser.add_argument('--output', help="JSON file to write (default: standard output)")
+	parser.add_argument('--baseline', help="JSON results to compare with")
+	parser.add_argument('--threshold', type=float, default=THRESHOLD, help="relative change that fails the run")
+	parser.add_argument('--save-baseline', metavar='FILE', help="also write the results as a baseline")
+	args = parser.parse_args()
+
+	results = {}
+	with tempfile.TemporaryDirectory() as tmp:
+		media = makeMedia(tmp, args)
+		for name in args.only:
+			tic = time.perf_counter()
+			for metric, value, unit, better, slack in BENCHMARKS[name](args, media):
+				results[f"{name}.{metric}"] = {'value': value, 'unit': unit, 'better': better, 'slack': slack}
+			print(f"{name}: {time.perf_counter() - tic:.1f} s", file=sys.stderr)
+
+	document = {
+		'suite': 'pipeline',
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python': platform.python_version(),
+		'machine': platform.machine(),
+		'cpus': os.cpu_count(),
+		'args': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'save_baseline')},
+		'results': results,
+	}
+	for path in (args.output, args.save_baseline):
+		if path:
+			with open(path, 'w') as f:
+				json.dump(document, f, indent=2)
+	if not args.output:
+		json.dump(document, sys.stdout, indent=2)
+		print()
+
+	if args.baseline:
+		with open(args.baseline) as f:
+			baseline = json.load(f)['results']
+		regressions = compare(results, baseline, args.threshold)
+		if regressions:
+			print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+			sys.exit(1)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,9 @@
+"""Benchmarks for the RTSP/RTP streaming pipeline.
+
+Run them from the project root, e.g. ``python -m benchmarks.ServerLoad``.
+"""
+
+def makeMovie(filename, frames=500, frameSize=8000, seed=0, container='legacy'):
+	"""Write a synthetic movie in a Demux container format, frame sizes spread around frameSize."""
+	from benchmarks.Media import makeMjpeg # not at import time, so python -m benchmarks.Media runs cleanly
+	return makeMjpeg(filename, frames, frameSize=frameSize, seed=seed, container=container)
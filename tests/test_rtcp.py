@@ -0,0 +1,31 @@
+import struct
+
+from Rtcp import RTCP_HEADER, RTPFB, RR, SR, GENERIC_NACK, Nack, ReceiverReport, ReportBlock, SenderReport, decode
+
+def header(first, packetType, words):
+	return RTCP_HEADER.pack(2 << 6 | first, packetType, words)
+
+def test_round_trip():
+	block = ReportBlock(7, 12, -3, 70000, 40, 0x12345678, 65536)
+	sr = SenderReport(1, (2, 3), 4, 5, 6, [block])
+	rr = ReceiverReport(8, [block])
+	nack = Nack(9, 10, [65535, 0, 5, 40])
+	reports = decode(sr.encode() + rr.encode() + nack.encode())
+	assert [type(report) for report in reports] == [SenderReport, ReceiverReport, Nack]
+	assert reports[0].ntp == (2, 3) and reports[0].blocks[0].cumulativeLost == -3
+	assert reports[1].blocks[0].highestSeq == 70000
+	assert sorted(reports[2].lost) == [0, 5, 40, 65535]
+
+def test_truncated_packets_are_dropped():
+	assert decode(header(0, SR, 0)) == [] # 4-byte SR without sender info
+	assert decode(header(1, SR, 6) + bytes(24)) == [] # counts a report block it does not hold
+	assert decode(header(0, RR, 0)) == [] # no SSRC
+	assert decode(header(2, RR, 7) + bytes(28)) == [] # one of two report blocks
+	assert decode(header(GENERIC_NACK, RTPFB, 1) + bytes(4)) == [] # half the feedback header
+	assert decode(header(GENERIC_NACK, RTPFB, 3) + bytes(8)) == [] # length past the end of the data
+
+def test_reports_before_a_truncated_packet_are_kept():
+	rr = ReceiverReport(8)
+	reports = decode(rr.encode() + header(0, SR, 0) + rr.encode())
+	assert [report.ssrc for report in reports] == [8]
+	assert decode(rr.encode() + struct.pack('!B', 0x80)) != [] # trailing bytes short of a header
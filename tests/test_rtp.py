@@ -0,0 +1,34 @@
+from JitterBuffer import JitterBuffer
+from RtpPacket import RtpPacket
+
+def packet(seqnum, timestamp=0):
+	rtpPacket = RtpPacket()
+	rtpPacket.encode(2, 0, 0, 0, seqnum, 0, 26, 1, b'frame', timestamp)
+	return rtpPacket
+
+def test_sequence_number_and_timestamp_wrap():
+	rtpPacket = packet(65543, 2 ** 32 + 5)
+	assert rtpPacket.seqNum() == 7
+	assert rtpPacket.timestamp() == 5
+
+	received = RtpPacket()
+	received.decode(bytes(rtpPacket.getPacket()))
+	assert received.seqNum() == 7
+	assert received.timestamp() == 5
+	assert received.getPayload() == b'frame'
+
+def test_sequence_extension_across_wraparound():
+	buffer = JitterBuffer()
+	assert [buffer.extendSeq(seq) for seq in (65534, 65535, 0, 1)] == [65534, 65535, 65536, 65537]
+	assert buffer.extendSeq(65533) == 65533 # reordered from before the wraparound
+	assert buffer.extendSeq(2) == 65538
+
+def test_playout_order_across_wraparound():
+	buffer = JitterBuffer(minDelay=0.0)
+	for seq in (65534, 0, 65535, 1):
+		buffer.put(packet(seq), arrival=0.0)
+	assert [buffer.get(timeout=0).seqNum() for _ in range(4)] == [65534, 65535, 0, 1]
+	assert buffer.get(timeout=0) is None
+
+	fraction, cumulative, extendedMax, jitter = buffer.receptionReport()
+	assert (fraction, cumulative, extendedMax) == (0, 0, 65537)